@@ -0,0 +1,145 @@
+# KLASYFIKACJA ROZDAŃ
+#
+# Rozwiązywanie zakresu numerów rozdań na wszystkich rdzeniach. Każdy proces
+# roboczy dostaje tylko numer rozdania i zwraca kilkanaście bajtów wyniku, więc
+# przepustowość rośnie niemal liniowo z liczbą rdzeni. Wyniki są dopisywane do
+# pliku na bieżąco — po przerwaniu wystarczy uruchomić polecenie ponownie.
+# Z opcją --cache procesy korzystają ze wspólnej pamięci pozycji (cache.py):
+# rozdania rozwiązane w poprzednich uruchomieniach nie są rozwiązywane od nowa.
+
+import os
+import sys
+import struct
+from multiprocessing import Pool
+from time import perf_counter
+
+from engine import Klondike
+from solver import Solver, UNKNOWN, WON, LOST
+from cache import PositionCache, solve_cached, ENTRIES, PATH as CACHE_PATH
+
+# Plik wyników: nagłówek MAGIC, a po nim rekordy o stałym rozmiarze:
+# numer rozdania, poziom trudności, wynik, liczba węzłów, długość rozwiązania, czas w ms
+MAGIC = b"PSJR"
+RECORD = struct.Struct("<IBBIHI")
+
+STATUS_NAMES = {UNKNOWN: "nieznany", WON: "wygrana", LOST: "przegrana"}
+
+# Odczyt wyników: krotki (numer, trudny, wynik, węzły, długość rozwiązania, czas w ms)
+def read_results(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + ": to nie jest plik wyników klasyfikacji")
+        data = f.read()
+    # Ostatni rekord mógł zostać zapisany tylko częściowo
+    data = data[:len(data) - len(data) % RECORD.size]
+    return list(RECORD.iter_unpack(data))
+
+# Otwarcie pliku wyników do dopisywania; zwraca plik i zbiór gotowych par (numer, trudny)
+def open_results(path):
+    done = set()
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        results = read_results(path)
+        for r in results:
+            done.add((r[0], r[1]))
+        # Obcięcie tylko częściowo zapisanego ostatniego rekordu (rekordy mogą się powtarzać)
+        f = open(path, "r+b")
+        f.truncate(len(MAGIC) + len(results) * RECORD.size)
+        f.seek(0, os.SEEK_END)
+    else:
+        f = open(path, "wb")
+        f.write(MAGIC)
+    return f, done
+
+# PROCESY ROBOCZE
+
+_solver = None
+_cache = None
+
+def _init_worker(max_entries, cache_path):
+    global _solver, _cache
+    _solver = Solver(max_entries)
+    if cache_path is not None:
+        _cache = PositionCache(cache_path)
+
+def _classify(task):
+    seed, hard, max_nodes, max_time = task
+    _solver.clear()
+    result = solve_cached(_solver, Klondike.deal(hard, seed), _cache, max_nodes, max_time)
+    return RECORD.pack(
+        seed, hard, result.status, result.nodes,
+        len(result.moves) if result.moves else 0, min(int(result.elapsed * 1000), 0xFFFFFFFF),
+    )
+
+# Klasyfikacja rozdań first..last (włącznie); zwraca listę nowych wyników
+def classify(first, last, modes, path, jobs=None, max_nodes=1_000_000, max_time=None,
+             max_entries=1 << 18, cache_path=None, verbose=False, out=sys.stderr):
+    # Plik pamięci pozycji jest tworzony przed uruchomieniem procesów, żeby wszystkie otworzyły ten sam
+    if cache_path is not None:
+        PositionCache(cache_path, ENTRIES).close()
+    f, done = open_results(path)
+    tasks = [(seed, hard, max_nodes, max_time) for seed in range(first, last + 1) for hard in modes if (seed, hard) not in done]
+
+    results = []
+    counts = {UNKNOWN: 0, WON: 0, LOST: 0}
+    start = last_report = perf_counter()
+
+    try:
+        with Pool(jobs, _init_worker, (max_entries, cache_path)) as pool:
+            for packed in pool.imap_unordered(_classify, tasks, chunksize=4):
+                f.write(packed)
+                record = RECORD.unpack(packed)
+                results.append(record)
+                counts[record[2]] += 1
+
+                if verbose:
+                    print("%d %s %s %d węzłów %d ms" % (record[0], "trudny" if record[1] else "łatwy", STATUS_NAMES[record[2]], record[3], record[5]), file=out)
+
+                now = perf_counter()
+                if now - last_report >= 1:
+                    f.flush()
+                    last_report = now
+                    print("%d/%d rozdań, %.1f rozdań/s, wygrane %d, przegrane %d, nieznane %d" % (
+                        len(results), len(tasks), len(results) / (now - start), counts[WON], counts[LOST], counts[UNKNOWN]), file=out)
+    finally:
+        f.close()
+
+    report(results, perf_counter() - start, out)
+    return results
+
+# Podsumowanie wyników
+def report(results, elapsed, out=sys.stderr):
+    if not results:
+        print("Brak nowych rozdań do rozwiązania.", file=out)
+        return
+    for hard in (0, 1):
+        part = [r for r in results if r[1] == hard]
+        if not part:
+            continue
+        nodes = sorted(r[3] for r in part)
+        counts = {s: sum(1 for r in part if r[2] == s) for s in STATUS_NAMES}
+        print("%s: %d rozdań, wygrane %d, przegrane %d, nieznane (przekroczony limit) %d, węzły: mediana %d, p95 %d, maks. %d" % (
+            "Trudny" if hard else "Łatwy", len(part), counts[WON], counts[LOST], counts[UNKNOWN],
+            nodes[len(nodes) // 2], nodes[min(len(nodes) - 1, len(nodes) * 95 // 100)], nodes[-1]), file=out)
+    print("%d rozdań w %.1f s (%.1f rozdań/s, %d węzłów/s)" % (
+        len(results), elapsed, len(results) / elapsed, sum(r[3] for r in results) / elapsed), file=out)
+
+# WIERSZ POLECEŃ
+
+MODES = {"easy": (0,), "hard": (1,), "both": (0, 1)}
+
+def add_parser(commands):
+    parser = commands.add_parser("solve", help="klasyfikacja zakresu rozdań (wygrana/przegrana/nieznany)")
+    parser.add_argument("first", type=int, help="pierwszy numer rozdania")
+    parser.add_argument("last", type=int, help="ostatni numer rozdania (włącznie)")
+    parser.add_argument("--mode", choices=MODES, default="both", help="poziom trudności (domyślnie oba)")
+    parser.add_argument("--out", default="rozdania.bin", help="plik wyników (dopisywany, wznawiany po przerwaniu)")
+    parser.add_argument("--jobs", type=int, default=None, help="liczba procesów (domyślnie liczba rdzeni)")
+    parser.add_argument("--nodes", type=int, default=1_000_000, help="limit węzłów na rozdanie")
+    parser.add_argument("--time", type=float, default=None, help="limit czasu na rozdanie w sekundach")
+    parser.add_argument("--cache", nargs="?", const=CACHE_PATH, metavar="PLIK",
+                        help="korzystaj ze wspólnej pamięci pozycji (domyślnie %(const)s; tworzona, jeśli jej nie ma)")
+    parser.add_argument("--verbose", action="store_true", help="wypisuj wynik każdego rozdania")
+    parser.set_defaults(run=run)
+
+def run(args):
+    classify(args.first, args.last, MODES[args.mode], args.out, args.jobs, args.nodes, args.time, cache_path=args.cache, verbose=args.verbose)
@@ -0,0 +1,279 @@
+# POMIARY WYDAJNOŚCI
+#
+# Powtarzalne pomiary najczęściej wykonywanego kodu: rozdawanie, generowanie
+# i wykonywanie ruchów, cofanie, rysowanie planszy i odczyt tablicy wyników.
+# Wszystko działa bez terminala (rysowanie trafia do atrapy curses) i na stałych
+# numerach rozdań, więc kolejne uruchomienia mierzą dokładnie to samo. Wyniki są
+# dopisywane do pliku razem z numerem commitu; opcja --compare porównuje je
+# z poprzednim pomiarem i kończy się błędem, gdy coś wyraźnie zwolniło.
+
+import os
+import sys
+import json
+import random
+import tempfile
+import tracemalloc
+import subprocess
+from time import perf_counter, time
+
+from engine import Klondike, History
+from render import Renderer
+from scores import ScoreStore
+
+PATH = "./pomiary.jsonl"
+SEEDS = range(200) # numery rozdań używane w pomiarach
+PLAYOUT = 150 # najwięcej ruchów w przygotowanej partii
+SCORE_SIZES = (10**3, 10**4, 10**5, 10**6)
+
+# PRZYGOTOWANIE
+
+# Partie rozgrywane losowymi dozwolonymi ruchami (generator ze stałym ziarnem);
+# krotki (rozdanie, ruchy)
+def playouts(seeds=SEEDS, length=PLAYOUT):
+    games = []
+    rng = random.Random(1)
+    for seed in seeds:
+        state = Klondike.deal(seed % 2 == 1, seed)
+        start = state.copy()
+        moves = []
+        for i in range(length):
+            legal = state.legal_moves()
+            if not legal: break
+            move = rng.choice(legal)
+            state.apply(move)
+            moves.append(move)
+        games.append((start, moves))
+    return games
+
+# Atrapa curses dla renderera — przyjmuje wywołania i nic nie rysuje
+class FakeCurses:
+    A_NORMAL = 0
+
+    def werase(self, window): pass
+    def mvwaddstr(self, window, y, x, text, attr): pass
+    def wnoutrefresh(self, window): pass
+    def doupdate(self): pass
+
+# Gra bez terminala. Curses jest importowany tylko dla atrybutów komórek planszy
+def headless_game():
+    import pasjans
+    pasjans.load_curses()
+    return pasjans.Game()
+
+# POMIARY
+#
+# Pomiar to funkcja bez argumentów wykonująca jedną rundę; zwraca liczbę
+# operacji i czas ich wykonania. Przygotowanie rundy nie jest mierzone:
+# właściwa część zaczyna się od begin()
+
+# Początek mierzonej części rundy (zeruje też szczyt pamięci, jeśli jest śledzona)
+def begin():
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    return perf_counter()
+
+def bench_deal():
+    seeds = list(SEEDS) * 5
+    def rep():
+        start = begin()
+        for seed in seeds:
+            Klondike.deal(seed % 2 == 1, seed)
+        return len(seeds), perf_counter() - start
+    return rep
+
+def bench_new_game(game):
+    seeds = list(SEEDS)
+    def rep():
+        start = begin()
+        for seed in seeds:
+            game.new_game(seed)
+        return len(seeds), perf_counter() - start
+    return rep
+
+# Generowanie dozwolonych ruchów w każdej pozycji przygotowanych partii
+def bench_legal_moves(positions):
+    def rep():
+        start = begin()
+        for state in positions:
+            state.legal_moves()
+        return len(positions), perf_counter() - start
+    return rep
+
+# Sprawdzenie i wykonanie ruchu (z zapisem w historii)
+def bench_move(games):
+    def rep():
+        states = [(start.copy(), moves) for start, moves in games]
+        count = 0
+        start = begin()
+        for state, moves in states:
+            history = History()
+            for move in moves:
+                if state.is_legal(move):
+                    history.apply(state, move)
+            count += len(moves)
+        return count, perf_counter() - start
+    return rep
+
+# Cofnięcie ruchu z historii
+def bench_undo(games):
+    def rep():
+        played = []
+        for start, moves in games:
+            state, history = start.copy(), History()
+            for move in moves:
+                history.apply(state, move)
+            played.append((state, history))
+        count = 0
+        start = begin()
+        for state, history in played:
+            while history.undo(state) is not None:
+                count += 1
+        return count, perf_counter() - start
+    return rep
+
+# Pełna klatka: zbudowanie planszy i narysowanie wszystkich komórek
+def bench_frame(game, positions):
+    renderer = Renderer(None, FakeCurses())
+    def rep():
+        start = begin()
+        for state in positions:
+            game.klondike = state
+            renderer.invalidate()
+            renderer.draw(game.board_frame())
+        return len(positions), perf_counter() - start
+    return rep
+
+# Tablica wyników z size partiami: otwarcie bazy i odczyt najlepszych wyników
+# (tak jak ekran wyników)
+def bench_scores(directory, size):
+    path = os.path.join(directory, "wyniki-%d.db" % size)
+    rng = random.Random(size)
+    store = ScoreStore(path, None)
+    store.add_many((rng.randrange(2), rng.randrange(80, 400), rng.randrange(1 << 32), rng.uniform(60, 3600), 1.7e9 + i) for i in range(size))
+    store.close()
+    def rep():
+        count = 20
+        start = begin()
+        for i in range(count):
+            store = ScoreStore(path, None)
+            store.best(False, 6)
+            store.best(True, 6)
+            store.close()
+        return count, perf_counter() - start
+    return rep
+
+# Wszystkie pomiary: lista par (nazwa, runda)
+def benchmarks(directory, score_sizes=SCORE_SIZES):
+    games = playouts()
+    positions = []
+    for start, moves in games:
+        state = start.copy()
+        for move in moves:
+            positions.append(state.copy())
+            state.apply(move)
+    game = headless_game()
+
+    result = [
+        ("rozdanie", bench_deal()),
+        ("nowa gra", bench_new_game(game)),
+        ("dozwolone ruchy", bench_legal_moves(positions)),
+        ("ruch", bench_move(games)),
+        ("cofnięcie", bench_undo(games)),
+        ("klatka", bench_frame(game, positions[::10])),
+    ]
+    for size in score_sizes:
+        result.append(("wyniki %d" % size, bench_scores(directory, size)))
+    return result
+
+# Wykonanie pomiaru: najlepsza z rund (operacje na sekundę) i szczyt pamięci
+# przydzielonej w czasie jednej rundy (KiB, mierzony w osobnej rundzie).
+# Runda jest powtarzana, aż potrwa co najmniej min_time sekund
+def measure(rep, rounds=5, min_time=0.2):
+    best = 0
+    for i in range(rounds):
+        ops = elapsed = 0
+        while elapsed < min_time:
+            n, t = rep()
+            ops += n
+            elapsed += t
+        best = max(best, ops / elapsed)
+    tracemalloc.start()
+    rep()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak / 1024
+
+# ZAPIS I PORÓWNANIE
+
+def commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or "?"
+    except OSError:
+        return "?"
+
+# Zapisane pomiary: lista słowników (commit, chwila, wersja Pythona, wyniki)
+def read_runs(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save_run(path, results):
+    run = {"commit": commit(), "time": time(), "python": sys.version.split()[0], "results": results}
+    with open(path, "a") as f:
+        f.write(json.dumps(run, ensure_ascii=False) + "\n")
+    return run
+
+# Porównanie z wcześniejszym pomiarem; zwraca liczbę pomiarów wolniejszych o więcej niż threshold
+def compare(results, previous, threshold=0.1, out=sys.stdout):
+    slower = 0
+    print("Porównanie z %s (%s):" % (previous["commit"], previous["python"]), file=out)
+    for name, (ops, peak) in results.items():
+        if name not in previous["results"]:
+            continue
+        old = previous["results"][name][0]
+        change = ops / old - 1
+        mark = ""
+        if change < -threshold:
+            mark = "  REGRESJA"
+            slower += 1
+        print("%-16s %+7.1f%%%s" % (name, change * 100, mark), file=out)
+    return slower
+
+# WIERSZ POLECEŃ
+
+def add_parser(commands):
+    parser = commands.add_parser("bench", help="pomiary wydajności (bez terminala)")
+    parser.add_argument("--rounds", type=int, default=5, help="liczba rund każdego pomiaru (liczy się najlepsza)")
+    parser.add_argument("--scores", default=",".join(str(n) for n in SCORE_SIZES), help="rozmiary tablicy wyników, po przecinku")
+    parser.add_argument("--out", default=PATH, help="plik, do którego są dopisywane wyniki")
+    parser.add_argument("--no-save", action="store_true", help="nie zapisuj wyników")
+    parser.add_argument("--compare", nargs="?", const="", metavar="COMMIT",
+                        help="porównaj z ostatnim zapisanym pomiarem (albo z pomiarem danego commitu)")
+    parser.add_argument("--threshold", type=float, default=10, help="spadek wydajności w %% uznawany za regresję")
+    parser.set_defaults(run=run)
+
+def run(args):
+    sizes = [int(n) for n in args.scores.split(",") if n]
+    path = os.path.abspath(args.out)
+    runs = read_runs(path)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, rep in benchmarks(directory, sizes):
+            ops, peak = measure(rep, args.rounds)
+            results[name] = [ops, peak]
+            print("%-16s %12.0f op/s %10.1f KiB" % (name, ops, peak))
+
+    if not args.no_save:
+        save_run(path, results)
+
+    if args.compare is not None:
+        previous = [r for r in runs if not args.compare or r["commit"] == args.compare]
+        if not previous:
+            print("Brak zapisanego pomiaru do porównania.", file=sys.stderr)
+            sys.exit(1)
+        if compare(results, previous[-1], args.threshold / 100):
+            sys.exit(1)
@@ -0,0 +1,251 @@
+# BOTY
+#
+# Rozgrywanie wielu rozdań przez boty z wymiennymi strategiami wyboru ruchu,
+# na obu poziomach trudności i na wszystkich rdzeniach. Jak w batch.py proces
+# roboczy dostaje tylko numer rozdania i zwraca kilkanaście bajtów wyniku, więc
+# przepustowość rośnie z liczbą rdzeni. Statystyki (odsetek wygranych
+# z przedziałem ufności, rozkład liczby ruchów liczonej jak licznik ruchów gry
+# i tablica wyników) są wypisywane na bieżąco. Z opcją --cache bot w pozycji
+# o znanej wygranej (patrz cache.py) gra ruchem z pamięci pozycji zamiast strategią.
+
+import os
+import sys
+import struct
+from math import sqrt
+from random import Random
+from multiprocessing import Pool
+from time import perf_counter
+
+from cache import PositionCache, PATH as CACHE_PATH
+from engine import Klondike, is_safe, DRAW, FOUNDATION, WASTE, HIDDEN, LENS, FOUNDED, FACEDOWN, DECK_LEN
+
+# Wynik partii: numer rozdania, poziom trudności, strategia (indeks w POLICIES),
+# wygrana, liczba ruchów (przeniesień kart, jak licznik ruchów gry), liczba akcji (z doborami)
+RECORD = struct.Struct("<IBBBHH")
+
+MAX_ACTIONS = 2000 # najwięcej akcji w partii
+STALL = 200 # najwięcej akcji bez postępu (karty na stosie końcowym albo odkrytej karty)
+
+# STRATEGIE
+#
+# Strategia to funkcja (stan, ruchy, generator liczb losowych) -> ruch, gdzie
+# ruchy to dozwolone ruchy prowadzące do pozycji, w których partia jeszcze nie była
+# (dzięki temu każda partia się kończy).
+
+def random_policy(state, moves, rng):
+    return rng.choice(moves)
+
+# Ocena ruchu bez jego wykonywania: najpierw stosy końcowe, potem odkrywanie kart
+def move_score(state, move):
+    src, dst, n = move
+    buf = state.buf
+    if move == DRAW:
+        return 5
+    if dst >= FOUNDATION:
+        card = state.moving_card(move)
+        return 100 + 10*is_safe(card, state)
+    if src < FOUNDATION:
+        rest = buf[LENS+src] - n
+        if rest and buf[HIDDEN+src] == rest:
+            return 50 # odkrycie karty
+        if not rest and buf[HIDDEN+src] == 0 and n == buf[LENS+src] and state.moving_card(move) % 13 == 12:
+            return 0 # król z jednej pustej kolumny do drugiej
+        return 3
+    if src >= WASTE:
+        return 30
+    return 1 # ze stosu końcowego z powrotem do kolumny
+
+def greedy_policy(state, moves, rng):
+    best = max(move_score(state, m) for m in moves)
+    return rng.choice([m for m in moves if move_score(state, m) == best])
+
+# Ocena pozycji: karty na stosach końcowych, zakryte karty i karty w talii
+def evaluate(state):
+    buf = state.buf
+    return 10*buf[FOUNDED] - 4*buf[FACEDOWN] - buf[DECK_LEN]
+
+# Przeszukiwanie na dwa ruchy naprzód z oceną pozycji
+def lookahead_policy(state, moves, rng):
+    best, choice = None, []
+    for move in moves:
+        record = state.apply(move)
+        score = evaluate(state)
+        for reply in state.legal_moves():
+            r = state.apply(reply)
+            score = max(score, evaluate(state))
+            state.undo(r)
+        state.undo(record)
+        # Przy równej ocenie lepszy ruch według strategii zachłannej
+        score = (score, move_score(state, move))
+        if best is None or score > best:
+            best, choice = score, [move]
+        elif score == best:
+            choice.append(move)
+    return rng.choice(choice)
+
+POLICIES = {"random": random_policy, "greedy": greedy_policy, "lookahead": lookahead_policy}
+POLICY_NAMES = list(POLICIES)
+
+# ROZGRYWKA
+
+# Partia rozdania seed rozegrana strategią; zwraca (wygrana, liczba ruchów, liczba akcji).
+# Gdy wszystkie karty są odkryte, a talia pusta, partię kończą ruchy z finishing_moves() —
+# jak w grze, liczą się one do liczby ruchów. Partia bez postępu przez stall akcji jest przegrana.
+def play(seed, hard, policy, rng, max_actions=MAX_ACTIONS, stall=STALL, cache=None):
+    state = Klondike.deal(hard, seed)
+    buf = state.buf
+    seen = {bytes(buf)}
+    moves = actions = 0
+    progress, last_progress = buf[FOUNDED] - buf[FACEDOWN], 0
+    while actions < max_actions and actions - last_progress < stall:
+        if state.can_finish():
+            return True, moves + len(state.finishing_moves()), actions
+        candidates = []
+        for move in state.legal_moves():
+            record = state.apply(move)
+            if bytes(state.buf) not in seen:
+                candidates.append(move)
+            state.undo(record)
+        if not candidates:
+            break
+        move = None
+        if cache is not None:
+            entry = cache.lookup(state)
+            if entry is not None and entry[2] in candidates:
+                move = entry[2]
+        if move is None:
+            move = policy(state, candidates, rng)
+        state.apply(move)
+        seen.add(bytes(state.buf))
+        actions += 1
+        if move != DRAW:
+            moves += 1
+        if buf[FOUNDED] - buf[FACEDOWN] > progress:
+            progress, last_progress = buf[FOUNDED] - buf[FACEDOWN], actions
+    return state.is_won(), moves, actions
+
+_cache = None
+
+def _init_worker(cache_path):
+    global _cache
+    if cache_path is not None:
+        _cache = PositionCache(cache_path)
+
+def _play(task):
+    seed, hard, p, max_actions, stall = task
+    rng = Random(seed << 3 | p << 1 | hard)
+    won, moves, actions = play(seed, hard, POLICIES[POLICY_NAMES[p]], rng, max_actions, stall, _cache)
+    return RECORD.pack(seed, hard, p, won, min(moves, 0xFFFF), min(actions, 0xFFFF))
+
+# STATYSTYKI
+
+# Przedział ufności Wilsona dla odsetka wygranych (z = 1.96 - 95%)
+def wilson(wins, n, z=1.96):
+    if n == 0:
+        return 0.0, 1.0
+    p = wins / n
+    d = 1 + z*z/n
+    c = p + z*z/(2*n)
+    m = z * sqrt(p*(1-p)/n + z*z/(4*n*n))
+    return max(0.0, (c - m) / d), min(1.0, (c + m) / d)
+
+# Percentyle (p10, p50, p90) posortowanej listy liczb (None - lista pusta)
+def percentiles(values):
+    if not values:
+        return None
+    return tuple(values[min(len(values) - 1, len(values) * p // 100)] for p in (10, 50, 90))
+
+class Stats:
+    def __init__(self):
+        self.games = {} # (strategia, trudny) -> liczba partii
+        self.wins = {}
+        self.moves = {} # (strategia, trudny) -> liczby ruchów wygranych partii
+
+    def add(self, record):
+        seed, hard, p, won, moves, actions = record
+        key = (p, hard)
+        self.games[key] = self.games.get(key, 0) + 1
+        if won:
+            self.wins[key] = self.wins.get(key, 0) + 1
+            self.moves.setdefault(key, []).append(moves)
+
+    # Wiersz statystyk dla strategii i poziomu trudności
+    def line(self, key):
+        n, wins = self.games[key], self.wins.get(key, 0)
+        low, high = wilson(wins, n)
+        line = "%-10s %-7s %7d partii, wygrane %5.1f%% (95%%: %.1f–%.1f%%)" % (
+            POLICY_NAMES[key[0]], "trudny" if key[1] else "łatwy", n, 100*wins/n, 100*low, 100*high)
+        p = percentiles(sorted(self.moves.get(key, ())))
+        if p is not None:
+            line += ", ruchy wygranych: p10 %d, mediana %d, p90 %d" % p
+        return line
+
+    def report(self, out=sys.stderr):
+        for key in sorted(self.games):
+            print(self.line(key), file=out)
+
+# Rozkład liczby ruchów w tablicy wyników — do porównania z botami
+def score_report(hard, out=sys.stderr):
+    from scores import ScoreStore, PATH
+    if not os.path.exists(PATH):
+        print("Brak tablicy wyników (%s)." % PATH, file=out)
+        return
+    store = ScoreStore()
+    try:
+        moves = store.moves(hard)
+    finally:
+        store.close()
+    p = percentiles(moves)
+    if p is not None:
+        print("%-10s %-7s %7d wyników, ruchy: p10 %d, mediana %d, p90 %d" % (
+            "gracze", "trudny" if hard else "łatwy", len(moves), *p), file=out)
+
+# Rozegranie rozdań first..last (włącznie) wszystkimi strategiami na wybranych poziomach trudności
+def evaluate_policies(first, last, policies, modes, jobs=None, max_actions=MAX_ACTIONS, stall=STALL, cache_path=None, out=sys.stderr):
+    tasks = [(seed, hard, POLICY_NAMES.index(p), max_actions, stall) for seed in range(first, last + 1) for hard in modes for p in policies]
+    stats = Stats()
+    count = 0
+    start = last_report = perf_counter()
+    with Pool(jobs, _init_worker, (cache_path,)) as pool:
+        for packed in pool.imap_unordered(_play, tasks, chunksize=16):
+            stats.add(RECORD.unpack(packed))
+            count += 1
+            now = perf_counter()
+            if now - last_report >= 10:
+                last_report = now
+                print("%d/%d partii, %.0f partii/s" % (count, len(tasks), count / (now - start)), file=out)
+                stats.report(out)
+    elapsed = perf_counter() - start
+    print("%d partii w %.1f s (%.0f partii/s)" % (count, elapsed, count / elapsed if elapsed else 0), file=out)
+    stats.report(out)
+    return stats
+
+# WIERSZ POLECEŃ
+
+MODES = {"easy": (0,), "hard": (1,), "both": (0, 1)}
+
+def add_parser(commands):
+    parser = commands.add_parser("bots", help="rozgrywanie rozdań przez boty i statystyki strategii")
+    parser.add_argument("first", type=int, help="pierwszy numer rozdania")
+    parser.add_argument("last", type=int, help="ostatni numer rozdania (włącznie)")
+    parser.add_argument("--policy", default=",".join(POLICY_NAMES), help="strategie, po przecinku (domyślnie %(default)s)")
+    parser.add_argument("--mode", choices=MODES, default="both", help="poziom trudności (domyślnie oba)")
+    parser.add_argument("--jobs", type=int, default=None, help="liczba procesów (domyślnie liczba rdzeni)")
+    parser.add_argument("--max-actions", type=int, default=MAX_ACTIONS, help="najwięcej akcji (ruchów i doborów) w partii")
+    parser.add_argument("--stall", type=int, default=STALL, help="najwięcej akcji bez postępu (partia jest wtedy przegrana)")
+    parser.add_argument("--cache", nargs="?", const=CACHE_PATH, metavar="PLIK",
+                        help="w pozycjach o znanej wygranej graj ruchem z pamięci pozycji (domyślnie %(const)s)")
+    parser.add_argument("--scores", action="store_true", help="porównaj z rozkładem ruchów w tablicy wyników")
+    parser.set_defaults(run=run)
+
+def run(args):
+    policies = [p for p in args.policy.split(",") if p]
+    for p in policies:
+        if p not in POLICIES:
+            sys.exit("Nieznana strategia: %s (dostępne: %s)" % (p, ", ".join(POLICY_NAMES)))
+    if args.cache is not None and not os.path.exists(args.cache):
+        sys.exit("Brak pamięci pozycji: %s (patrz polecenia cache i solve --cache)" % args.cache)
+    evaluate_policies(args.first, args.last, policies, MODES[args.mode], args.jobs, args.max_actions, args.stall, args.cache)
+    if args.scores:
+        for hard in MODES[args.mode]:
+            score_report(hard)
@@ -0,0 +1,259 @@
+# WSPÓLNA PAMIĘĆ POZYCJI
+#
+# Trwała tablica haszująca w pliku mapowanym do pamięci (mmap), w której
+# rozwiązywacz zostawia znane wyniki pozycji: wygrana (z odległością do wygranej
+# i najlepszym ruchem) albo przegrana. Z pliku korzystają naraz podpowiedzi w grze,
+# klasyfikacja rozdań i boty, także w wielu procesach, a praca nie przepada po ich
+# zakończeniu.
+#
+# Klucz to 64-bitowy hasz pozycji w postaci kanonicznej: kolumny gry i stosy
+# końcowe są posortowane, bo ich kolejność nie zmienia wyniku partii. Ruch jest
+# zapisywany w numeracji kanonicznej i przy odczycie tłumaczony z powrotem na
+# kolumny i stosy odczytywanej pozycji.
+#
+# Tablica ma stały rozmiar: kubełki po WAYS miejsc, a gdy kubełek jest pełny,
+# ofiarę wybiera algorytm zegarowy (drugiej szansy) po bitach odwołań miejsc.
+# Zapisy nie wymagają blokad: miejsce to para (klucz ^ dane, dane), więc miejsce
+# odczytane w połowie zapisu innego procesu nie pasuje do klucza i jest traktowane
+# jak brak wpisu. Dwa procesy zapisujące to samo miejsce tracą co najwyżej jeden wpis.
+
+import os
+import sys
+import mmap
+import struct
+from hashlib import blake2b
+from time import perf_counter
+
+from engine import TABLEAU, FOUNDATION, WASTE, HARD, DECK_LEN, DECK, LENS, HIDDEN, DISCARD, BOARD, COLUMN
+from solver import Result, WON, LOST, UNKNOWN
+
+PATH = "./pozycje.cache"
+ENTRIES = 1 << 20 # domyślna liczba miejsc w nowym pliku (16 MiB + bity odwołań)
+
+# Plik: nagłówek (MAGIC, liczba kubełków), miejsca SLOT (po WAYS w kubełku),
+# a na końcu po jednym bajcie bitu odwołania na miejsce
+MAGIC = b"PSJC"
+HEADER = struct.Struct("<4sI8x")
+WAYS = 4
+SLOT = struct.Struct("<QQ")
+# Dane wpisu: wynik (WON albo LOST), ruch (skąd, dokąd, liczba kart; numeracja kanoniczna),
+# odległość do wygranej (ruchy silnika razem z doborami, w znalezionym rozwiązaniu)
+DATA = struct.Struct("<BBBBH2x")
+
+# POSTAĆ KANONICZNA
+
+# Hasz pozycji w postaci kanonicznej i kolejności kolumn i stosów końcowych:
+# krotka (hasz, kolumny, stosy), gdzie kolumny[c] to kolumna pozycji na miejscu c postaci
+# kanonicznej (tak samo stosy). Hasz nigdy nie jest zerem — zero to puste miejsce
+def canonical(state):
+    buf = state.buf
+    columns = sorted(range(7), key=lambda r: buf[HIDDEN+r:HIDDEN+r+1] + buf[BOARD+r*COLUMN:BOARD+r*COLUMN+buf[LENS+r]])
+    foundations = sorted(range(4), key=lambda f: buf[DISCARD+f])
+    h = blake2b(buf[HARD:DECK_LEN+1], digest_size=8)
+    h.update(buf[DECK:DECK+buf[DECK_LEN]])
+    h.update(bytes(buf[DISCARD+f] for f in foundations))
+    for r in columns:
+        # Długość i liczba zakrytych kart oddzielają kolumny od siebie
+        h.update(bytes((buf[LENS+r], buf[HIDDEN+r])))
+        h.update(buf[BOARD+r*COLUMN:BOARD+r*COLUMN+buf[LENS+r]])
+    return int.from_bytes(h.digest(), "little") | 1, columns, foundations
+
+# Stos w numeracji kanonicznej i z powrotem
+def _to_canonical(pile, columns, foundations):
+    if pile < FOUNDATION:
+        return TABLEAU + columns.index(pile - TABLEAU)
+    if pile < WASTE:
+        return FOUNDATION + foundations.index(pile - FOUNDATION)
+    return pile
+
+def _from_canonical(pile, columns, foundations):
+    if pile < FOUNDATION:
+        return TABLEAU + columns[pile - TABLEAU]
+    if pile < WASTE:
+        return FOUNDATION + foundations[pile - FOUNDATION]
+    return pile
+
+# TABLICA
+
+class PositionCache:
+    # entries - liczba miejsc, jeśli plik trzeba utworzyć (None - plik musi istnieć)
+    def __init__(self, path=PATH, entries=None):
+        if not os.path.exists(path):
+            if entries is None:
+                raise FileNotFoundError(path)
+            create(path, entries)
+        with open(path, "r+b") as f:
+            self.data = mmap.mmap(f.fileno(), 0)
+        magic, buckets = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or len(self.data) != HEADER.size + buckets * WAYS * (SLOT.size + 1):
+            self.data.close()
+            raise ValueError(path + ": to nie jest plik pamięci pozycji")
+        self.buckets = buckets
+        self.refs = HEADER.size + buckets * WAYS * SLOT.size # początek bitów odwołań
+
+    def close(self):
+        self.data.close()
+
+    # Liczba miejsc
+    def capacity(self):
+        return self.buckets * WAYS
+
+    # Miejsce z kluczem h: (numer miejsca, dane) albo (None, None)
+    def _find(self, h):
+        data = self.data
+        first = (h >> 2) % self.buckets * WAYS
+        for i in range(first, first + WAYS):
+            check, payload = SLOT.unpack_from(data, HEADER.size + i * SLOT.size)
+            if check ^ payload == h:
+                return i, payload
+        return None, None
+
+    # Znany wynik pozycji: krotka (wynik, odległość do wygranej, ruch silnika albo None)
+    # albo None, jeśli pozycji nie ma w tablicy
+    def lookup(self, state):
+        h, columns, foundations = canonical(state)
+        i, payload = self._find(h)
+        if i is None:
+            return None
+        if not self.data[self.refs + i]:
+            self.data[self.refs + i] = 1
+        status, src, dst, n, distance = DATA.unpack(payload.to_bytes(8, "little"))
+        move = None
+        if status == WON and distance:
+            move = (_from_canonical(src, columns, foundations), _from_canonical(dst, columns, foundations), n)
+        return status, distance, move
+
+    # Zapisanie wyniku pozycji (move - najlepszy ruch dla wygranej)
+    def store(self, state, status, distance=0, move=None):
+        h, columns, foundations = canonical(state)
+        src, dst, n = (0, 0, 0) if move is None else move
+        payload = int.from_bytes(DATA.pack(
+            status, _to_canonical(src, columns, foundations), _to_canonical(dst, columns, foundations), n, min(distance, 0xFFFF)), "little")
+
+        i, old = self._find(h)
+        if i is None:
+            i = self._victim(h)
+        elif old == payload:
+            return
+        self.data[HEADER.size + i * SLOT.size:HEADER.size + (i + 1) * SLOT.size] = SLOT.pack(h ^ payload, payload)
+        self.data[self.refs + i] = 1
+
+    # Miejsce na nowy wpis: puste miejsce kubełka albo pierwsze bez bitu odwołania;
+    # mijane miejsca tracą bit odwołania (druga szansa)
+    def _victim(self, h):
+        data = self.data
+        first = (h >> 2) % self.buckets * WAYS
+        for i in range(first, first + WAYS):
+            check, payload = SLOT.unpack_from(data, HEADER.size + i * SLOT.size)
+            if check == payload == 0:
+                return i
+        while True:
+            for i in range(first, first + WAYS):
+                if not data[self.refs + i]:
+                    return i
+                data[self.refs + i] = 0
+
+    # Zapisanie wygranej wraz z każdą pozycją na ścieżce rozwiązania (moves - ruchy silnika)
+    def store_solution(self, state, moves):
+        state = state.copy()
+        for i, move in enumerate(moves):
+            self.store(state, WON, len(moves) - i, move)
+            state.apply(move)
+
+    # Zapisanie wyniku rozwiązywacza (wynik nieznany nie jest zapisywany)
+    def store_result(self, state, result):
+        if result.status == WON:
+            self.store_solution(state, result.moves)
+        elif result.status == LOST:
+            self.store(state, LOST)
+
+    # Liczby wpisów: (wygrane, przegrane)
+    def counts(self):
+        won = lost = 0
+        for i in range(self.capacity()):
+            check, payload = SLOT.unpack_from(self.data, HEADER.size + i * SLOT.size)
+            if check != payload: # w pustym miejscu oba są zerami, a klucz nigdy nie jest zerem
+                status = payload & 0xFF
+                won += status == WON
+                lost += status == LOST
+        return won, lost
+
+# Utworzenie pustego pliku na (co najmniej) entries miejsc. Plik jest tworzony
+# obok i podmieniany — procesy, które już mają go otwartego, nie widzą pół pliku
+def create(path=PATH, entries=ENTRIES):
+    buckets = max(1, -(-entries // WAYS))
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, buckets))
+        f.truncate(HEADER.size + buckets * WAYS * (SLOT.size + 1))
+    os.replace(tmp, path)
+
+# Otwarcie istniejącego pliku (None - brak pliku albo plik uszkodzony)
+def open_cache(path=PATH):
+    try:
+        return PositionCache(path)
+    except (OSError, ValueError):
+        return None
+
+# ROZWIĄZYWANIE Z PAMIĘCIĄ POZYCJI
+
+# Rozwiązanie partii (jak Solver.solve) z użyciem tablicy: znana wygrana jest
+# odtwarzana ruchami z tablicy, a jeśli ścieżka urywa się w połowie (wpis został
+# wyparty), rozwiązywacz szuka tylko od tego miejsca. Nowe wyniki trafiają do tablicy.
+def solve_cached(solver, state, cache, max_nodes=1_000_000, max_time=None, cancel=None):
+    if cache is None:
+        return solver.solve(state, max_nodes, max_time, cancel)
+    start = perf_counter()
+    entry = cache.lookup(state)
+    if entry is not None and entry[0] == LOST:
+        return Result(LOST, None, 0, perf_counter() - start)
+
+    moves = []
+    if entry is not None:
+        position = state.copy()
+        # Odległość do wygranej musi maleć z każdym ruchem: wpisy różnych rozwiązań
+        # (zapisane przez inne procesy albo po wyparciu) mogą tworzyć cykl
+        distance = None
+        while (entry is not None and entry[0] == WON and entry[2] is not None
+               and (distance is None or entry[1] < distance) and position.is_legal(entry[2])):
+            distance = entry[1]
+            moves.append(entry[2])
+            position.apply(entry[2])
+            if position.is_won():
+                return Result(WON, moves, 0, perf_counter() - start)
+            entry = cache.lookup(position)
+        if position.can_finish():
+            return Result(WON, moves + position.finishing_moves(), 0, perf_counter() - start)
+        state = position
+
+    result = solver.solve(state, max_nodes, max_time, cancel)
+    cache.store_result(state, result)
+    if moves and result.status != WON:
+        # Ścieżka z tablicy prowadziła do wygranej, więc przegrana w jej połowie
+        # oznacza tylko przekroczony limit albo przerwanie
+        result.status = UNKNOWN
+    if result.status == WON:
+        result.moves = moves + result.moves
+    result.elapsed = perf_counter() - start
+    return result
+
+# WIERSZ POLECEŃ
+
+def add_parser(commands):
+    parser = commands.add_parser("cache", help="wspólna pamięć pozycji (utworzenie, statystyki)")
+    parser.add_argument("--path", default=PATH, help="plik pamięci pozycji (domyślnie %(default)s)")
+    parser.add_argument("--create", type=int, metavar="MIEJSCA", help="utwórz nowy, pusty plik na tyle wpisów")
+    parser.set_defaults(run=run)
+
+def run(args):
+    if args.create is not None:
+        create(args.path, args.create)
+    cache = open_cache(args.path)
+    if cache is None:
+        sys.exit("Brak pamięci pozycji: " + args.path)
+    try:
+        won, lost = cache.counts()
+        print("%s: %d miejsc, wygrane %d, przegrane %d (zajęte %.1f%%)" % (
+            args.path, cache.capacity(), won, lost, 100 * (won + lost) / cache.capacity()), file=sys.stderr)
+    finally:
+        cache.close()
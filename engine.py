@@ -0,0 +1,788 @@
+# SILNIK ZASAD GRY
+#
+# Czysta logika pasjansa (Klondike) bez curses i bez wejścia/wyjścia — można go
+# importować w dowolnym miejscu i rozgrywać partie z prędkością maszyny.
+# Zasady (liczba kolumn i talii, układanie kart, dobieranie, przekładanie talii)
+# są danymi: compile_rules() zamienia je w klasę stanu ze stałymi i tablicami
+# danego wariantu, więc każdy wariant działa tak szybko jak pisany ręcznie.
+# Warianty inne niż klasyczny są w variants.py.
+
+from random import randrange
+from array import array
+
+# KARTY
+
+# Karta to liczba 0–51: kolor*13 + (wartość-1). Kolory jak w Suit z pasjans.py
+# (0 - pik, 1 - kier, 2 - trefl, 3 - karo), więc nieparzysty kolor to czerwony.
+# W grze dwiema taliami każda karta występuje dwa razy — obie są sobie równe.
+
+def value(card):
+    return card % 13 + 1
+
+def suit(card):
+    return card // 13
+
+def is_red(card):
+    return card // 13 % 2 == 1
+
+# Czy karta może leżeć na danej karcie w kolumnie gry? (None - pusta kolumna)
+# Zasady klasyczne — inne warianty opisuje Rules (patrz compile_rules)
+def fits_tableau(card, top):
+    if top is None:
+        return card % 13 == 12
+    return top % 13 == card % 13 + 1 and top // 13 % 2 != card // 13 % 2
+
+# Czy karta może trafić na dany stos końcowy? (None - pusty stos)
+def fits_foundation(card, top):
+    if top is None:
+        return card % 13 == 0
+    return card == top + 1 and card % 13 != 0
+
+# Karty, na których dana karta może leżeć w kolumnie gry: dwie karty przeciwnego
+# koloru o wartości wyższej o 1, a dla króla pusta kolumna (EMPTY w TOPS) i 0xFE,
+# które nigdy nie jest wierzchem kolumny. Dzięki temu miejsca dla karty
+# znajduje bytearray.find na wierzchnich kartach kolumn, bez pętli po kolumnach.
+PARENTS = [
+    (0xFF, 0xFE) if card % 13 == 12 else
+    tuple(s*13 + card % 13 + 1 for s in range(4) if s % 2 != card // 13 % 2)
+    for card in range(52)
+]
+
+# Te same zasady jako tablice dla par kart: indeks karta << 8 | wierzch, gdzie
+# wierzch 0xFF oznacza pusty stos (jak w buforze stanu). Jedno sięgnięcie do
+# tablicy zamiast dzielenia i porównań w najczęściej wykonywanym kodzie.
+def fits_table(fits):
+    table = bytearray(52 << 8)
+    for card in range(52):
+        for top in range(52):
+            table[card << 8 | top] = fits(card, top)
+        table[card << 8 | 0xFF] = fits(card, None)
+    return bytes(table)
+
+FITS_TABLEAU = fits_table(fits_tableau)
+FITS_FOUNDATION = fits_table(fits_foundation)
+
+# ROZDANIA
+#
+# Rozdanie wyznacza jego numer (0 – 2^32-1): talia jest tasowana algorytmem
+# Fishera–Yatesa z własnym generatorem liczb pseudolosowych, więc ten sam numer
+# daje tę samą partię na każdej platformie i w każdej wersji Pythona.
+
+SEEDS = 1 << 32
+
+def random_seed():
+    return randrange(SEEDS)
+
+# Potasowana talia (decks talii razem) dla danego numeru rozdania
+def shuffled_deck(seed, decks=1):
+    # Wymieszanie bitów numeru, żeby kolejne numery dawały niepodobne rozdania
+    x = seed & 0xFFFFFFFF
+    x = (x ^ x >> 16) * 0x85EBCA6B & 0xFFFFFFFF
+    x = (x ^ x >> 13) * 0xC2B2AE35 & 0xFFFFFFFF
+    x ^= x >> 16
+
+    deck = list(range(52)) * decks
+    for i in range(len(deck) - 1, 0, -1):
+        x = (x * 1664525 + 1013904223) & 0xFFFFFFFF
+        j = x * (i + 1) >> 32 # Starsze bity generatora są lepszej jakości
+        deck[i], deck[j] = deck[j], deck[i]
+    return deck
+
+# Hurtowe generowanie rozdań: count kolejnych talii od numeru first sklejonych
+# w jeden ciąg bajtów (po 52 bajty na talię). Z NumPy talie są tasowane naraz.
+def deal_block(first, count):
+    try:
+        import numpy as np
+    except ImportError:
+        return b"".join(bytes(shuffled_deck(seed)) for seed in range(first, first + count))
+
+    return shuffled_decks(np.arange(first, first + count, dtype=np.uint64)).tobytes()
+
+# Talie dla tablicy NumPy numerów rozdań: tablica uint8 (liczba numerów, 52)
+def shuffled_decks(seeds):
+    import numpy as np
+
+    count = len(seeds)
+    x = np.asarray(seeds, dtype=np.uint64) & 0xFFFFFFFF
+    x = (x ^ x >> 16) * 0x85EBCA6B & 0xFFFFFFFF
+    x = (x ^ x >> 13) * 0xC2B2AE35 & 0xFFFFFFFF
+    x ^= x >> 16
+
+    decks = np.tile(np.arange(52, dtype=np.uint8), (count, 1))
+    rows = np.arange(count)
+    for i in range(51, 0, -1):
+        x = (x * 1664525 + 1013904223) & 0xFFFFFFFF
+        j = (x * (i + 1) >> 32).astype(np.intp)
+        card = decks[rows, j]
+        decks[rows, j] = decks[:, i]
+        decks[:, i] = card
+    return decks
+
+# Kolejne talie (po 52 bajty) od numeru first, generowane blokami
+def deals(first, count, block=65536):
+    for start in range(first, first + count, block):
+        data = deal_block(start, min(block, first + count - start))
+        for o in range(0, len(data), 52):
+            yield data[o:o+52]
+
+# ZASADY
+#
+# Wariant gry opisują dane: liczba talii i kolumn gry, liczba widocznych kart
+# stosu rezerwowego, sposób układania kart w kolumnach i dwa poziomy trudności
+# (Mode) — ile kart się dobiera, czy można użyć tylko wierzchniej i ile razy
+# można przejrzeć talię. Poziom trudności partii to bajt HARD jej stanu.
+
+# Układanie kart w kolumnach gry (zawsze o jedną wartość niżej)
+ALTERNATE = 0 # na przemian kolorami
+SAME_SUIT = 1 # w tym samym kolorze
+ANY_SUIT = 2 # w dowolnym kolorze
+
+# Tablice pasowania kart w kolumnach gry dla (sposób układania, czy na pustą kolumnę
+# tylko król) — warianty o tych samych zasadach układania dzielą jedną tablicę
+TABLEAU_TABLES = {(ALTERNATE, True): FITS_TABLEAU}
+
+# Czy karta może leżeć na karcie top w kolumnie gry przy danym sposobie układania?
+def builds_on(card, top, build):
+    if top % 13 != card % 13 + 1:
+        return False
+    if build == ALTERNATE:
+        return top // 13 % 2 != card // 13 % 2
+    if build == SAME_SUIT:
+        return top // 13 == card // 13
+    return True
+
+class Mode:
+    # draw - liczba kart dobieranych naraz; top_only - czy można użyć tylko wierzchniej
+    # widocznej karty; passes - ile razy można przejrzeć talię (None - bez ograniczeń)
+    def __init__(self, label, description, draw, top_only=False, passes=None):
+        self.label = label
+        self.description = description
+        self.draw = draw
+        self.top_only = top_only
+        self.passes = passes
+
+class Rules:
+    # modes - (łatwy, trudny); kings_only - czy na pustą kolumnę można położyć tylko króla
+    def __init__(self, name, label, modes, decks=1, columns=7, waste=3, build=ALTERNATE, kings_only=True):
+        self.name = name # nazwa wariantu w plikach i w wierszu poleceń
+        self.label = label # nazwa wariantu w menu
+        self.modes = modes
+        self.decks = decks
+        self.columns = columns
+        self.waste = waste # liczba widocznych kart stosu rezerwowego
+        self.build = build
+        self.kings_only = kings_only
+
+KLONDIKE = Rules("klondike", "Klondike", (
+    Mode("Łatwy", "Można dobierać po 1 karcie.", 1),
+    Mode("Trudny", "Dobiera się 3 karty, ale użyć można tylko wierzchniej.", 3, top_only=True),
+))
+
+# KOMPILACJA ZASAD
+#
+# compile_rules() wylicza z zasad układ bufora stanu, numerację stosów, układ
+# zapisu ruchu i tablice pasowania kart, a potem tworzy klasę stanu, której
+# metody odwołują się do nich jak do stałych (zmienne domknięcia). Fragmenty
+# zależne od zasad są wybierane raz, przy kompilacji, a nie przy każdym ruchu.
+#
+# Stosy: kolumny gry (TABLEAU...), stosy końcowe (FOUNDATION...), widoczne karty
+# stosu rezerwowego (WASTE...) i stos rezerwowy STOCK. Ruch to krotka
+# (skąd, dokąd, liczba kart), a DRAW = (STOCK, STOCK, 0) to dobór karty.
+#
+# Układ stanu: cały stan mieści się w jednym buforze bajtów o stałym rozmiarze,
+# dzięki czemu kopia stanu to jedno kopiowanie pamięci, a stany można porównywać
+# i haszować. Karty odkryte i zakryte rozróżnia liczba kart zakrytych na spodzie
+# kolumny. Wierzchnie karty kolumn i liczniki (karty na stosach końcowych, karty
+# zakryte) są aktualizowane przy każdym ruchu, więc sprawdzenie ruchu, wygranej
+# i tego, czy partię można już dokończyć automatycznie, nie wymaga przeglądania stosów.
+#
+# Zapis ruchu: apply() zwraca liczbę, z której undo() odtwarza poprzedni stan:
+# skąd, dokąd, liczba kart (5 bitów), czy odkryto kartę w kolumnie (FLIPPED),
+# poprzednie przesunięcie i liczba widocznych kart stosu rezerwowego oraz, gdy
+# przekładanie talii jest ograniczone, czy dobór zaczął kolejne przejrzenie talii.
+# Pola mają tyle bitów, ile potrzeba — w klasycznym Klondike zapis ma 21 bitów.
+
+EMPTY = 0xFF # Pusty stos (końcowy albo kolumna gry w TOPS)
+
+def compile_rules(rules):
+    decks = rules.decks
+    CARDS = 52 * decks
+    T = rules.columns # liczba kolumn gry
+    F = 4 * decks # liczba stosów końcowych
+    W = rules.waste
+    DEALT = T * (T + 1) // 2 # w kolumnie r leży r+1 kart, wierzchnia odkryta
+    MAX_DECK = CARDS - DEALT
+
+    # Stosy
+    TABLEAU = 0
+    FOUNDATION = T
+    WASTE = FOUNDATION + F
+    STOCK = WASTE + W
+    DRAW = (STOCK, STOCK, 0)
+
+    # Układ stanu
+    HARD = 0 # Poziom trudności (indeks w rules.modes)
+    SHIFT = 1 # Przesunięcie kart w stosie rezerwowym
+    COD = 2 # Karty w stosie rezerwowym
+    DECK_LEN = 3 # Liczba kart w stosie rezerwowym
+    LENS = 4 # Długości kolumn gry (T)
+    HIDDEN = LENS + T # Liczba zakrytych kart w kolumnach gry (T)
+    DISCARD = HIDDEN + T # Wierzchnie karty stosów końcowych (F)
+    TOPS = DISCARD + F # Wierzchnie karty kolumn gry (T, EMPTY - pusta kolumna)
+    FOUNDED = TOPS + T # Liczba kart na stosach końcowych
+    FACEDOWN = FOUNDED + 1 # Liczba zakrytych kart we wszystkich kolumnach
+    DECK = FACEDOWN + 1 # Stos rezerwowy (MAX_DECK)
+    BOARD = DECK + MAX_DECK # Kolumny gry (T po COLUMN)
+    COLUMN = T - 1 + 13 # Najdłuższa możliwa kolumna: T-1 zakrytych kart i 13 odkrytych
+    PASSES = BOARD + T*COLUMN # Liczba rozpoczętych ponownie przejrzeń talii (tylko przy ograniczeniu)
+    LIMITED = any(mode.passes is not None for mode in rules.modes)
+    SIZE = PASSES + LIMITED
+
+    ZEROS = [bytes(n) for n in range(COLUMN+1)]
+
+    # Zapis ruchu
+    PILE_BITS = STOCK.bit_length()
+    PILE_MASK = (1 << PILE_BITS) - 1
+    COUNT_AT = 2 * PILE_BITS
+    FLIPPED = 1 << COUNT_AT + 5
+    SHIFT_AT = COUNT_AT + 6
+    SHIFT_MASK = (1 << MAX_DECK.bit_length()) - 1
+    COD_AT = SHIFT_AT + MAX_DECK.bit_length()
+    COD_MASK = (1 << W.bit_length()) - 1
+    WRAPPED = 1 << COD_AT + W.bit_length()
+
+    # Tablice zasad dla poziomów trudności: liczba dobieranych kart, czy tylko
+    # wierzchnia karta, ile razy można zacząć przeglądanie talii od nowa
+    STEP = tuple(mode.draw for mode in rules.modes)
+    TOP_ONLY = bytes(mode.top_only for mode in rules.modes)
+    REDEALS = tuple(0xFF if mode.passes is None else mode.passes - 1 for mode in rules.modes)
+
+    # Tablica pasowania kart w kolumnach gry (patrz fits_table); stosy końcowe
+    # są takie same we wszystkich wariantach (FITS_FOUNDATION)
+    build, kings_only = rules.build, rules.kings_only
+    FITS_TABLEAU = TABLEAU_TABLES.get((build, kings_only))
+    if FITS_TABLEAU is None:
+        FITS_TABLEAU = TABLEAU_TABLES[build, kings_only] = fits_table(
+            lambda card, top: (card % 13 == 12 or not kings_only) if top is None else builds_on(card, top, build))
+    # Kolory kart, które mogą leżeć na karcie danego koloru (dla is_safe)
+    COVERING = [tuple(s for s in range(4) if builds_on(s*13 + 1, suit*13 + 2, build)) for suit in range(4)]
+
+    # Wskaźniki stosu rezerwowego (przesunięcie, liczba kart) po doborze karty
+    def draw_pointers(length, shift, cod, hard):
+        # Czy wszystkie karty w talii zostały przejrzane?
+        # Talia jest odwracana bez tasowania, więc dobór można cofnąć
+        if shift + min(cod, length) >= length:
+            return 0, 0
+
+        step = STEP[hard]
+        if cod == W: shift += step
+        cod = min(cod + step, W)
+
+        vis = min(cod, length)
+        if shift + vis >= length: shift = length - vis
+        return shift, cod
+
+    cycles = {}
+
+    # Położenia stosu rezerwowego osiągalne samym dobieraniem kart, aż do powrotu
+    # do położenia początkowego (albo, gdy redeal jest fałszem, do końca talii):
+    # krotki (liczba doborów, przesunięcie, liczba widocznych kart)
+    def stock_cycle(length, shift, cod, hard, redeal=True):
+        key = (length, shift, cod, hard, redeal)
+        cycle = cycles.get(key)
+        if cycle is None:
+            cycle = []
+            seen = set()
+            pointers = (shift, cod)
+            draws = 0
+            while pointers not in seen:
+                seen.add(pointers)
+                cycle.append((draws, pointers[0], min(pointers[1], length)))
+                if not redeal and pointers[0] + min(pointers[1], length) >= length:
+                    break
+                pointers = draw_pointers(length, pointers[0], pointers[1], hard)
+                draws += 1
+            cycle = cycles[key] = tuple(cycle)
+        return cycle
+
+    def record_move(record):
+        return (record & PILE_MASK, record >> PILE_BITS & PILE_MASK, record >> COUNT_AT & 31)
+
+    # Czy zapis dotyczy doboru karty (a nie przeniesienia)?
+    def is_draw(record):
+        return record & PILE_MASK == STOCK
+
+    # Czy kartę można bezpiecznie odłożyć na stos końcowy? Tak, jeśli żadna karta
+    # o wartości niższej o 1, która mogłaby na niej leżeć, nie jest już potrzebna
+    # w kolumnach gry (wszystkie takie karty są na stosach końcowych).
+    if decks == 1 and build == ALTERNATE:
+        def is_safe(card, state):
+            v = card % 13
+            if v <= 1:
+                return True
+            heights = [0, 0, 0, 0]
+            for c in state.buf[DISCARD:DISCARD+4]:
+                if c != EMPTY:
+                    heights[c // 13] = c % 13 + 1
+            red = card // 13 % 2
+            return heights[1 - red] >= v and heights[3 - red] >= v
+    else:
+        def is_safe(card, state):
+            v = card % 13
+            if v <= 1:
+                return True
+            # Wysokość koloru to najniższy z jego stosów (0, gdy któryś stos jeszcze nie powstał)
+            piles = [0, 0, 0, 0]
+            heights = [13, 13, 13, 13]
+            for c in state.buf[DISCARD:DISCARD+F]:
+                if c != EMPTY:
+                    piles[c // 13] += 1
+                    if c % 13 + 1 < heights[c // 13]:
+                        heights[c // 13] = c % 13 + 1
+            for s in COVERING[card // 13]:
+                if piles[s] < decks or heights[s] < v:
+                    return False
+            return True
+
+    # Kolumny gry, na które pasuje karta (tops - wierzchnie karty kolumn), rosnąco.
+    # Przy jednej talii i układaniu na przemian kolorami miejsca znajduje
+    # bytearray.find dla dwóch możliwych kart pod spodem (patrz PARENTS)
+    if decks == 1 and build == ALTERNATE and kings_only:
+        def targets(card, tops, empty):
+            if card % 13 == 12:
+                return empty
+            a, b = PARENTS[card]
+            a, b = tops.find(a), tops.find(b)
+            return [d for d in ((a, b) if a < b else (b, a)) if d >= 0]
+    else:
+        def targets(card, tops, empty):
+            card <<= 8
+            return [d for d in range(T) if FITS_TABLEAU[card | tops[d]]]
+
+    class Klondike:
+        __slots__ = ("buf",)
+
+        def __init__(self, hard=False):
+            self.buf = bytearray(SIZE)
+            self.buf[HARD] = hard
+            self.buf[DISCARD:DISCARD+F] = b"\xff" * F
+            self.buf[TOPS:TOPS+T] = b"\xff" * T
+
+        # Rozdanie gry o danym numerze
+        @classmethod
+        def deal(cls, hard=False, seed=0):
+            state = cls(hard)
+            buf = state.buf
+            deck = shuffled_deck(seed, decks)
+
+            # Rozłożenie kart do kolumn gry — wierzchnia karta jest odkryta
+            for r in range(T):
+                buf[BOARD+r*COLUMN:BOARD+r*COLUMN+r+1] = bytes(deck[:r+1])
+                buf[LENS+r] = r+1
+                buf[HIDDEN+r] = r
+                buf[TOPS+r] = deck[r]
+                del deck[:r+1]
+
+            buf[FACEDOWN] = DEALT - T
+
+            buf[DECK:DECK+len(deck)] = bytes(deck)
+            buf[DECK_LEN] = len(deck)
+            return state
+
+        # Stan odczytany z bufora (np. z pliku); bufor jest kopiowany
+        @classmethod
+        def from_bytes(cls, data):
+            state = cls.__new__(cls)
+            state.buf = bytearray(data)
+            return state
+
+        def to_bytes(self):
+            return bytes(self.buf)
+
+        def copy(self):
+            state = Klondike.__new__(Klondike)
+            state.buf = self.buf[:]
+            return state
+
+        def __eq__(self, other):
+            return isinstance(other, Klondike) and self.buf == other.buf
+
+        def __hash__(self):
+            return hash(bytes(self.buf))
+
+        @property
+        def hard(self):
+            return self.buf[HARD] != 0
+
+        # Poziom trudności partii (Mode)
+        @property
+        def mode(self):
+            return rules.modes[self.buf[HARD]]
+
+        @property
+        def deck_shift(self):
+            return self.buf[SHIFT]
+
+        @property
+        def cards_on_deck(self):
+            return self.buf[COD]
+
+        # Karty w stosie rezerwowym
+        @property
+        def deck(self):
+            return bytes(self.buf[DECK:DECK+self.buf[DECK_LEN]])
+
+        # Karty w kolumnie gry (od spodu)
+        def column(self, r):
+            o = BOARD + r*COLUMN
+            return bytes(self.buf[o:o+self.buf[LENS+r]])
+
+        # Liczba zakrytych kart w kolumnie gry
+        def hidden(self, r):
+            return self.buf[HIDDEN+r]
+
+        # Ile kart jest widocznych na stosie rezerwowym?
+        def visible(self):
+            buf = self.buf
+            return buf[COD] if buf[COD] < buf[DECK_LEN] else buf[DECK_LEN]
+
+        # Czy w stosie rezerwowym zostały jakieś niedobrane karty?
+        def stock_left(self):
+            return self.buf[SHIFT] + self.visible() < self.buf[DECK_LEN]
+
+        # Czy talię można jeszcze raz przejrzeć od początku?
+        def can_redeal(self):
+            return not LIMITED or self.buf[PASSES] < REDEALS[self.buf[HARD]]
+
+        # Widoczna karta stosu rezerwowego (0 - pierwsza od lewej)
+        def waste_card(self, i):
+            return self.buf[DECK + self.buf[SHIFT] + i]
+
+        # Wierzchnia karta stosu (None - stos pusty)
+        def top(self, pile):
+            if pile < WASTE:
+                card = self.buf[TOPS+pile if pile < FOUNDATION else DISCARD+pile-FOUNDATION]
+                return None if card == EMPTY else card
+            return None
+
+        def is_won(self):
+            return self.buf[FOUNDED] == CARDS
+
+        # Czy wszystkie karty są odkryte, a stos rezerwowy pusty? Wtedy partia jest
+        # wygrana: najniższa karta poza stosami końcowymi zawsze leży na wierzchu kolumny
+        def can_finish(self):
+            return self.buf[FACEDOWN] == 0 and self.buf[DECK_LEN] == 0
+
+        # Ruchy kończące partię, w której can_finish() jest prawdą: kolejne karty
+        # z wierzchów kolumn na stosy końcowe (stan nie jest zmieniany)
+        def finishing_moves(self):
+            state = self.copy()
+            buf = state.buf
+            moves = []
+            while buf[FOUNDED] < CARDS:
+                for r in range(T):
+                    card = buf[TOPS+r]
+                    if card == EMPTY:
+                        continue
+                    f = buf.find(EMPTY if card % 13 == 0 else card - 1, DISCARD, DISCARD+F)
+                    if f >= 0:
+                        move = (TABLEAU + r, FOUNDATION + f - DISCARD, 1)
+                        state.apply(move)
+                        moves.append(move)
+            return moves
+
+        # Bezpieczny ruch na stos końcowy (patrz is_safe) z wierzchu kolumny albo
+        # ze stosu rezerwowego; None - brak takiego ruchu
+        def safe_move(self):
+            buf = self.buf
+            sources = [(TABLEAU + r, buf[TOPS+r]) for r in range(T) if buf[TOPS+r] != EMPTY]
+            vis = self.visible()
+            for i in range(vis - 1 if TOP_ONLY[buf[HARD]] and vis else 0, vis):
+                sources.append((WASTE + i, buf[DECK + buf[SHIFT] + i]))
+            for src, card in sources:
+                f = buf.find(EMPTY if card % 13 == 0 else card - 1, DISCARD, DISCARD+F)
+                if f >= 0 and is_safe(card, self):
+                    return (src, FOUNDATION + f - DISCARD, 1)
+            return None
+
+        # Karty stosu rezerwowego, które można zagrać w ciągu najbliższych k doborów
+        # (None - w całym obiegu talii): krotki (liczba doborów, stos WASTE+i, karta),
+        # każda karta raz — przy najmniejszej liczbie doborów. Dobór i obieg talii to
+        # tylko zmiana wskaźników, więc całą drogę wyznacza stock_cycle() bez ruszania kart.
+        def stock_reach(self, k=None):
+            buf = self.buf
+            length = buf[DECK_LEN]
+            if not length:
+                return []
+            hard = buf[HARD]
+            top_only = TOP_ONLY[hard]
+            reach = []
+            seen = bytearray(length) # miejsca kart w stosie rezerwowym
+            for draws, shift, vis in stock_cycle(length, buf[SHIFT], buf[COD], hard, self.can_redeal()):
+                if k is not None and draws > k:
+                    break
+                # Na poziomie trudnym można użyć tylko wierzchniej karty
+                for i in range(vis - 1 if top_only and vis else 0, vis):
+                    if not seen[shift + i]:
+                        seen[shift + i] = 1
+                        reach.append((draws, WASTE + i, buf[DECK + shift + i]))
+            return reach
+
+        # Karta, która zostanie przeniesiona (None - ruch niemożliwy ze względu na źródło)
+        def moving_card(self, move):
+            src, dst, n = move
+            buf = self.buf
+            if src < FOUNDATION:
+                length = buf[LENS+src]
+                if n < 1 or n > length - buf[HIDDEN+src] or n > 1 and dst >= FOUNDATION:
+                    return None
+                return buf[BOARD+src*COLUMN+length-n]
+            if src < WASTE:
+                if n != 1 or dst >= FOUNDATION:
+                    return None
+                return self.top(src)
+            if src < STOCK:
+                i = src - WASTE
+                vis = self.visible()
+                # Na poziomie trudnym można użyć tylko wierzchniej karty
+                if n != 1 or i >= vis or TOP_ONLY[buf[HARD]] and i != vis - 1:
+                    return None
+                return buf[DECK + buf[SHIFT] + i]
+            return None
+
+        def is_legal(self, move):
+            src, dst, n = move
+            if src == STOCK:
+                return move == DRAW and self.buf[DECK_LEN] > 0 and (not LIMITED or self.stock_left() or self.can_redeal())
+            if src == dst or dst >= WASTE:
+                return False
+            card = self.moving_card(move)
+            if card is None:
+                return False
+            if dst < FOUNDATION:
+                return FITS_TABLEAU[card << 8 | self.buf[TOPS+dst]] == 1
+            return FITS_FOUNDATION[card << 8 | self.buf[DISCARD+dst-FOUNDATION]] == 1
+
+        # Wszystkie dozwolone ruchy. As trafia tylko na pierwszy wolny stos końcowy
+        # (przy dwóch taliach każda karta na pierwszy pasujący stos), bo pozostałe
+        # takie ruchy prowadzą do tego samego stanu z zamienionymi stosami.
+        def legal_moves(self):
+            moves = []
+            buf = self.buf
+            tops = buf[TOPS:TOPS+T]
+            ftops = buf[DISCARD:DISCARD+F]
+            free_foundation = ftops.find(EMPTY)
+
+            # Źródła pojedynczych kart: wierzchnie karty kolumn i widoczne karty stosu rezerwowego
+            singles = [(TABLEAU + r, tops[r]) for r in range(T) if tops[r] != EMPTY]
+            vis = self.visible()
+            for i in range(vis - 1 if TOP_ONLY[buf[HARD]] and vis else 0, vis):
+                singles.append((WASTE + i, buf[DECK + buf[SHIFT] + i]))
+
+            # Na stosy końcowe
+            for src, card in singles:
+                if card % 13 == 0:
+                    if free_foundation >= 0:
+                        moves.append((src, FOUNDATION + free_foundation, 1))
+                else:
+                    f = ftops.find(card - 1)
+                    if f >= 0:
+                        moves.append((src, FOUNDATION + f, 1))
+
+            # Między kolumnami gry
+            empty = [d for d in range(T) if tops[d] == EMPTY]
+            for r in range(T):
+                o = BOARD + r*COLUMN + buf[LENS+r]
+                for n in range(1, buf[LENS+r] - buf[HIDDEN+r] + 1):
+                    for d in targets(buf[o-n], tops, empty):
+                        if d != r:
+                            moves.append((TABLEAU + r, TABLEAU + d, n))
+
+            # Ze stosu rezerwowego i ze stosów końcowych na kolumny gry
+            sources = [s for s in singles if s[0] >= WASTE]
+            sources += [(FOUNDATION + f, ftops[f]) for f in range(F) if ftops[f] != EMPTY]
+            for src, card in sources:
+                for d in targets(card, tops, empty):
+                    moves.append((src, TABLEAU + d, 1))
+
+            if buf[DECK_LEN] and (not LIMITED or self.stock_left() or self.can_redeal()):
+                moves.append(DRAW)
+
+            return moves
+
+        # Wykonanie ruchu. Zakłada, że ruch jest dozwolony (patrz is_legal). Zwraca zapis ruchu
+        def apply(self, move):
+            src, dst, n = move
+            buf = self.buf
+            record = src | dst << PILE_BITS | n << COUNT_AT | buf[SHIFT] << SHIFT_AT | buf[COD] << COD_AT
+
+            if src == STOCK:
+                self.draw()
+                # Dobór, po którym oba wskaźniki są zerami, zaczyna kolejne przejrzenie talii
+                if LIMITED and buf[SHIFT] == buf[COD] == 0:
+                    buf[PASSES] += 1
+                    record |= WRAPPED
+                return record
+
+            if src < FOUNDATION:
+                length = buf[LENS+src] - n
+                o = BOARD + src*COLUMN + length
+                cards = buf[o:o+n]
+                buf[o:o+n] = ZEROS[n]
+                buf[LENS+src] = length
+                buf[TOPS+src] = buf[o-1] if length else EMPTY
+                # Odkrycie karty, która została na wierzchu
+                if length and buf[HIDDEN+src] == length:
+                    buf[HIDDEN+src] -= 1
+                    buf[FACEDOWN] -= 1
+                    record |= FLIPPED
+            elif src < WASTE:
+                card = buf[DISCARD+src-FOUNDATION]
+                buf[DISCARD+src-FOUNDATION] = EMPTY if card % 13 == 0 else card - 1
+                buf[FOUNDED] -= 1
+                cards = (card,)
+            else:
+                length = buf[DECK_LEN] - 1
+                o = DECK + buf[SHIFT] + src - WASTE
+                cards = (buf[o],)
+                buf[o:DECK+length] = buf[o+1:DECK+length+1]
+                buf[DECK+length] = 0
+                buf[DECK_LEN] = length
+                if buf[SHIFT] > 0: buf[SHIFT] -= 1
+                elif self.visible() > 0: buf[COD] -= 1
+
+            if dst < FOUNDATION:
+                o = BOARD + dst*COLUMN + buf[LENS+dst]
+                buf[o:o+n] = cards
+                buf[LENS+dst] += n
+                buf[TOPS+dst] = cards[-1]
+            else:
+                buf[DISCARD+dst-FOUNDATION] = cards[0]
+                buf[FOUNDED] += 1
+
+            return record
+
+        # Cofnięcie ruchu na podstawie jego zapisu (musi to być ostatni wykonany ruch)
+        def undo(self, record):
+            buf = self.buf
+            src, dst, n = record & PILE_MASK, record >> PILE_BITS & PILE_MASK, record >> COUNT_AT & 31
+            shift, cod = record >> SHIFT_AT & SHIFT_MASK, record >> COD_AT & COD_MASK
+
+            if src != STOCK:
+                # Zdjęcie kart ze stosu docelowego
+                if dst < FOUNDATION:
+                    length = buf[LENS+dst] - n
+                    o = BOARD + dst*COLUMN + length
+                    cards = buf[o:o+n]
+                    buf[o:o+n] = ZEROS[n]
+                    buf[LENS+dst] = length
+                    buf[TOPS+dst] = buf[o-1] if length else EMPTY
+                else:
+                    card = buf[DISCARD+dst-FOUNDATION]
+                    buf[DISCARD+dst-FOUNDATION] = EMPTY if card % 13 == 0 else card - 1
+                    buf[FOUNDED] -= 1
+                    cards = (card,)
+
+                # Odłożenie ich na stos źródłowy
+                if src < FOUNDATION:
+                    o = BOARD + src*COLUMN + buf[LENS+src]
+                    buf[o:o+n] = cards
+                    buf[LENS+src] += n
+                    buf[TOPS+src] = cards[-1]
+                    if record & FLIPPED:
+                        buf[HIDDEN+src] += 1
+                        buf[FACEDOWN] += 1
+                elif src < WASTE:
+                    buf[DISCARD+src-FOUNDATION] = cards[0]
+                    buf[FOUNDED] += 1
+                else:
+                    length = buf[DECK_LEN]
+                    o = DECK + shift + src - WASTE
+                    buf[o+1:DECK+length+1] = buf[o:DECK+length]
+                    buf[o] = cards[0]
+                    buf[DECK_LEN] = length + 1
+            elif LIMITED and record & WRAPPED:
+                buf[PASSES] -= 1
+
+            buf[SHIFT] = shift
+            buf[COD] = cod
+
+        # Dobór karty ze stosu rezerwowego
+        def draw(self):
+            buf = self.buf
+            buf[SHIFT], buf[COD] = draw_pointers(buf[DECK_LEN], buf[SHIFT], buf[COD], buf[HARD])
+
+    Klondike.rules = rules
+    Klondike.record_move = staticmethod(record_move)
+    Klondike.is_draw = staticmethod(is_draw)
+    Klondike.is_safe = staticmethod(is_safe)
+    Klondike.draw_pointers = staticmethod(draw_pointers)
+    Klondike.stock_cycle = staticmethod(stock_cycle)
+    # Stałe wariantu (numeracja stosów, układ stanu, zapis ruchu, tablice pasowania)
+    for name, value in locals().copy().items():
+        if name.isupper():
+            setattr(Klondike, name, value)
+    Klondike.FITS_FOUNDATION = FITS_FOUNDATION
+    return Klondike
+
+# KLASYCZNY KLONDIKE
+#
+# Stan klasycznej gry i jego stałe na poziomie modułu — rozwiązywacz, pamięć
+# pozycji, środowisko do uczenia i zapisy partii znają tylko ten wariant.
+
+Klondike = compile_rules(KLONDIKE)
+
+TABLEAU, FOUNDATION, WASTE, STOCK, DRAW = Klondike.TABLEAU, Klondike.FOUNDATION, Klondike.WASTE, Klondike.STOCK, Klondike.DRAW
+HARD, SHIFT, COD, DECK_LEN = Klondike.HARD, Klondike.SHIFT, Klondike.COD, Klondike.DECK_LEN
+LENS, HIDDEN, DISCARD, TOPS = Klondike.LENS, Klondike.HIDDEN, Klondike.DISCARD, Klondike.TOPS
+FOUNDED, FACEDOWN, DECK, BOARD = Klondike.FOUNDED, Klondike.FACEDOWN, Klondike.DECK, Klondike.BOARD
+COLUMN, SIZE, ZEROS, FLIPPED = Klondike.COLUMN, Klondike.SIZE, Klondike.ZEROS, Klondike.FLIPPED
+
+record_move = Klondike.record_move
+is_draw = Klondike.is_draw
+is_safe = Klondike.is_safe
+draw_pointers = Klondike.draw_pointers
+stock_cycle = Klondike.stock_cycle
+
+# HISTORIA RUCHÓW
+#
+# Nieograniczone cofanie i ponawianie ruchów. Każdy ruch zajmuje 4 bajty zapisu.
+
+class History:
+    __slots__ = ("done", "undone")
+
+    def __init__(self):
+        self.done = array("I") # zapisy wykonanych ruchów
+        self.undone = array("I") # zapisy cofniętych ruchów (do ponowienia)
+
+    def __len__(self):
+        return len(self.done)
+
+    # Wykonanie ruchu — nowy ruch unieważnia cofnięte ruchy
+    def apply(self, state, move):
+        record = state.apply(move)
+        self.done.append(record)
+        if self.undone:
+            del self.undone[:]
+        return record
+
+    # Cofnięcie ostatniego ruchu (None - brak ruchów)
+    def undo(self, state):
+        if not self.done:
+            return None
+        record = self.done.pop()
+        state.undo(record)
+        self.undone.append(record)
+        return record
+
+    # Ponowienie ostatnio cofniętego ruchu (None - brak ruchów)
+    def redo(self, state):
+        if not self.undone:
+            return None
+        record = state.apply(state.record_move(self.undone.pop()))
+        self.done.append(record)
+        return record
+
+    # Następny ruch do ponowienia (None - brak)
+    def next_redo(self):
+        return self.undone[-1] if self.undone else None
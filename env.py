@@ -0,0 +1,331 @@
+# ŚRODOWISKO DO UCZENIA STRATEGII
+#
+# Wiele partii naraz w jednej tablicy NumPy (N, SIZE). Każdy wiersz to dokładnie
+# bufor stanu z engine.py, więc dowolną partię można obejrzeć jako
+# Klondike.from_bytes(env.state[i]). Zasady (dozwolone akcje, wykonanie ruchu,
+# obserwacje) są liczone na całych tablicach — bez obiektów Pythona dla
+# pojedynczych partii — co daje kilkadziesiąt tysięcy kroków na sekundę na rdzeń
+# (ok. 55–60 tysięcy przy 4096 partiach w jednej tablicy).
+#
+# Wymaga NumPy (sama gra go nie potrzebuje).
+
+import numpy as np
+
+from engine import (
+    shuffled_decks, fits_tableau, Klondike, SEEDS, DRAW, FOUNDATION, WASTE, STOCK,
+    HARD, SHIFT, COD, DECK_LEN, LENS, HIDDEN, DISCARD, TOPS, FOUNDED, FACEDOWN, DECK, BOARD, COLUMN, SIZE, EMPTY,
+)
+
+# AKCJE
+#
+# 0 - dobór karty; 1 + src*DESTS + dst - przeniesienie ze stosu src (numeracja
+# stosów z engine.py: kolumny gry, stosy końcowe, widoczne karty stosu
+# rezerwowego) na stos dst (kolumna gry albo stos końcowy). Liczba
+# przenoszonych kart wynika z ruchu — pasuje najwyżej jedna.
+
+SOURCES = STOCK # 14
+DESTS = WASTE # 11
+ACTIONS = 1 + SOURCES * DESTS
+
+# Akcja odpowiadająca ruchowi silnika
+def action_of(move):
+    if move == DRAW:
+        return 0
+    return 1 + move[0] * DESTS + move[1]
+
+# OBSERWACJE
+#
+# Płaska tablica uint8 (N, OBS_SIZE): PLANES płaszczyzn po 52 pola (jedno na kartę),
+# a po nich nagłówek bufora stanu (poziom trudności, wskaźniki stosu rezerwowego,
+# długości kolumn i liczby zakrytych kart).
+
+COLUMNS = 0 # 7 płaszczyzn: odkryta karta leży w kolumnie gry
+FOUNDATIONS = 7 # 4 płaszczyzny: karta leży na stosie końcowym
+IN_STOCK = 11 # karta jest w stosie rezerwowym
+SHOWN = 12 # karta jest widoczna na stosie rezerwowym
+MOVABLE = 13 # kartę można teraz ruszyć
+DEPTH = 14 # położenie karty w kolumnie gry albo w stosie rezerwowym
+PLANES = 15
+OBS_SIZE = PLANES * 52 + DISCARD
+
+# Rozłożenie talii: pozycja w talii -> pozycja w buforze stanu
+DEAL = np.array([BOARD + r * COLUMN + c for r in range(7) for c in range(r + 1)])
+
+# Tablice zasad indeksowane wierzchnią kartą kolumny + 1 (0 - pusta kolumna):
+# FITS[karta, wierzch + 1] - czy karta pasuje na kolumnę (karta -1 nigdy nie pasuje),
+# CANDIDATES[wierzch + 1] - karty, które mogą na nią trafić (uzupełnione liczbą 52)
+FITS = np.zeros((53, 53), dtype=bool)
+CANDIDATES = np.full((53, 4), 52)
+for top in range(-1, 52):
+    cards = [c for c in range(52) if fits_tableau(c, None if top < 0 else top)]
+    FITS[cards, top + 1] = True
+    CANDIDATES[top + 1, :len(cards)] = cards
+
+class BatchEnv:
+    # finish - partie, w których wszystkie karty są odkryte, a stos rezerwowy pusty
+    # (Klondike.can_finish), są od razu kończone zamiast rozgrywania ich do końca
+    def __init__(self, hard=False, finish=False):
+        self.hard = hard
+        self.finish = finish
+        self.rng = np.random.default_rng()
+        self.reset(0)
+
+    # Nowe partie: n losowych rozdań albo rozdania o podanych numerach.
+    # Zwraca obserwacje i maskę dozwolonych akcji.
+    def reset(self, n=None, seeds=None):
+        if seeds is None:
+            seeds = self.rng.integers(0, SEEDS, n, dtype=np.uint64)
+        seeds = np.asarray(seeds, dtype=np.uint64)
+        decks = shuffled_decks(seeds)
+        n = len(seeds)
+
+        state = np.zeros((n, SIZE), dtype=np.uint8)
+        state[:, HARD] = self.hard
+        state[:, LENS:LENS+7] = np.arange(1, 8)
+        state[:, HIDDEN:HIDDEN+7] = np.arange(7)
+        state[:, DISCARD:DISCARD+4] = EMPTY
+        state[:, DEAL] = decks[:, :len(DEAL)]
+        state[:, TOPS:TOPS+7] = decks[:, [r * (r + 3) // 2 for r in range(7)]]
+        state[:, FACEDOWN] = 21
+        state[:, DECK:DECK+52-len(DEAL)] = decks[:, len(DEAL):]
+        state[:, DECK_LEN] = 52 - len(DEAL)
+
+        self.seeds = seeds
+        self.state = state
+        self._analyze()
+        return self.observe(), self.mask
+
+    # Wykonanie po jednej akcji w każdej partii. Akcje w zakończonych partiach są
+    # pomijane. Zwraca obserwacje, nagrody (zmiana liczby kart na stosach końcowych),
+    # zakończenie partii i maskę dozwolonych akcji.
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.intp)
+        active = ~self.done
+        illegal = active & ~self.mask[np.arange(len(actions)), actions]
+        if illegal.any():
+            raise ValueError("niedozwolone akcje w partiach " + str(np.flatnonzero(illegal)[:10].tolist()))
+
+        before = self._foundation_cards()
+        self._draw(np.flatnonzero(active & (actions == 0)))
+        self._move(np.flatnonzero(active & (actions > 0)), actions)
+        if self.finish:
+            self._finish()
+        self._analyze()
+        return self.observe(), self._foundation_cards() - before, self.done, self.mask
+
+    # Partia jako obiekt silnika (kopia)
+    def game(self, i):
+        return Klondike.from_bytes(self.state[i].tobytes())
+
+    # Ruch silnika odpowiadający dozwolonej akcji w partii i
+    def move(self, i, action):
+        if action == 0:
+            return DRAW
+        src, dst = divmod(action - 1, DESTS)
+        if src < FOUNDATION and dst < FOUNDATION:
+            return (src, dst, int(self._counts[i, src, dst]))
+        return (src, dst, 1)
+
+    # Obserwacje wszystkich partii
+    def observe(self):
+        n = len(self.state)
+        planes = np.zeros((n, PLANES, 52), dtype=np.uint8)
+
+        # Odkryte karty kolumn gry
+        g, r, p = np.nonzero(self._faceup)
+        cards = self._cards[g, r, p]
+        planes[g, COLUMNS + r, cards] = 1
+        planes[g, MOVABLE, cards] = 1
+        planes[g, DEPTH, cards] = p
+
+        # Stosy końcowe
+        ftops = self._ftops[:, :, None]
+        card = np.arange(52)
+        planes[:, FOUNDATIONS:FOUNDATIONS+4] = (ftops >= 0) & (card // 13 == ftops // 13) & (card % 13 <= ftops % 13)
+        g, f = np.nonzero(self._ftops >= 0)
+        planes[g, MOVABLE, self._ftops[g, f]] = 1
+
+        # Stos rezerwowy
+        g, j = np.nonzero(np.arange(24) < self.state[:, DECK_LEN, None])
+        cards = self.state[g, DECK + j]
+        planes[g, IN_STOCK, cards] = 1
+        planes[g, DEPTH, cards] = j
+        g, i = np.nonzero(self._shown)
+        planes[g, SHOWN, self._waste[g, i]] = 1
+        g, i = np.nonzero(self._waste >= 0)
+        planes[g, MOVABLE, self._waste[g, i]] = 1
+
+        return np.concatenate((planes.reshape(n, PLANES * 52), self.state[:, :DISCARD]), axis=1)
+
+    # Liczba kart na stosach końcowych w każdej partii
+    def _foundation_cards(self):
+        return self.state[:, FOUNDED].astype(np.intp)
+
+    # Wierzchnie karty, dozwolone akcje i zakończenie partii dla bieżącego stanu
+    def _analyze(self):
+        state = self.state
+        n = len(state)
+        rows = np.arange(n)
+
+        cards = state[:, BOARD:].reshape(n, 7, COLUMN).astype(np.int16)
+        lens = state[:, LENS:LENS+7].astype(np.intp)
+        pos = np.arange(COLUMN)
+        faceup = (pos >= state[:, HIDDEN:HIDDEN+7, None]) & (pos < lens[:, :, None])
+        tops = state[:, TOPS:TOPS+7].astype(np.int16)
+        tops[tops == EMPTY] = -1
+
+        ftops = state[:, DISCARD:DISCARD+4].astype(np.int16)
+        ftops[ftops == EMPTY] = -1
+
+        # Widoczne karty stosu rezerwowego; na poziomie trudnym grać można tylko wierzchnią
+        length = state[:, DECK_LEN].astype(np.intp)
+        vis = np.minimum(state[:, COD], length)
+        slot = np.arange(3)
+        shown = slot < vis[:, None]
+        idx = np.minimum(state[:, SHIFT, None] + slot, 23)
+        waste = state[:, DECK:DECK+24][rows[:, None], idx].astype(np.int16)
+        playable = shown & (slot == vis[:, None] - 1) if self.hard else shown
+        waste[~playable] = -1
+
+        # Pojedyncze karty do przeniesienia: wierzchnie karty kolumn, stosów końcowych i stosu rezerwowego
+        singles = np.concatenate((tops, ftops, waste), axis=1)
+        moves = np.zeros((n, SOURCES, DESTS), dtype=bool)
+
+        # Na stosy końcowe (z kolumn gry i ze stosu rezerwowego). As trafia na pierwszy wolny stos
+        free = ftops < 0
+        first_free = np.where(free.any(axis=1), free.argmax(axis=1), -1)
+        ace = (singles % 13 == 0)[:, :, None] & (np.arange(4) == first_free[:, None, None])
+        follows = (singles[:, :, None] == ftops[:, None, :] + 1) & (singles % 13 != 0)[:, :, None]
+        to_foundation = (singles >= 0)[:, :, None] & (ace | follows)
+        moves[:, :7, FOUNDATION:] = to_foundation[:, :7]
+        moves[:, WASTE:, FOUNDATION:] = to_foundation[:, WASTE:]
+
+        # Na kolumny gry ze stosów końcowych i ze stosu rezerwowego
+        moves[:, FOUNDATION:, :7] = FITS[singles[:, FOUNDATION:, None], tops[:, None, :] + 1]
+
+        # Między kolumnami gry: na kolumnę pasuje najwyżej jedna odkryta karta innej kolumny.
+        # Położenie każdej odkrytej karty (kolumna*COLUMN + pozycja, -1 - brak) pozwala
+        # sprawdzić tylko karty, które mogą na nią trafić
+        g, r, p = np.nonzero(faceup)
+        where = np.full((n, 53), -1, dtype=np.intp)
+        where[g, cards[g, r, p]] = r * COLUMN + p
+        found = where[rows[:, None, None], CANDIDATES[tops + 1]]
+        g, d, c = np.nonzero(found >= 0)
+        r, p = np.divmod(found[g, d, c], COLUMN)
+        other = r != d
+        g, r, d, p = g[other], r[other], d[other], p[other]
+        moves[g, r, d] = True
+        self._counts = np.zeros((n, 7, 7), dtype=np.intp)
+        self._counts[g, r, d] = lens[g, r] - p
+
+        self.mask = np.empty((n, ACTIONS), dtype=bool)
+        self.mask[:, 0] = length > 0
+        self.mask[:, 1:] = moves.reshape(n, SOURCES * DESTS)
+
+        self.won = state[:, FOUNDED] == 52
+        self.done = self.won | ~self.mask.any(axis=1)
+
+        self._cards, self._faceup, self._ftops, self._waste, self._shown = cards, faceup, ftops, waste, shown
+
+    # Zakończenie przesądzonych partii: wszystkie karty trafiają na stosy końcowe
+    def _finish(self):
+        state = self.state
+        g = np.flatnonzero((state[:, FACEDOWN] == 0) & (state[:, DECK_LEN] == 0) & (state[:, FOUNDED] < 52))
+        if not len(g):
+            return
+
+        # Kolory, których asy nie leżą jeszcze na stosach, trafiają kolejno na puste stosy
+        ftops = state[g, DISCARD:DISCARD+4]
+        empty = ftops == EMPTY
+        present = np.zeros((len(g), 4), dtype=bool)
+        rows, f = np.nonzero(~empty)
+        present[rows, ftops[rows, f] // 13] = True
+        missing = np.argsort(present, axis=1, kind="stable")
+        piles = np.argsort(~empty, axis=1, kind="stable")
+        ftops = np.where(empty, 0, ftops // 13 * 13 + 12)
+        for j in range(4):
+            rows = np.flatnonzero(j < empty.sum(axis=1))
+            ftops[rows, piles[rows, j]] = missing[rows, j] * 13 + 12
+
+        state[g, DISCARD:DISCARD+4] = ftops
+        state[g, FOUNDED] = 52
+        state[g, LENS:LENS+7] = 0
+        state[g, TOPS:TOPS+7] = EMPTY
+        state[g, BOARD:] = 0
+
+    # Dobór karty (jak draw_pointers w engine.py) w partiach g
+    def _draw(self, g):
+        state = self.state
+        length = state[g, DECK_LEN].astype(np.intp)
+        shift = state[g, SHIFT].astype(np.intp)
+        cod = state[g, COD].astype(np.intp)
+
+        recycle = shift + np.minimum(cod, length) >= length
+        step = 3 if self.hard else 1
+        shift = np.where(cod == 3, shift + step, shift)
+        cod = np.minimum(cod + step, 3)
+        vis = np.minimum(cod, length)
+        shift = np.where(shift + vis >= length, length - vis, shift)
+
+        state[g, SHIFT] = np.where(recycle, 0, shift)
+        state[g, COD] = np.where(recycle, 0, cod)
+
+    # Przeniesienie kart (jak Klondike.apply) w partiach g
+    def _move(self, g, actions):
+        state = self.state
+        src, dst = np.divmod(actions[g] - 1, DESTS)
+        n = np.ones(len(g), dtype=np.intp)
+        moved = np.zeros((len(g), 13), dtype=np.uint8)
+        k = np.arange(13)
+
+        # Zdjęcie kart z kolumny gry i odkrycie karty, która została na wierzchu
+        t = src < FOUNDATION
+        gt, st = g[t], src[t]
+        n[t] = np.where(dst[t] < FOUNDATION, self._counts[gt, st, np.minimum(dst[t], 6)], 1)
+        length = state[gt, LENS + st] - n[t]
+        i, j = np.nonzero(k < n[t, None])
+        o = BOARD + st[i] * COLUMN + length[i] + j
+        moved[np.flatnonzero(t)[i], j] = state[gt[i], o]
+        state[gt[i], o] = 0
+        state[gt, LENS + st] = length
+        state[gt, TOPS + st] = np.where(length > 0, state[gt, BOARD + st * COLUMN + np.maximum(length - 1, 0)], EMPTY)
+        flip = (length > 0) & (state[gt, HIDDEN + st] == length)
+        state[gt[flip], HIDDEN + st[flip]] -= 1
+        state[gt[flip], FACEDOWN] -= 1
+
+        # Zdjęcie karty ze stosu końcowego
+        f = (src >= FOUNDATION) & (src < WASTE)
+        gf, o = g[f], DISCARD + src[f] - FOUNDATION
+        card = state[gf, o]
+        moved[f, 0] = card
+        state[gf, o] = np.where(card % 13 == 0, EMPTY, card - 1)
+        state[gf, FOUNDED] -= 1
+
+        # Zabranie karty ze stosu rezerwowego — dalsze karty przesuwają się o jedno miejsce
+        w = src >= WASTE
+        gw = g[w]
+        o = state[gw, SHIFT].astype(np.intp) + src[w] - WASTE
+        deck = np.concatenate((state[gw, DECK:DECK+24], np.zeros((len(gw), 1), dtype=np.uint8)), axis=1)
+        moved[w, 0] = deck[np.arange(len(gw)), o]
+        j = np.arange(24)
+        state[gw, DECK:DECK+24] = np.where(j < o[:, None], deck[:, :24], deck[:, 1:])
+        length = state[gw, DECK_LEN] - 1
+        state[gw, DECK_LEN] = length
+        shift = state[gw, SHIFT]
+        cod = state[gw, COD]
+        state[gw, SHIFT] = np.where(shift > 0, shift - 1, shift)
+        state[gw, COD] = np.where((shift == 0) & (np.minimum(cod, length) > 0), cod - 1, cod)
+
+        # Położenie kart na kolumnie gry
+        t = dst < FOUNDATION
+        gt, dt = g[t], dst[t]
+        length = state[gt, LENS + dt]
+        i, j = np.nonzero(k < n[t, None])
+        state[gt[i], BOARD + dt[i] * COLUMN + length[i] + j] = moved[np.flatnonzero(t)[i], j]
+        state[gt, LENS + dt] = length + n[t]
+        state[gt, TOPS + dt] = moved[np.flatnonzero(t), n[t] - 1]
+
+        # Położenie karty na stosie końcowym
+        f = ~t
+        state[g[f], DISCARD + dst[f] - FOUNDATION] = moved[f, 0]
+        state[g[f], FOUNDED] += 1
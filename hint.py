@@ -0,0 +1,107 @@
+# PODPOWIEDZI
+#
+# Najlepszy następny ruch liczony przez rozwiązywacz w osobnym wątku, żeby
+# obsługa klawiatury nigdy nie czekała na wynik. Praca z poprzednich pozycji
+# nie przepada: rozwiązywacz zachowuje dokładnie zbadane przegrane, a każda
+# pozycja na ścieżce znalezionego rozwiązania jest zapamiętywana razem z ruchem,
+# więc jeśli gracz idzie za podpowiedzią, kolejne są gotowe od razu.
+# Z wspólną pamięcią pozycji (cache.py) podpowiedzi korzystają też z wyników
+# innych procesów i poprzednich uruchomień gry.
+#
+# Typowa pozycja jest rozwiązywana w kilkanaście milisekund, więc pierwsze
+# przeszukiwanie ma krótki limit czasu. Jeśli nie wystarczy, podpowiedzi nie ma,
+# ale ponowna prośba o podpowiedź w tej samej pozycji szuka z dwa razy dłuższym limitem.
+
+import threading
+
+from solver import Solver, WON, LOST
+
+PENDING = "pending" # Podpowiedź jest jeszcze liczona
+
+class HintEngine:
+    # cache - wspólna pamięć pozycji (PositionCache) albo None
+    def __init__(self, budget=0.25, max_budget=8.0, max_known=1 << 16, cache=None):
+        self.budget = budget # limit czasu pierwszego przeszukiwania pozycji w sekundach
+        self.max_budget = max_budget # najdłuższy limit przy ponownych prośbach
+        self.max_known = max_known
+        self.cache = cache
+        self.solver = Solver(1 << 18)
+        self.known = {} # pozycja (bajty stanu) -> najlepszy ruch albo None, gdy brak wygranej
+        self.timeouts = {} # pozycja -> limit czasu, który nie wystarczył do rozstrzygnięcia
+        self.lock = threading.Lock()
+        self.cancel = threading.Event()
+        self.thread = None
+        self.searching = None # pozycja, dla której trwa przeszukiwanie
+
+    # Podpowiedź dla pozycji: ruch silnika, None (nie znaleziono wygranej) albo PENDING.
+    # Jeśli podpowiedzi nie ma, w tle rozpoczyna się jej liczenie.
+    def hint(self, state):
+        key = state.to_bytes()
+        with self.lock:
+            if key in self.known:
+                # Przekroczony limit czasu jest zgłaszany raz; kolejna prośba szuka dłużej
+                if self.known[key] is None and key in self.timeouts:
+                    return self.known.pop(key)
+                return self.known[key]
+            if key == self.searching:
+                return PENDING
+            budget = min(2 * self.timeouts.get(key, self.budget / 2), self.max_budget)
+
+        # Wynik znany z pamięci pozycji
+        if self.cache is not None:
+            entry = self.cache.lookup(state)
+            if entry is not None and (entry[0] == LOST or entry[2] is not None and state.is_legal(entry[2])):
+                return entry[2]
+
+        with self.lock:
+            self.searching = key
+
+        # Poprzednie przeszukiwanie jest przerywane; nowe wątek zaczyna dopiero, gdy
+        # poprzedni się zakończy, więc wywołujący nigdy nie czeka
+        self.cancel.set()
+        cancel = self.cancel = threading.Event()
+        previous = self.thread
+        self.thread = threading.Thread(target=self._search, args=(state.copy(), key, budget, cancel, previous), daemon=True)
+        self.thread.start()
+        return PENDING
+
+    # Przerwanie liczenia podpowiedzi (np. gdy gracz wykonał ruch)
+    def stop(self):
+        self.cancel.set()
+        with self.lock:
+            self.searching = None
+
+    # Zakończenie liczenia w tle i zamknięcie pamięci pozycji
+    def close(self):
+        self.stop()
+        if self.thread is not None:
+            self.thread.join()
+        if self.cache is not None:
+            self.cache.close()
+
+    def _search(self, state, key, budget, cancel, previous):
+        if previous is not None:
+            previous.join()
+        if cancel.is_set():
+            return
+
+        from cache import solve_cached # hashlib — dopiero przy pierwszej podpowiedzi
+        result = solve_cached(self.solver, state, self.cache, max_time=budget, cancel=cancel)
+
+        with self.lock:
+            if len(self.known) > self.max_known:
+                self.known.clear()
+                self.timeouts.clear()
+            if result.status == WON:
+                # Zapamiętanie całej ścieżki rozwiązania
+                for move in result.moves:
+                    self.known[state.to_bytes()] = move
+                    state.apply(move)
+            elif result.status == LOST:
+                self.known[key] = None
+                self.timeouts.pop(key, None)
+            elif not cancel.is_set():
+                self.known[key] = None
+                self.timeouts[key] = budget
+            if self.searching == key:
+                self.searching = None
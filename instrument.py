@@ -0,0 +1,154 @@
+# POMIARY W CZASIE GRY
+#
+# Opóźnienia od naciśnięcia klawisza do narysowania klatki, mierzone w głównej
+# pętli gry i rozbite na fazy: zmiana stanu gry (obsługa klawisza) i rysowanie.
+# Klawisze odczytane paczką (patrz Game.drain_keys) są mierzone każdy osobno:
+# od odczytu przez własną obsługę do klatki, która pokazuje ich skutek.
+# Próbki są zbierane osobno dla każdego rodzaju klawisza; raport z percentylami
+# jest zapisywany przy wyjściu z gry albo po sygnale SIGUSR1 (tam, gdzie jest).
+# Opcjonalnie każda faza ma własny profiler (cProfile) i pomiar pamięci
+# (tracemalloc), więc od razu widać, w której fazie ginie czas.
+
+import signal
+import cProfile
+import tracemalloc
+from array import array
+from time import perf_counter
+
+STATE = "stan" # obsługa klawisza: zmiana stanu gry
+RENDER = "rysowanie" # zbudowanie i narysowanie klatki
+TOTAL = "razem" # od odczytu klawisza z getch() do narysowania klatki
+PHASES = (STATE, RENDER, TOTAL)
+
+# Percentyl z posortowanych próbek
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, len(samples) * p // 100)]
+
+class Latency:
+    # path - plik raportu; kinds - słownik kod klawisza -> rodzaj klawisza;
+    # profile - profiler dla każdej fazy; memory - pomiar pamięci przydzielanej w fazach
+    def __init__(self, path, kinds, profile=False, memory=False):
+        self.path = path
+        self.kinds = kinds
+        self.samples = {} # (rodzaj klawisza, faza) -> array("d") czasów w ms
+        self.allocated = {} # (rodzaj klawisza, faza) -> array("d") szczytów pamięci w KiB
+        self.profiles = {STATE: cProfile.Profile(), RENDER: cProfile.Profile()} if profile else None
+        self.memory = memory
+        if memory:
+            tracemalloc.start()
+
+        self.pending = [] # klawisze czekające na narysowanie klatki: (rodzaj, chwila odczytu)
+        self.done = 0 # ile pierwszych z nich jest już obsłużonych
+        self.started = 0.0
+        self.phase_memory = 0
+
+    # Zapisywanie raportu po sygnale SIGUSR1
+    def install_signal(self):
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda number, frame: self.dump())
+
+    def _add(self, table, kind, phase, value):
+        key = (kind, phase)
+        if key not in table:
+            table[key] = array("d")
+        table[key].append(value)
+
+    def _begin(self, phase):
+        if self.memory:
+            tracemalloc.reset_peak()
+            self.phase_memory = tracemalloc.get_traced_memory()[0]
+        if self.profiles is not None:
+            self.profiles[phase].enable()
+        return perf_counter()
+
+    # Koniec fazy; próbka jest dopisywana dla każdego z rodzajów klawiszy kinds
+    def _end(self, phase, start, kinds):
+        now = perf_counter()
+        if self.profiles is not None:
+            self.profiles[phase].disable()
+        allocated = (tracemalloc.get_traced_memory()[1] - self.phase_memory) / 1024 if self.memory else 0
+        for kind in kinds:
+            self._add(self.samples, kind, phase, (now - start) * 1000)
+            if self.memory:
+                self._add(self.allocated, kind, phase, allocated)
+        return now
+
+    # Odczyt klawisza inp z getch()
+    def key(self, inp):
+        self.pending.append((self.kinds.get(inp, "inne"), perf_counter()))
+
+    # Liczba odczytanych, jeszcze nieobsłużonych klawiszy
+    def queued(self):
+        return len(self.pending) - self.done
+
+    # Początek obsługi następnego odczytanego klawisza
+    def handling(self):
+        self.started = self._begin(STATE)
+
+    # Koniec obsługi klawisza
+    def handled(self):
+        self._end(STATE, self.started, (self.pending[self.done][0],))
+        self.done += 1
+
+    # Koniec obsługi paczki klawiszy; klatka będzie narysowana, tylko jeśli gra pozostała na planszy
+    def updated(self, drawing=True):
+        if not drawing:
+            del self.pending[:]
+            self.done = 0
+
+    # Początek rysowania klatki
+    def rendering(self):
+        if not self.done: return
+        self.started = self._begin(RENDER)
+
+    # Koniec rysowania klatki — czas rysowania i całe opóźnienie każdego obsłużonego klawisza
+    def drawn(self):
+        if not self.done: return
+        batch = self.pending[:self.done]
+        now = self._end(RENDER, self.started, [kind for kind, pressed in batch])
+        for kind, pressed in batch:
+            self._add(self.samples, kind, TOTAL, (now - pressed) * 1000)
+        del self.pending[:self.done]
+        self.done = 0
+
+    # Raport: percentyle dla każdego rodzaju klawisza i fazy
+    def report(self):
+        lines = ["%-12s %-10s %7s %9s %9s %9s %9s" % ("klawisz", "faza", "liczba", "p50 ms", "p95 ms", "p99 ms", "maks. ms")]
+        for kind in sorted({kind for kind, phase in self.samples}):
+            for phase in PHASES:
+                samples = self.samples.get((kind, phase))
+                if not samples: continue
+                samples = sorted(samples)
+                lines.append("%-12s %-10s %7d %9.2f %9.2f %9.2f %9.2f" % (
+                    kind, phase, len(samples), percentile(samples, 50), percentile(samples, 95), percentile(samples, 99), samples[-1]))
+
+        if self.memory:
+            lines.append("")
+            lines.append("%-12s %-10s %7s %9s %9s" % ("klawisz", "faza", "liczba", "p50 KiB", "maks. KiB"))
+            for kind in sorted({kind for kind, phase in self.allocated}):
+                for phase in (STATE, RENDER):
+                    allocated = self.allocated.get((kind, phase))
+                    if not allocated: continue
+                    allocated = sorted(allocated)
+                    lines.append("%-12s %-10s %7d %9.1f %9.1f" % (kind, phase, len(allocated), percentile(allocated, 50), allocated[-1]))
+            lines.append("")
+            lines.append("Najwięcej pamięci zajmują:")
+            # Bez pamięci samych pomiarów
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, cProfile.__file__), tracemalloc.Filter(False, __file__)))
+            for stat in snapshot.statistics("lineno")[:15]:
+                lines.append("  " + str(stat))
+        return "\n".join(lines) + "\n"
+
+    # Zapisanie raportu (i profili faz: plik.stan.prof, plik.rysowanie.prof — do odczytu modułem pstats)
+    def dump(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(self.report())
+        if self.profiles is not None:
+            for phase, profile in self.profiles.items():
+                profile.dump_stats(self.path + "." + phase + ".prof")
+
+    def close(self):
+        self.dump()
+        if self.memory:
+            tracemalloc.stop()
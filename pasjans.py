@@ -1,9 +1,17 @@
 #!/usr/bin/env python
 
-from unicurses import *
 from enum import Enum
-from random import randint
-from copy import deepcopy
+import sys
+from collections import deque
+from time import monotonic, localtime, strftime
+import records
+from engine import Klondike, History, random_seed
+from render import Renderer
+
+# Moduł curses (unicurses) jest importowany dopiero w load_curses(), przy uruchomieniu
+# gry. Samo zaimportowanie pasjans.py i utworzenie obiektu Game nie dotyka terminala
+# ani plików, więc gra działa też bez terminala (boty, pomiary).
+uc = None
 
 # KLASY POMOCNICZE
 
@@ -13,6 +21,10 @@ class Screen(Enum):
     DIFF_SELECT = 11 # Wybór poziomu trudności
     EASY = 12 # Pomocnicza. Poziom łatwy
     HARD = 13 # Pomocnicza. Poziom trudny.
+    SUSPEND = 14 # Pomocnicza. Zapisanie gry i powrót do menu
+    RESUME = 15 # Pomocnicza. Wczytanie zapisanej gry
+    WINNABLE = 16 # Pomocnicza. Włączenie/wyłączenie rozdań tylko do wygrania
+    VARIANT = 17 # Pomocnicza. Zmiana wariantu gry
     GAME = 1 # Właściwa gra
     PAUSE = 2 # Ekran pauzy
     WIN = 3 # Ekran zwycięstwa
@@ -77,10 +89,19 @@ class Card:
 # W zależności od platformy kody klawiszowe mogą być różne — z tego powodu są zawarte w krotkach
 
 U = (85, 117)
-BACKSPACE  = (8, KEY_BACKSPACE)
-ENTER = (10, KEY_ENTER)
+R = (82, 114)
+H = (72, 104)
+A = (65, 97)
+BACKSPACE  = (8,) # + KEY_BACKSPACE z curses (patrz load_curses)
+ENTER = (10,) # + KEY_ENTER z curses
 ESC = 27
 
+# Najwięcej klawiszy odczytywanych z wyprzedzeniem (np. przy wklejeniu długiego tekstu)
+MAX_TYPEAHEAD = 256
+
+# Miejsce zapisu (patrz saves.py), do którego gra jest zapisywana przy wyjściu do menu
+AUTOSAVE = 0
+
 # Identyfikatory par kolorów
 
 HIGHLIGHT = 4
@@ -89,47 +110,35 @@ RED_CARD = 3
 
 # FUNKCJE POMOCNICZE
 
-# tasowanie listy
-
-def shuffle(list_in):
-    old_list = list_in
-    new_list = []
-    for _ in range(len(old_list)):
-        new_list.append(old_list.pop(randint(0,len(old_list)-1)))
-    return new_list
-
-# czy karty są różnych kolorów?
-
-def opposite_colors(card1,card2):
-    return card1.suit % 2 != card2.suit % 2
-
-def check_color(card1,card2,same=True):
-    return (card1.suit % 2 == card2.suit % 2) == same
-
-# czy wartość jednej karty jest o 1 wyższa niż tej drugiej?
-
-def plus1_value(hi_card,lo_card):
-    return hi_card.value == lo_card.value+1
-
-def partition(array, low, high):
-
-    pivot = array[high]
-
-    i = low - 1
-    for j in range(low, high):
-        if array[j] <= pivot:
-            i = i + 1
-            (array[i], array[j]) = (array[j], array[i])
-
-    (array[i + 1], array[high]) = (array[high], array[i + 1])
-    return i + 1
-
-
-def quicksort(array, low, high):
-    if low < high:
-        pi = partition(array, low, high)
-        quickSort(array, low, pi - 1)
-        quickSort(array, pi + 1, high)
+# Import modułu curses i uzupełnienie kodów klawiszy zależnych od platformy
+def load_curses():
+    global uc, BACKSPACE, ENTER
+    if uc is None:
+        import unicurses
+        uc = unicurses
+        BACKSPACE = (8, uc.KEY_BACKSPACE)
+        ENTER = (10, uc.KEY_ENTER)
+    return uc
+
+# Rodzaje klawiszy w pomiarach opóźnień (patrz instrument.py)
+def key_kinds():
+    load_curses()
+    kinds = {uc.KEY_UP: "strzałka", uc.KEY_DOWN: "strzałka", uc.KEY_LEFT: "strzałka", uc.KEY_RIGHT: "strzałka", ESC: "escape"}
+    for keys, kind in ((ENTER, "enter"), (BACKSPACE, "dobór"), (U, "cofnięcie"), (R, "ponowienie"), (H, "podpowiedź"), (A, "odkładanie")):
+        for key in keys: kinds[key] = kind
+    return kinds
+
+# Napisy kart silnika (kolor i wartość), tworzone przy pierwszym rysowaniu planszy
+
+CARD_LABELS = []
+
+def card_label(card):
+    if not CARD_LABELS:
+        for s in range(4):
+            for v in range(13):
+                c = Card(v+1,s,True)
+                CARD_LABELS.append(c.str_suit() + (c.str_val() if c.value == 10 else " "+c.str_val()))
+    return CARD_LABELS[card]
 
 # OBIEKT GRY
 
@@ -137,7 +146,7 @@ class Game:
 
     # Inicjalizacja programu
     
-    def __init__(self):
+    def __init__(self, record_dir=None, latency=None, frame_budget=None):
 
         # Czy program działa?
 
@@ -150,34 +159,104 @@ class Game:
         self.choice = 0
         self.cur_screen = Screen.MENU
 
-        # Inicjalizacja pełnej talii kart
-
-        self.deck_init = []
-
-        for s in range(4):
-            for v in range(13):
-                self.deck_init.append(Card(v+1,s,True))
-
         self.state = {
             "hard": False, # poziom trudności
-            "deck":shuffle(self.deck_init[:]), # stos rezerwowy
-            "deck_shift":0, # przesunięcie kart w stosie rezerwowym
-            "cards_on_deck":0, # karty w stosie rezerwowym
-            "board":[[],[],[],[],[],[],[]], # kolumny gry
-            "discard":[[],[],[],[]], # stosy końcowe
+            "seed": 0, # numer rozdania
             "mp":[0,1], # pozycja wskaźnika
             "pickupp":[-1,-1], # pozycja zaznaczonej karty
             "picking":False, # czy jakaś karta jest teraz zaznaczana?
-            "move":1 # numer ruchu
+            "move":1, # numer ruchu
+            "start":0 # chwila rozpoczęcia gry
         }
 
-        self.notif = ""
+        # Wariant gry (klasa stanu, patrz variants.py) i stan rozgrywki (talia,
+        # kolumny gry, stosy końcowe) — patrz engine.py
+        self.variant = Klondike
+        self.klondike = Klondike()
 
-        self.last_moves = []
+        self.notif = ""
 
-        self.scores = open("./wyniki.txt","a+")
-        self.str_scores = self.scores.readlines()
-        print(self.str_scores)
+        self.history = records.RecordedHistory()
+
+        # Zapisy partii (None - partie nie są zapisywane) — patrz records.py
+        self.record_dir = record_dir
+        self.recorder = None # otwierany przy zapisie pierwszej partii
+        self.recorded = True # czy bieżąca partia została już zapisana?
+
+        # Czy bezpieczne karty są od razu odkładane na stosy końcowe?
+        self.auto_moves = False
+
+        # Podpowiedzi liczone w tle i obecnie wyświetlana podpowiedź
+        self._hints = None
+        self.hint = None
+
+        # Tablica wyników i zapisane gry — pliki są otwierane przy pierwszym użyciu
+        self._scores = None
+        self._saves = None
+        self.resumed = False # czy bieżąca gra została wczytana z zapisu?
+
+        # Czy rozdawane są tylko rozdania do wygrania (z indeksu, patrz winnable.py)?
+        self.winnable_only = False
+        self._winnable = None
+
+        # Pomiary opóźnień (None - wyłączone) — patrz instrument.py
+        self.latency = latency
+
+        # Klawisze odczytane z wyprzedzeniem, jeszcze nieobsłużone, i najdłuższy czas
+        # obsługi paczki klawiszy przed narysowaniem klatki (s; None - bez limitu)
+        self.keys = deque()
+        self.frame_budget = frame_budget
+
+    # Podpowiedzi — patrz hint.py (ze wspólną pamięcią pozycji, jeśli jest jej plik — patrz cache.py)
+    @property
+    def hints(self):
+        if self._hints is None:
+            from cache import open_cache
+            from hint import HintEngine
+            self._hints = HintEngine(cache=open_cache())
+        return self._hints
+
+    # Czy podpowiedź jest jeszcze liczona? (bez podpowiedzi moduł hint nie jest importowany)
+    def hint_pending(self):
+        if self._hints is None: return False
+        from hint import PENDING
+        return self.hint is PENDING
+
+    # Tablica wyników — patrz scores.py
+    @property
+    def scores(self):
+        if self._scores is None:
+            from scores import ScoreStore
+            self._scores = ScoreStore()
+        return self._scores
+
+    # Zapisane gry — patrz saves.py
+    @property
+    def saves(self):
+        if self._saves is None:
+            from saves import SaveSlots
+            self._saves = SaveSlots()
+        return self._saves
+
+    # Indeks rozdań do wygrania — patrz winnable.py (None - brak indeksu)
+    @property
+    def winnable(self):
+        if self._winnable is None:
+            from winnable import WinnableIndex
+            try:
+                self._winnable = WinnableIndex()
+            except (OSError, ValueError):
+                self._winnable = False # brak indeksu — nie sprawdzamy ponownie
+        return self._winnable or None
+
+    # Zamknięcie otwartych plików
+    def close(self):
+        self.record_game(False)
+        if self.recorder is not None: self.recorder.close()
+        if self._saves is not None: self._saves.close()
+        if self._scores is not None: self._scores.close()
+        if self._winnable: self._winnable.close()
+        if self._hints is not None: self._hints.close()
 
     # Konfiguracja poszczególnych ekranów (wyjaśnienia na linijce 10)
     
@@ -193,22 +272,44 @@ class Game:
                 Choice("Tablica wyników", Screen.SCORES, "Wyświetl tablicę wyników."),
                 Choice("Wyjdź z gry", Screen.EXIT, "Wyjdź z programu.")
             ]
+            if self.saves.used(AUTOSAVE):
+                self.choices.insert(0, Choice("Wznów grę", Screen.RESUME, "Wróć do gry przerwanej przez wyjście do menu."))
 
         elif self.cur_screen == Screen.PAUSE:
 
             self.choices = [
                 Choice("Kontynuuj", Screen.GAME, "Wznów grę."),
                 Choice("Nowa Gra", Screen.DIFF_SELECT, "Zakończ obecną grę i rozpocznij nową.\nUWAGA: Stracisz wszystkie postępy w obecnej grze!"),
-                Choice("Do Menu", Screen.MENU, "Zakończ obecną grę i wróć do menu.\nUWAGA: Stracisz wszystkie postępy w obecnej grze!")
+                Choice("Do Menu", Screen.SUSPEND, "Wróć do menu. Gra zostanie zapisana — możesz ją potem wznowić.")
             ]
 
         elif self.cur_screen == Screen.DIFF_SELECT:
 
+            easy, hard = self.variant.rules.modes
             self.choices = [
-                Choice("Łatwy", Screen.EASY, "Można dobierać po 1 karcie."),
-                Choice("Trudny", Screen.HARD, "Dobiera się 3 karty, ale użyć można tylko wierzchniej."),
+                Choice(easy.label, Screen.EASY, easy.description),
+                Choice(hard.label, Screen.HARD, hard.description),
+                Choice("Wariant: " + self.variant.rules.label, Screen.VARIANT, "Zmień wariant gry."),
                 Choice("Wróć", Screen.MENU, "Wróć do menu.")
             ]
+            # Indeks rozdań do wygrania dotyczy tylko klasycznego wariantu
+            if self.winnable is not None and self.variant is Klondike:
+                self.choices.insert(3, Choice("Tylko do wygrania: " + ("tak" if self.winnable_only else "nie"), Screen.WINNABLE,
+                    "Rozdawaj tylko rozdania, które na pewno da się wygrać\n(w indeksie: %d łatwych, %d trudnych)." % (self.winnable.count(False), self.winnable.count(True))))
+
+        elif self.cur_screen == Screen.VARIANT:
+
+            from variants import VARIANTS
+            names = list(VARIANTS)
+            self.variant = VARIANTS[names[(names.index(self.variant.rules.name) + 1) % len(names)]]
+            self.switch_screen(Screen.DIFF_SELECT)
+            self.choice = 2
+
+        elif self.cur_screen == Screen.WINNABLE:
+
+            self.winnable_only = not self.winnable_only
+            self.switch_screen(Screen.DIFF_SELECT)
+            self.choice = 3
 
         elif self.cur_screen == Screen.EASY:
 
@@ -222,153 +323,482 @@ class Game:
             self.new_game()
             self.switch_screen(Screen.GAME)
 
+        elif self.cur_screen == Screen.SUSPEND:
+
+            self.save_game()
+            self.switch_screen(Screen.MENU)
+
+        elif self.cur_screen == Screen.RESUME:
+
+            if self.load_game(): self.switch_screen(Screen.GAME)
+            else: self.switch_screen(Screen.MENU)
+
         elif self.cur_screen == Screen.WIN:
-            clear()
-            addstr("WYGRYWASZ!\nPoziom trudności: "+("Trudny" if self.state["hard"] else "Łatwy")+"\nLiczba ruchów: "+str(self.state["move"])+"\nNaciśnij dowolny klawisz, aby przejść dalej.")
-            getch()
+            uc.clear()
+            uc.addstr("WYGRYWASZ!\nWariant: "+self.klondike.rules.label+"\nPoziom trudności: "+self.klondike.mode.label+"\nLiczba ruchów: "+str(self.state["move"])+"\nNumer rozdania: "+str(self.state["seed"])+"\nNaciśnij dowolny klawisz, aby przejść dalej.")
+            self.keys.clear() # klawisze wpisane jeszcze w czasie gry nie zamykają ekranu
+            self.read_key()
             self.switch_screen(Screen.MENU)
 
         elif self.cur_screen == Screen.SCORES:
 
-            clear()
-
-            if len(self.str_scores) > 1:
-                scores_split = []
-                for s in self.str_scores:
-                    scores_split.append(int(s))
-                scores_split = reversed(quicksort(scores_split,0,len(scores_split)-1))
-                for s in range(min(15, len(scores_split))):
-                    addstr(str(scores_split[s]) + "\n")
-            else:
-                addstr("Nie ma zapisanych wyników!")
-            
-            addstr("\nNaciśnij dowolny klawisz, aby przejść dalej.")
-            getch()
+            # Wyniki jednego wariantu naraz, zaczynając od wybranego — strzałki zmieniają wariant
+            from variants import VARIANTS
+            names = list(VARIANTS)
+            i = names.index(self.variant.rules.name)
+            while True:
+                uc.clear()
+                variant = VARIANTS[names[i]]
+                uc.addstr("Wariant: " + variant.rules.label + "\n\n")
+
+                # Najlepsze wyniki dla każdego poziomu trudności (wyniki z dawnego wyniki.txt nie mają poziomu)
+                empty = True
+                levels = [(bool(h), mode.label) for h, mode in enumerate(variant.rules.modes)]
+                if variant is Klondike: levels.append((None, "Nieznany"))
+                for hard, label in levels:
+                    best = self.scores.best(hard, 6, names[i])
+                    if not best: continue
+                    empty = False
+                    uc.addstr("Poziom trudności: " + label + "\n")
+                    for moves, seed, duration, played in best:
+                        line = str(moves).rjust(5) + " ruchów"
+                        if duration is not None: line += "  " + "%d:%02d" % divmod(int(duration), 60)
+                        if seed is not None: line += "  rozdanie " + str(seed)
+                        uc.addstr(line + "  " + strftime("%Y-%m-%d", localtime(played)) + "\n")
+                    uc.addstr("\n")
+                if empty:
+                    uc.addstr("Nie ma zapisanych wyników!\n")
+
+                uc.addstr("\nStrzałki w lewo i w prawo zmieniają wariant.\nNaciśnij dowolny inny klawisz, aby przejść dalej.")
+                inp = self.read_key()
+                if inp == uc.KEY_LEFT: i = (i - 1) % len(names)
+                elif inp == uc.KEY_RIGHT: i = (i + 1) % len(names)
+                else: break
+            self.switch_screen(Screen.MENU)
 
         elif self.cur_screen == Screen.EXIT:
 
             self.running = False
 
-    # Wyświetlanie karty
-    def display_card(self, card, off_x = 0, off_y = 0):
+    # Wyświetlanie karty (komórka klatki: tekst i atrybut)
+    def display_card(self, frame, card, flip, off_x = 0, off_y = 0):
 
-        if card.flip:
-            
-            if card.suit % 2 == 0: attron(COLOR_PAIR(BLACK_CARD))
-            else: attron(COLOR_PAIR(RED_CARD))
+        if flip:
+            frame[(off_y,off_x)] = (card_label(card), uc.COLOR_PAIR(RED_CARD if card // 13 % 2 else BLACK_CARD))
 
-            mvaddstr(off_y,off_x,card.str_suit())
-            addstr(card.str_val() if card.value == 10 else " "+card.str_val())
+        else:
+            frame[(off_y,off_x)] = ("III", uc.A_NORMAL)
 
-            attroff(COLOR_PAIR(BLACK_CARD))
-            attroff(COLOR_PAIR(RED_CARD))
+    # Podświetlanie karty
+    def highlight_card(self,frame,x,y):
+        card = self.get_card(x,y)
+        pos = (y+2 if y > 0 else y+1, x*5)
 
+        if card is not None and self.is_face_up(x,y):
+            frame[pos] = (frame[pos][0], uc.A_STANDOUT | uc.COLOR_PAIR(BLACK_CARD+(card // 13 % 2 != 0)*2))
         else:
-            mvaddstr(off_y,off_x,"III")
+            frame[pos] = (frame.get(pos, ("   ",))[0], uc.A_BOLD | uc.COLOR_PAIR(HIGHLIGHT))
 
-    # Podświetlanie karty
-    def highlight_card(self,x,y):
-        if y > 0:        
+    # Klatka z całą planszą — rysuje ją renderer, przesyłając do terminala tylko zmiany
+    def board_frame(self):
+        k = self.klondike
+        frame = {}
 
-            if y <= len(self.state["board"][x]):
-                
-                highlighted_card = self.state["board"][x][y-1]
+        # Jeśli w stosie rezerwowym zostały jakieś karty, daj o tym znać; liczba ruchów i powiadomienie
+        move = str(self.state["move"])
+        frame[(0,0)] = (("III" if k.stock_left() else "").ljust(27-len(move)) + move + ". ruch " + self.notif, uc.A_NORMAL)
 
-                if highlighted_card.flip:
-                    mvchgat(y+2,x*5,3,A_STANDOUT,BLACK_CARD+(highlighted_card.suit % 2 != 0)*2,None)
-                else:
-                    mvchgat(y+2,x*5,3,A_BOLD,HIGHLIGHT,None)
+        # Wyświetlanie stosu rezerwowego
+        for c in range(k.visible()):
+            self.display_card(frame,k.waste_card(c),True,c*5,1)
 
-            else:
-                mvchgat(y+2,x*5,3,A_BOLD,HIGHLIGHT,None)
-        
-        else:
+        # Wyświetlanie stosów końcowych (na prawo od widocznych kart stosu rezerwowego)
+        for n in range(k.F):
+            top = k.top(k.FOUNDATION+n)
+            if top is not None: self.display_card(frame,top,True,(n+k.W)*5,1)
+            else: frame[(1,(n+k.W)*5)] = ("XXX", uc.A_NORMAL)
 
-            if x < 3:
-                if x < self.state["cards_on_deck"]: mvchgat(y+1,x*5,3,A_STANDOUT,BLACK_CARD+(self.state["deck"][self.state["deck_shift"]+x].suit % 2 != 0)*2,None)
-                else: mvchgat(y+1,x*5,3,A_BOLD,HIGHLIGHT,None)
-            else:
-                if len(self.state["discard"][x-3]) > 0: mvchgat(y+1,x*5,3,A_STANDOUT,BLACK_CARD+(self.state["discard"][x-3][-1].suit % 2 != 0)*2,None)
-                else: mvchgat(y+1,x*5,3,A_BOLD,HIGHLIGHT,None)
+        # Wyświetlanie kolumn gry
+        for r in range(k.T):
+            column = k.column(r)
+            for c in range(len(column)):
+                self.display_card(frame,column[c],c >= k.hidden(r),r*5,c+3)
 
-    # Ile kart jest widocznych na stosie rezerwowym?
-    def cards_on_deck(self):
-        return self.state["cards_on_deck"] if self.state["cards_on_deck"] < len(self.state["deck"]) else len(self.state["deck"])
+        # Podświetlanie zaznaczonej karty
+        self.highlight_card(frame,self.state["mp"][0],self.state["mp"][1])
+        if self.state["picking"]: self.highlight_card(frame,self.state["pickupp"][0],self.state["pickupp"][1])
 
-    # Rozpoczęcie nowej gry
-    def new_game(self):
+        # Podświetlanie podpowiedzi
+        if self.hint is not None and not self.hint_pending():
+            for x, y in self.move_positions(self.hint):
+                self.highlight_card(frame,x,y)
 
-        self.last_moves = []
+        return frame
 
-        hard = self.state["hard"]
+    # Ile kart jest widocznych na stosie rezerwowym?
+    def cards_on_deck(self):
+        return self.klondike.visible()
+
+    # Rozpoczęcie nowej gry (bez numeru rozdania - losowe rozdanie)
+    def new_game(self, seed=None):
+
+        self.record_game(False)
+        # Zapisy partii (patrz records.py) obejmują tylko klasyczny wariant
+        self.history = records.RecordedHistory() if self.variant is Klondike else History()
+        self.recorded = False
+        self.resumed = False
+
+        # Rozdanie z indeksu rozdań do wygrania; długość rozwiązania mówi o trudności rozdania
+        if seed is None and self.winnable_only and self.variant is Klondike and self.winnable is not None:
+            entry = self.winnable.pick(self.state["hard"])
+            if entry is not None:
+                seed = entry[0]
+                self.notif = "Rozwiązanie: " + str(entry[1]) + " ruchów"
+            else:
+                self.notif = "Brak rozdań do wygrania"
+
+        if self._hints is not None: self._hints.stop()
+        self.hint = None
 
         self.state = {
-            "hard": hard,
-            "deck":shuffle(self.deck_init[:]),
-            "deck_shift":0,
-            "cards_on_deck":0,
-            "board":[[],[],[],[],[],[],[]],
-            "discard":[[],[],[],[]],
+            "hard": self.state["hard"],
+            "seed": random_seed() if seed is None else seed,
             "mp":[0,1],
             "pickupp":[-1,-1],
             "picking":False,
-            "move":1
+            "move":1,
+            "start":monotonic()
         }
-        
-        # Rozłożenie kart ze stosu rezerwowego do kolumn gry
-        for r in range(len(self.state["board"])):
-            for c in range(r+1):
-                card = self.state["deck"].pop(randint(0,len(self.state["deck"])-1))
-                card.flip = c == r
-                self.state["board"][r].append(card)
-
-        # Wszystkie karty w stosie rezerwowym muszą być awersem do góry
-        for c in self.state["deck"]:
-            c.flip = True
-
-    # Wybierz kartę na określonej pozycji
+
+        self.klondike = self.variant.deal(self.state["hard"], self.state["seed"])
+
+    # Wybierz kartę na określonej pozycji (None - brak karty)
     def get_card(self,x,y):
+        k = self.klondike
         if y>0:
-            if y <= len(self.state["board"][x]): return self.state["board"][x][y-1]
+            if y <= len(k.column(x)): return k.column(x)[y-1]
         else:
-            if x < 3:
-                if len(self.state["deck"]) > 0 and x < self.cards_on_deck(): return self.state["deck"][x+self.state["deck_shift"]]
+            if x < k.W:
+                if x < k.visible(): return k.waste_card(x)
             else:
-                if len(self.state["discard"][x-3]) > 0: return self.state["discard"][x-3][-1]
-                
-        return Card(0,0,False)
+                return k.top(k.FOUNDATION+x-k.W)
+
+        return None
+
+    # Czy karta na określonej pozycji jest odwrócona awersem do góry?
+    def is_face_up(self,x,y):
+        return y == 0 or y > self.klondike.hidden(x)
 
     # Otrzymaj ID danej części planszy
     def get_deck_id(self,x,y):
         if y > 0: return 2
-        elif x > 2: return 1
+        elif x >= self.klondike.W: return 1
         else: return 0
 
+    # Liczba pozycji wskaźnika w wierszu: w pierwszym widoczne karty stosu rezerwowego
+    # i stosy końcowe, w pozostałych kolumny gry
+    def row_width(self,y):
+        k = self.klondike
+        return k.W + k.F if y == 0 else k.T
+
+    # Ruch odpowiadający przeniesieniu karty z jednej pozycji na drugą (None - brak ruchu)
+    def get_move(self,src,dst):
+        (px,py),(mx,my) = src,dst
+        k = self.klondike
+
+        # Czy zaznaczona karta i miejsce jej przeniesienia są takie same? W przeciwnym razie karta pozostanie w miejscu.
+        if px == mx and py == my: return None
+
+        match self.get_deck_id(px,py):
+            case 0: pile, n = k.WASTE+px, 1
+            case 1: pile, n = k.FOUNDATION+px-k.W, 1
+            case 2: pile, n = k.TABLEAU+px, len(k.column(px))-(py-1)
+
+        match self.get_deck_id(mx,my):
+            case 0: return None
+            case 1:
+                # Na stos końcowy trafia zawsze wierzchnia karta kolumny
+                return (pile, k.FOUNDATION+mx-k.W, 1)
+            case 2:
+                # Kartę można położyć tylko, wskazując odkrytą kartę albo pustą kolumnę
+                if len(k.column(mx)) > 0 and not (k.hidden(mx) < my <= len(k.column(mx))): return None
+                return (pile, k.TABLEAU+mx, n)
+
+    # Pozycje kart (skąd i dokąd) dla ruchu silnika
+    def move_positions(self, move):
+        src, dst, n = move
+        k = self.klondike
+        positions = []
+        if src < k.FOUNDATION: positions.append((src-k.TABLEAU, len(k.column(src-k.TABLEAU))-n+1))
+        elif src < k.WASTE: positions.append((src-k.FOUNDATION+k.W, 0))
+        elif src != k.STOCK: positions.append((src-k.WASTE, 0))
+        if dst < k.FOUNDATION: positions.append((dst-k.TABLEAU, max(len(k.column(dst-k.TABLEAU)), 1)))
+        elif dst < k.WASTE: positions.append((dst-k.FOUNDATION+k.W, 0))
+        return positions
+
+    # Cofnięcie ostatniego przeniesienia karty razem z doborami kart wykonanymi po nim
+    def undo_move(self):
+        while True:
+            record = self.history.undo(self.klondike)
+            if record is None: break
+            if not self.klondike.is_draw(record):
+                self.state["move"] -= 1
+                break
+
+    # Ponowienie cofniętego przeniesienia karty razem z następującymi po nim doborami kart
+    def redo_move(self):
+        moved = False
+        while True:
+            record = self.history.next_redo()
+            if record is None or moved and not self.klondike.is_draw(record): break
+            self.history.redo(self.klondike)
+            if not self.klondike.is_draw(record):
+                self.state["move"] += 1
+                moved = True
+        self.check_win()
+
+    # Zapisanie gry w toku do miejsca zapisu (patrz saves.py)
+    def save_game(self, slot=AUTOSAVE):
+        self.saves.save(slot, self.klondike, self.history, self.state["seed"], self.state["move"], monotonic() - self.state["start"])
+
+    # Wczytanie zapisanej gry; False - miejsce zapisu jest puste
+    def load_game(self, slot=AUTOSAVE):
+        saved = self.saves.load(slot)
+        if saved is None: return False
+
+        if self._hints is not None: self._hints.stop()
+        self.hint = None
+
+        self.klondike = saved.state
+        self.variant = type(saved.state)
+        if self.variant is Klondike:
+            self.history = records.RecordedHistory.restore(saved.done, saved.undone)
+        else:
+            self.history = History()
+            self.history.done, self.history.undone = saved.done, saved.undone
+        self.recorded = False
+        self.resumed = True
+        self.state = {
+            "hard": saved.state.hard,
+            "seed": saved.seed,
+            "mp":[0,1],
+            "pickupp":[-1,-1],
+            "picking":False,
+            "move":saved.move,
+            "start":monotonic() - saved.elapsed
+        }
+        return True
+
+    # Zapisanie bieżącej partii (jeśli partie są zapisywane, a ta nie została jeszcze zapisana)
+    def record_game(self, won):
+        if self.record_dir is None or self.recorded or type(self.klondike) is not Klondike: return
+        self.recorded = True
+        if self.recorder is None: self.recorder = records.RecordWriter(self.record_dir)
+        moves = self.state["move"] if won else self.state["move"]-1
+        self.recorder.write(self.state["seed"], self.state["hard"], won, moves, self.history.ops)
+        self.recorder.flush()
+
+    # Ruchy wykonywane za gracza po jego ruchu: odkładanie bezpiecznych kart na stosy
+    # końcowe (jeśli włączone) i dokończenie partii, gdy wszystkie karty są odkryte,
+    # a stos rezerwowy pusty. Każdy z nich liczy się jako ruch.
+    def auto_play(self):
+        k = self.klondike
+        moves = []
+
+        if self.auto_moves:
+            move = k.safe_move()
+            while move is not None:
+                self.history.apply(k, move)
+                moves.append(move)
+                move = k.safe_move()
+
+        if k.can_finish():
+            for move in k.finishing_moves():
+                self.history.apply(k, move)
+                moves.append(move)
+
+        if moves:
+            self.state["move"] += len(moves)
+            self.check_win()
+
+    # Sprawdzanie warunku wygranej
+    def check_win(self):
+        if self.klondike.is_won():
+            self.state["move"] -= 1
+            self.record_game(True)
+            if self.resumed: self.saves.clear(AUTOSAVE)
+            self.scores.add(self.state["hard"], self.state["move"], self.state["seed"], monotonic() - self.state["start"], variant=self.klondike.rules.name)
+            self.switch_screen(Screen.WIN)
+
+    # WEJŚCIE
+
+    # Następny klawisz: najpierw odczytane z wyprzedzeniem, potem z terminala
+    # (timeout w ms, -1 - czekanie na klawisz; po upływie czasu uc.ERR)
+    def read_key(self, timeout=-1):
+        if self.keys:
+            return self.keys.popleft()
+        uc.timeout(timeout)
+        return uc.getch()
+
+    # Odczyt bez czekania wszystkich klawiszy, które już czekają w terminalu
+    def drain_keys(self):
+        uc.timeout(0)
+        while len(self.keys) < MAX_TYPEAHEAD:
+            inp = uc.getch()
+            if inp == uc.ERR: break
+            self.keys.append(inp)
+            if self.latency: self.latency.key(inp)
+
+    # Czy następny klawisz jest mierzony (--latency)? Klawisz z getch() — tak, a z self.keys —
+    # tylko jeśli odczytał go drain_keys() w czasie gry, a nie został z innego ekranu
+    def measured_key(self):
+        return self.latency is not None and (not self.keys or len(self.keys) <= self.latency.queued())
+
+    # Obsługa jednego klawisza na planszy gry (bez rysowania)
+    def game_key(self, inp):
+
+        k = self.klondike
+
+        # Przesunięcie wskaźnika nie zmienia planszy — bez porównywania stanu
+        cursor = inp in (uc.KEY_UP, uc.KEY_DOWN, uc.KEY_LEFT, uc.KEY_RIGHT)
+        last_state = None if cursor else k.to_bytes()
+
+        # Pauza
+        if inp == ESC:
+            self.switch_screen(Screen.PAUSE)
+
+        # Poruszanie wskaźnikiem
+        elif inp == uc.KEY_UP and self.state["mp"][1] > 0:
+            self.state["mp"][1] -= 1
+            self.state["mp"][0] = min(self.state["mp"][0], self.row_width(self.state["mp"][1])-1)
+        elif inp == uc.KEY_DOWN and self.state["mp"][1] < k.COLUMN+2: 
+            self.state["mp"][1] += 1
+            self.state["mp"][0] = min(self.state["mp"][0], self.row_width(self.state["mp"][1])-1)
+        elif inp == uc.KEY_LEFT and self.state["mp"][0] > 0: 
+            self.state["mp"][0] -= 1
+        elif inp == uc.KEY_RIGHT and self.state["mp"][0] < self.row_width(self.state["mp"][1])-1: 
+            self.state["mp"][0] += 1
+
+        # Włączanie i wyłączanie automatycznego odkładania kart
+        elif inp in A:
+            self.auto_moves = not self.auto_moves
+            self.notif = "Odkładanie kart: " + ("włączone" if self.auto_moves else "wyłączone")
+            if self.auto_moves: self.auto_play()
+
+        # Podpowiedź
+        elif inp in H:
+            # Rozwiązywacz zna tylko klasyczny wariant
+            if type(k) is not Klondike:
+                self.notif = "Podpowiedzi tylko w wariancie Klondike"
+            else:
+                self.hint = self.hints.hint(k)
+                if self.hint is None: self.notif = "Brak podpowiedzi"
+
+        # Cofanie i ponawianie ruchów
+        elif inp in U or inp in R:
+            self.state["picking"] = False
+            self.state["pickupp"][0] = -1
+            self.state["pickupp"][1] = -1
+
+            if inp in U: self.undo_move()
+            else: self.redo_move()
+
+        # Dobór karty ze stosu rezerwowego
+        elif inp in BACKSPACE: 
+
+            self.state["picking"] = False                                
+            self.state["pickupp"][0] = -1
+            self.state["pickupp"][1] = -1
+
+            # Talię można przejrzeć ograniczoną liczbę razy (np. w wariancie Vegas)
+            if len(k.deck) > 0 and not k.is_legal(k.DRAW):
+                self.notif = "Talii nie można już przełożyć"
+
+            elif len(k.deck) > 0:
+                # Czy wszystkie karty w talii zostały przejrzane?
+                if not k.stock_left():
+                    if not self.get_deck_id(self.state["mp"][0],self.state["mp"][1]): self.state["mp"][1] += 1
+
+                self.history.apply(k, k.DRAW)
+                self.auto_play()
+
+        # Zaznaczanie i przenoszenie kart
+        elif inp in ENTER:
+            if self.state["picking"]:
+
+                move = self.get_move(self.state["pickupp"],self.state["mp"])
+
+                # Czy doszło do przeniesienia karty?
+                moved = move is not None and k.is_legal(move)
+
+                # Reset zaznaczania karty
+                self.state["picking"] = False                                
+                self.state["pickupp"][0] = -1
+                self.state["pickupp"][1] = -1
+
+                # Zapisywanie ruchu — przeniesienie karty liczy się jako ruch
+                if moved:
+
+                    self.history.apply(k, move)
+                    self.state["move"] += 1
+
+                self.check_win()
+                if moved and self.cur_screen == Screen.GAME: self.auto_play()
+
+            else:
+
+                # Zaznaczanie karty
+
+                card = self.get_card(self.state["mp"][0],self.state["mp"][1])
+                if card is not None and self.is_face_up(self.state["mp"][0],self.state["mp"][1]):
+                    self.state["picking"] = True
+
+                    self.state["pickupp"][0] = self.state["mp"][0]
+                    self.state["pickupp"][1] = self.state["mp"][1]
+
+        if not self.get_deck_id(self.state["mp"][0],self.state["mp"][1]):
+            if self.cards_on_deck() > 0:
+                if k.mode.top_only:
+                    self.state["mp"][0] = self.cards_on_deck()-1 # Jeśli można użyć tylko wierzchniej karty, gracz może wybrać tylko ją
+            else:
+                self.state["mp"][1] += 1
+
+        # Każda zmiana na planszy unieważnia podpowiedź
+        if last_state is not None and k.to_bytes() != last_state:
+            if self._hints is not None: self._hints.stop()
+            self.hint = None
+
     # Uruchomienie programu
     def run(self):
 
-        stdscr = initscr()
-        noecho()
-        curs_set(False)
-        keypad(stdscr,True)
+        load_curses()
+        stdscr = uc.initscr()
+        uc.noecho()
+        uc.curs_set(False)
+        uc.keypad(stdscr,True)
+
+        self.renderer = Renderer(stdscr)
 
-        if not has_colors(): # Czy dany terminal wspiera kolor?
-            endwin()
+        if not uc.has_colors(): # Czy dany terminal wspiera kolor?
+            uc.endwin()
             print("Uwaga - terminal nie wspiera koloru!")
             exit(1)
 
         # Inicjalizacja koloru
 
-        start_color()
+        uc.start_color()
+
+        uc.init_pair(BLACK_CARD, uc.COLOR_BLACK, uc.COLOR_WHITE)
+        uc.init_pair(RED_CARD, uc.COLOR_RED, uc.COLOR_WHITE)
 
-        init_pair(BLACK_CARD, COLOR_BLACK, COLOR_WHITE)
-        init_pair(RED_CARD, COLOR_RED, COLOR_WHITE)
+        uc.init_pair(HIGHLIGHT, uc.COLOR_BLUE, uc.COLOR_WHITE)
 
-        init_pair(HIGHLIGHT, COLOR_BLUE, COLOR_WHITE)
+        latency = self.latency
+        if latency: latency.install_signal()
 
         # Ekran początkowy
 
-        addstr("PASJANS\nANTONI KOWALSKI\nGIGATHON, III EDYCJA\nZAŻÓŁĆ GĘŚLĄ JAŹŃ\nNaciśnij dowolny klawisz, aby przejść dalej.")
+        uc.addstr("PASJANS\nANTONI KOWALSKI\nGIGATHON, III EDYCJA\nZAŻÓŁĆ GĘŚLĄ JAŹŃ\nNaciśnij dowolny klawisz, aby przejść dalej.")
 
         self.switch_screen(Screen.MENU)
 
@@ -376,250 +806,133 @@ class Game:
 
         while self.running:
 
-            # Oczyszczenie ekranu
-            clear()
-            
             if self.cur_screen == Screen.GAME:
-                
-                # Jeśli w stosie rezerwowym zostały jakieś karty, daj o tym znać
-                if len(self.state["deck"]) > 0 and self.state["deck_shift"] < len(self.state["deck"])-self.cards_on_deck(): addstr("III")
-                
-                # Wyświetlanie liczby ruchów
-                mvaddstr(0,27-len(str(self.state["move"])),str(self.state["move"]) + ". ruch ")
-                
-                # Mechanizm powiadomienia
-                addstr(self.notif)
-
-                self.notif = ""
 
-                # Wyświetlanie stosu rezerwowego
-                for c in range(self.cards_on_deck()):
-                    self.display_card(self.state["deck"][c+self.state["deck_shift"]],c*5,1)
+                k = self.klondike
 
-                # Wyświetlanie stosów końcowych
-                for n in range(4):
-                    if len(self.state["discard"][n]) > 0: self.display_card(self.state["discard"][n][-1],(n+3)*5,1)
-                    else: mvaddstr(1, (n+3)*5, "XXX")
+                # Sprawdzenie, czy podpowiedź jest już gotowa
+                if self.hint_pending():
+                    self.hint = self.hints.hint(k)
+                    if self.hint_pending(): self.notif = "Szukam podpowiedzi..."
+                    elif self.hint is None: self.notif = "Brak podpowiedzi"
+                if self.hint == k.DRAW: self.notif = "Dobierz kartę"
 
-                # Wyświetlanie kolumn gry
-                for r in range(len(self.state["board"])):
-                    for c in range(len(self.state["board"][r])):
-                        self.state["board"][r][-1].flip = True
-                        self.display_card(self.state["board"][r][c],r*5,c+3)
+                # Rysowanie planszy (tylko zmienione komórki); powiadomienie jest pokazywane raz
+                if latency: latency.rendering()
+                self.renderer.draw(self.board_frame())
+                if latency: latency.drawn()
+                self.notif = ""
 
-                # Podświetlanie zaznaczonej karty
-                self.highlight_card(self.state["mp"][0],self.state["mp"][1])
-                if self.state["picking"]: self.highlight_card(self.state["pickupp"][0],self.state["pickupp"][1])
-
-                # Wejście
-                inp = getch()
-
-                # Pauza
-                if inp == ESC:
-                    self.switch_screen(Screen.PAUSE)
-
-                # Poruszanie wskaźnikiem
-                elif inp == KEY_UP and self.state["mp"][1] > 0:
-                    self.state["mp"][1] -= 1
-                elif inp == KEY_DOWN and self.state["mp"][1] < 21: 
-                    self.state["mp"][1] += 1
-                elif inp == KEY_LEFT and self.state["mp"][0] > 0: 
-                    self.state["mp"][0] -= 1
-                elif inp == KEY_RIGHT and self.state["mp"][0] < 6: 
-                    self.state["mp"][0] += 1
-                
-                # Cofanie ruchów
-                elif inp in U:
-                    if len(self.last_moves)>0: 
-                        self.state = self.last_moves.pop(-1)
-                    pass
-
-                # Dobór karty ze stosu rezerwowego
-                elif inp in BACKSPACE: 
-
-                    self.state["picking"] = False                                
-                    self.state["pickupp"][0] = -1
-                    self.state["pickupp"][1] = -1
-
-                    hard = self.state["hard"]                    
-                    
-                    # Czy wszystkie karty w talii zostały przejrzane?
-                    if self.state["deck_shift"]+self.cards_on_deck() >= len(self.state["deck"]):
-                        self.state["deck_shift"] = 0
-                        self.state["cards_on_deck"] = 0
-                        if not self.get_deck_id(self.state["mp"][0],self.state["mp"][1]): self.state["mp"][1] += 1
-                        self.state["deck"] = shuffle(self.state["deck"])
-                    else:
-                        if self.state["cards_on_deck"] == 3: self.state["deck_shift"] += 1+2*hard
-                        self.state["cards_on_deck"] += 1+2*hard
-                        if self.state["cards_on_deck"] > 3: self.state["cards_on_deck"] = 3
-
-                        if self.state["deck_shift"] + self.cards_on_deck() >= len(self.state["deck"]): self.state["deck_shift"] = len(self.state["deck"])-self.cards_on_deck()
-                
-                # Zaznaczanie i przenoszenie kart
-                elif inp in ENTER:
-                    if self.state["picking"]:
-
-                        # Przechowanie poprzedniego stanu
-                        last_state = deepcopy(self.state)
-
-                        # żeby upewnić się, że żadna karta nie będzie zaznaczona w poprzednim stanie
-                        last_state["picking"] = False                                
-                        last_state["pickupp"][0] = -1
-                        last_state["pickupp"][1] = -1
-
-                        # Miejsce, na które ma trafić zaznaczona karta
-                        card = self.get_card(self.state["mp"][0],self.state["mp"][1])
-                        
-                        # Czy doszło do przeniesienia karty?
-                        moved = False
-
-                        # Czy pole jest puste? Czy przenoszona karta to król?
-                        if self.get_deck_id(self.state["mp"][0],self.state["mp"][1]) == 2 and card.value == 0 and self.get_card(self.state["pickupp"][0],self.state["pickupp"][1]).str_val() == "K":
-                            if len(self.state["board"][self.state["mp"][0]]) == 0: # Czy nie ma kart w rzędzie?
-                                match self.get_deck_id(self.state["pickupp"][0],self.state["pickupp"][1]):
-                                    case 0:
-                                        card = self.state["deck"].pop(self.state["deck_shift"]+self.state["pickupp"][0])
-                                        self.state["board"][self.state["mp"][0]].append(card)
-                                        if self.state["deck_shift"] > 0: self.state["deck_shift"] -= 1
-                                        elif self.cards_on_deck() > 0: self.state["cards_on_deck"] -= 1
-                                        moved = True
-                                    case 1:
-                                        card = self.state["discard"][self.state["pickupp"][0]-3].pop(-1)
-                                        self.state["board"][self.state["mp"][0]].append(card)
-                                        moved = True
-                                    case 2:
-                                        for c in range(len(self.state["board"][self.state["pickupp"][0]])-(self.state["pickupp"][1]-1)):
-                                            card = self.state["board"][self.state["pickupp"][0]].pop(self.state["pickupp"][1]-1)
-                                            self.state["board"][self.state["mp"][0]].append(card)
-                                        moved = True
-                        
-                        # Czy karta jest odwrócona awersem do góry?
-                        elif card.flip:
-
-                            # Czy zaznaczona karta i miejsce jej przeniesienia są takie same? W przeciwnym razie karta pozostanie w miejscu.
-                            if not (self.state["mp"][0] == self.state["pickupp"][0] and self.state["mp"][1] == self.state["pickupp"][1]) and self.get_deck_id(self.state["mp"][0],self.state["mp"][1]):
-
-                                if self.get_deck_id(self.state["mp"][0],self.state["mp"][1]) == 2:
-                                    if self.state["mp"][1] <= len(self.state["board"][self.state["mp"][0]]):
-                                        match self.get_deck_id(self.state["pickupp"][0],self.state["pickupp"][1]):
-                                            case 0:
-                                                if opposite_colors(self.state["deck"][self.state["deck_shift"]+self.state["pickupp"][0]],self.state["board"][self.state["mp"][0]][-1]) and plus1_value(self.state["board"][self.state["mp"][0]][-1],self.state["deck"][self.state["deck_shift"]+self.state["pickupp"][0]]):
-                                                    card = self.state["deck"].pop(self.state["deck_shift"]+self.state["pickupp"][0])
-                                                    self.state["board"][self.state["mp"][0]].append(card)
-                                                    if self.state["deck_shift"] > 0: self.state["deck_shift"] -= 1
-                                                    elif self.cards_on_deck() > 0: self.state["cards_on_deck"] -= 1
-                                                    moved = True
-                                            case 1:
-                                                if opposite_colors(self.state["discard"][self.state["pickupp"][0]-3][-1],self.state["board"][self.state["mp"][0]][-1]) and plus1_value(self.state["board"][self.state["mp"][0]][-1],self.state["discard"][self.state["pickupp"][0]-3][-1]) or not len(self.state["discard"][self.state["pickupp"][0]-3]):
-                                                    card = self.state["discard"][self.state["pickupp"][0]-3].pop(-1)
-                                                    self.state["board"][self.state["mp"][0]].append(card)
-                                                    moved = True
-                                            case 2:
-                                                if opposite_colors(self.state["board"][self.state["pickupp"][0]][self.state["pickupp"][1]-1], self.state["board"][self.state["mp"][0]][self.state["mp"][1]-1]) and plus1_value(self.state["board"][self.state["mp"][0]][self.state["mp"][1]-1],self.state["board"][self.state["pickupp"][0]][self.state["pickupp"][1]-1]):
-                                                    for c in range(len(self.state["board"][self.state["pickupp"][0]])-(self.state["pickupp"][1]-1)):
-                                                        card = self.state["board"][self.state["pickupp"][0]].pop(self.state["pickupp"][1]-1)
-                                                        self.state["board"][self.state["mp"][0]].append(card)
-                                                    moved = True
-                                    
-                                elif self.get_deck_id(self.state["mp"][0],self.state["mp"][1]) == 1:
-
-                                    if self.get_deck_id(self.state["pickupp"][0],self.state["pickupp"][1]) == 2:
-
-                                        if len(self.state["discard"][self.state["mp"][0]-3]):
-                                            moved = self.state["discard"][self.state["mp"][0]-3][-1].suit == self.state["board"][self.state["pickupp"][0]][-1].suit and plus1_value(self.state["board"][self.state["pickupp"][0]][-1], self.state["discard"][self.state["mp"][0]-3][-1])
-                                        else:
-                                            moved = self.state["board"][self.state["pickupp"][0]][-1].value == 1
-                                        
-                                        if moved:
-                                            card = self.state["board"][self.state["pickupp"][0]].pop(-1)
-                                            self.state["discard"][self.state["mp"][0]-3].append(card)
-
-                                    elif self.get_deck_id(self.state["pickupp"][0],self.state["pickupp"][1]) == 0:
-                                        if len(self.state["discard"][self.state["mp"][0]-3]):
-                                            moved = self.state["discard"][self.state["mp"][0]-3][-1].suit == self.state["deck"][self.state["deck_shift"]+self.state["pickupp"][0]].suit and plus1_value(self.state["deck"][self.state["deck_shift"]+self.state["pickupp"][0]],self.state["discard"][self.state["mp"][0]-3][-1])                 
-                                        else:
-                                            moved = self.state["deck"][self.state["deck_shift"]+self.state["pickupp"][0]].value == 1
-
-                                        if moved:
-                                            card = self.state["deck"].pop(self.state["deck_shift"]+self.state["pickupp"][0])
-                                            self.state["discard"][self.state["mp"][0]-3].append(card)
-                                            if self.state["deck_shift"] > 0: self.state["deck_shift"] -= 1
-                                            elif self.cards_on_deck() > 0: self.state["cards_on_deck"] -= 1
-
-                        # Reset zaznaczania karty
-                        self.state["picking"] = False                                
-                        self.state["pickupp"][0] = -1
-                        self.state["pickupp"][1] = -1
-
-                        # Zapisywanie ostatniego ruchu — przeniesienie karty liczy się jako ruch
-                        if moved:
-
-                            self.last_moves.append(last_state)
-                            self.state["move"] += 1
-                            
-                        # Zapisanych ostatnio ruchów nie może być więcej niż 3
-                        if len(self.last_moves) > 3:
-                            self.last_moves.pop(0)
-
-                        # Sprawdzanie warunku wygranej
-
-                        win = True
-
-                        for d in self.state["discard"]:
-                            if len(d) > 0:
-                                if d[-1].value == 13:
-                                    continue
-                            win = False
-                            break
-
-                        if win:
-                            self.state["move"] -= 1
-                            scores_str = self.scores.read()
-                            self.scores.write(("\n" + str(self.state["move"])) if len(scores_str) > 0 else str(self.state["move"]))
-                            self.switch_screen(Screen.WIN)
-                        
-                    else:
-
-                        # Zaznaczanie karty
-
-                        card = self.get_card(self.state["mp"][0],self.state["mp"][1])
-                        if card.value != 0 and card.flip:
-                            self.state["picking"] = True
-                            
-                            self.state["pickupp"][0] = self.state["mp"][0]
-                            self.state["pickupp"][1] = self.state["mp"][1]
-
-                if not self.get_deck_id(self.state["mp"][0],self.state["mp"][1]):
-                    if self.cards_on_deck() > 0:
-                        if self.state["hard"]:
-                            self.state["mp"][0] = self.cards_on_deck()-1 # Jeśli poziom trudności jest Trudny, gracz może wybrać tylko kartę z wierzchu
-                    else:
-                        self.state["mp"][1] += 1
+                # Wejście — gdy podpowiedź jest liczona, co chwilę sprawdzamy, czy już jest gotowa.
+                # Klawisze naciśnięte w międzyczasie (przytrzymana strzałka, wklejony ciąg ruchów)
+                # są obsługiwane po kolei, a plansza jest rysowana raz dla całej paczki
+                fresh = not self.keys
+                measured = self.measured_key()
+                inp = self.read_key(50 if self.hint_pending() else -1)
+                if measured and fresh:
+                    if inp == uc.ERR: measured = False
+                    else: latency.key(inp)
+                self.drain_keys()
+                started = monotonic()
+                while True:
+                    if measured: latency.handling()
+                    self.game_key(inp)
+                    if measured: latency.handled()
+                    if self.cur_screen != Screen.GAME or not self.keys: break
+                    # Limit czasu klatki: przy długiej paczce plansza jest co jakiś czas rysowana
+                    if self.frame_budget is not None and monotonic() - started >= self.frame_budget: break
+                    # Jak przy rysowaniu po każdym klawiszu: widać tylko powiadomienie ostatniego
+                    self.notif = ""
+                    measured = self.measured_key()
+                    inp = self.keys.popleft()
+
+                if latency: latency.updated(self.cur_screen == Screen.GAME)
 
             else:
 
+                # Oczyszczenie ekranu — plansza zostanie potem narysowana od nowa
+                uc.erase()
+                self.renderer.invalidate()
+
                 # Wyświetlanie wyborów
                 for c in range(len(self.choices)):
-                    if c == self.choice: attron(COLOR_PAIR(HIGHLIGHT))
-                    addstr(self.choices[c].label+"\n")
-                    attroff(COLOR_PAIR(HIGHLIGHT))
+                    if c == self.choice: uc.attron(uc.COLOR_PAIR(HIGHLIGHT))
+                    uc.addstr(self.choices[c].label+"\n")
+                    uc.attroff(uc.COLOR_PAIR(HIGHLIGHT))
 
                 # Wyświetlanie opisu
-                addstr("\n"+self.choices[self.choice].description)
+                uc.addstr("\n"+self.choices[self.choice].description)
             
                 # Wejście
-                inp = getch()
+                inp = self.read_key()
                 if inp == ESC and self.cur_screen == Screen.MENU: self.running = False
-                elif inp == KEY_UP and self.choice > 0: self.choice -= 1
-                elif inp == KEY_DOWN and self.choice < len(self.choices)-1: self.choice += 1
+                elif inp == uc.KEY_UP and self.choice > 0: self.choice -= 1
+                elif inp == uc.KEY_DOWN and self.choice < len(self.choices)-1: self.choice += 1
                 elif inp in ENTER:
                     self.switch_screen(self.choices[self.choice].cur_screen)
 
-        self.scores.close()
-        endwin()
+        self.close()
+        uc.endwin()
+        if latency: latency.close()
+
+# Polecenia wiersza poleceń: nazwa -> moduł z funkcjami add_parser i run
+COMMANDS = {
+    "solve": "batch",
+    "verify": "records",
+    "bench": "bench",
+    "bots": "bots",
+    "cache": "cache",
+    "serve": "server",
+    "stress": "stress",
+    "index": "winnable",
+}
+
+# Wiersz poleceń. Bez polecenia uruchamiana jest gra
+def main(argv):
+    import argparse
+    import importlib
+
+    options = argparse.ArgumentParser(prog="pasjans.py", add_help=False, exit_on_error=False)
+    options.add_argument("--record", metavar="KATALOG", help="zapisuj rozegrane partie w katalogu (patrz polecenie verify)")
+    options.add_argument("--latency", metavar="PLIK", help="mierz opóźnienia klawiszy i zapisz raport do pliku (także po sygnale SIGUSR1)")
+    options.add_argument("--profile", action="store_true", help="z --latency: profil cProfile dla każdej fazy (PLIK.stan.prof, PLIK.rysowanie.prof)")
+    options.add_argument("--memory", action="store_true", help="z --latency: pamięć przydzielana w każdej fazie (tracemalloc)")
+    options.add_argument("--frame-budget", type=float, metavar="MS", help="najdłuższa obsługa paczki klawiszy przed narysowaniem klatki (domyślnie bez limitu)")
+
+    # Importowany jest tylko moduł wybranego polecenia, więc samo uruchomienie gry
+    # nie ładuje żadnego z nich. Wszystkie są potrzebne tylko do pomocy (-h)
+    # i komunikatu o nieznanym poleceniu
+    try:
+        rest = options.parse_known_args(argv)[1]
+    except argparse.ArgumentError:
+        rest = argv # błąd w opcjach zgłosi pełny parser poniżej
+    words = [a for a in rest if not a.startswith("-")]
+    if words and words[0] in COMMANDS:
+        modules = [COMMANDS[words[0]]]
+    elif words or "-h" in rest or "--help" in rest:
+        modules = COMMANDS.values()
+    else:
+        modules = []
+
+    parser = argparse.ArgumentParser(prog="pasjans.py", description="Pasjans w terminalu.", parents=[options])
+    commands = parser.add_subparsers(dest="command", title="polecenia")
+    for module in modules:
+        importlib.import_module(module).add_parser(commands)
+
+    args = parser.parse_args(argv)
+    if (args.profile or args.memory) and args.latency is None:
+        parser.error("--profile i --memory wymagają --latency")
+
+    if args.command is None:
+        latency = None
+        if args.latency:
+            from instrument import Latency
+            latency = Latency(args.latency, key_kinds(), args.profile, args.memory)
+        game = Game(args.record, latency, None if args.frame_budget is None else args.frame_budget / 1000)
+        game.run()
+        del game
+    else:
+        args.run(args)
 
 if __name__ == "__main__":
-    game = Game()
-    game.run()
-    del game
+    main(sys.argv[1:])
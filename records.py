@@ -0,0 +1,203 @@
+# ZAPISY PARTII
+#
+# Każda partia (gracza albo bota) może zostać zapisana jako numer rozdania, poziom
+# trudności i ciąg ruchów po jednym bajcie. Zapisy są dopisywane do plików-segmentów
+# w katalogu; nowy segment zaczyna się, gdy bieżący przekroczy SEGMENT_SIZE.
+# Czytnik przechodzi po segmentach strumieniowo (mmap) i odtwarza każdą partię
+# według zasad z engine.py, sprawdzając zapisany wynik — tak weryfikujemy wpisy
+# z tablicy wyników i wykrywamy regresje po zmianach zasad.
+
+import os
+import sys
+import mmap
+import struct
+from time import perf_counter
+
+from array import array
+
+from engine import Klondike, History, is_draw, record_move, fits_tableau, FOUNDATION
+
+# Ruch w jednym bajcie: skąd*16 + dokąd. Liczby przenoszonych kart nie trzeba
+# zapisywać — między kolumnami gry pasuje najwyżej jedna. Dwa kody nie są ruchami:
+UNDO = 0xFF # cofnięcie ostatniego ruchu
+REDO = 0xFE # ponowienie cofniętego ruchu
+
+# Segment: nagłówek MAGIC, a po nim zapisy: RECORD (numer rozdania, poziom trudności,
+# czy wygrana, liczba ruchów, długość ciągu ruchów) i ciąg ruchów
+MAGIC = b"PSJG"
+RECORD = struct.Struct("<IBBHI")
+SEGMENT_SIZE = 64 << 20
+SEGMENT_NAME = "partie-%06d.bin"
+
+def pack_move(move):
+    return move[0] << 4 | move[1]
+
+# Ruch silnika dla bajtu ruchu w danej pozycji (liczba kart 0 - ruch niemożliwy)
+def unpack_move(state, code):
+    src, dst = code >> 4, code & 15
+    if src < FOUNDATION and dst < FOUNDATION:
+        column = state.column(src)
+        top = state.top(dst)
+        for n in range(1, len(column) - state.hidden(src) + 1):
+            if fits_tableau(column[-n], top):
+                return (src, dst, n)
+        return (src, dst, 0)
+    return (src, dst, 0 if src == dst else 1)
+
+# Historia ruchów, która dodatkowo zapisuje ciąg ruchów, cofnięć i ponowień
+class RecordedHistory(History):
+    __slots__ = ("ops",)
+
+    def __init__(self):
+        super().__init__()
+        self.ops = bytearray()
+
+    # Historia z zapisów wykonanych i cofniętych ruchów (np. z zapisanej gry). Ciąg
+    # ruchów jest odtwarzany tak, żeby jego powtórzenie dawało tę samą historię
+    @classmethod
+    def restore(cls, done, undone):
+        history = cls()
+        history.done = array("I", done)
+        history.undone = array("I", undone)
+        history.ops += bytes(pack_move(record_move(r)) for r in done)
+        history.ops += bytes(pack_move(record_move(r)) for r in reversed(undone))
+        history.ops += bytes([UNDO]) * len(undone)
+        return history
+
+    def apply(self, state, move):
+        self.ops.append(pack_move(move))
+        return super().apply(state, move)
+
+    def undo(self, state):
+        record = super().undo(state)
+        if record is not None: self.ops.append(UNDO)
+        return record
+
+    def redo(self, state):
+        record = super().redo(state)
+        if record is not None: self.ops.append(REDO)
+        return record
+
+# ZAPIS
+
+def segment_paths(directory):
+    names = sorted(n for n in os.listdir(directory) if n.startswith("partie-") and n.endswith(".bin"))
+    return [os.path.join(directory, n) for n in names]
+
+class RecordWriter:
+    def __init__(self, directory, segment_size=SEGMENT_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        paths = segment_paths(directory)
+        self.index = len(paths) - 1
+        if paths:
+            # Dopisywanie do ostatniego segmentu — bez zapisu przerwanego w połowie
+            end = valid_end(paths[-1])
+            self.file = open(paths[-1], "r+b")
+            self.file.truncate(end)
+            self.file.seek(end)
+        else:
+            self._next_segment()
+
+    def _next_segment(self):
+        self.index += 1
+        self.file = open(os.path.join(self.directory, SEGMENT_NAME % self.index), "wb")
+        self.file.write(MAGIC)
+
+    # Zapisanie partii: ops - ciąg bajtów ruchów (np. RecordedHistory.ops)
+    def write(self, seed, hard, won, moves, ops):
+        if self.file.tell() >= self.segment_size:
+            self.file.close()
+            self._next_segment()
+        self.file.write(RECORD.pack(seed, hard, won, min(moves, 0xFFFF), len(ops)))
+        self.file.write(ops)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+# ODCZYT
+
+# Zapisy z jednego segmentu: krotki (numer, trudny, wygrana, liczba ruchów, ruchy);
+# niepełny ostatni zapis jest pomijany
+def read_segment(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + ": to nie jest plik zapisów partii")
+        if os.fstat(f.fileno()).st_size == len(MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            o, end = len(MAGIC), len(data)
+            while o + RECORD.size <= end:
+                seed, hard, won, moves, length = RECORD.unpack_from(data, o)
+                o += RECORD.size
+                if o + length > end:
+                    break
+                yield seed, hard, won, moves, data[o:o+length]
+                o += length
+
+# Koniec ostatniego pełnego zapisu w segmencie
+def valid_end(path):
+    end = len(MAGIC)
+    for record in read_segment(path):
+        end += RECORD.size + len(record[4])
+    return end
+
+# Wszystkie zapisy z katalogu, segment po segmencie
+def read_records(directory):
+    for path in segment_paths(directory):
+        yield from read_segment(path)
+
+# WERYFIKACJA
+
+# Odtworzenie partii; zwraca opis niezgodności albo None, gdy zapis się zgadza
+def verify(seed, hard, won, moves, ops):
+    state = Klondike.deal(hard, seed)
+    history = History()
+    for i, code in enumerate(ops):
+        if code == UNDO:
+            if history.undo(state) is None: return "ruch %d: nie ma czego cofnąć" % i
+        elif code == REDO:
+            if history.redo(state) is None: return "ruch %d: nie ma czego ponowić" % i
+        else:
+            move = unpack_move(state, code)
+            if not state.is_legal(move): return "ruch %d: niedozwolony ruch %r" % (i, move)
+            history.apply(state, move)
+
+    # Licznik ruchów gry liczy przeniesienia kart, bez doborów
+    played = sum(1 for record in history.done if not is_draw(record))
+    if played != moves: return "liczba ruchów %d, a zapisano %d" % (played, moves)
+    if state.is_won() != bool(won): return "wygrana się nie zgadza"
+    return None
+
+# Weryfikacja wszystkich zapisów z katalogu; zwraca liczbę zapisów i niezgodności
+def verify_all(directory, verbose=False, out=sys.stderr):
+    count = bad = 0
+    start = perf_counter()
+    for seed, hard, won, moves, ops in read_records(directory):
+        error = verify(seed, hard, won, moves, ops)
+        count += 1
+        if error is not None:
+            bad += 1
+            print("rozdanie %d (%s): %s" % (seed, "trudny" if hard else "łatwy", error), file=out)
+        elif verbose:
+            print("rozdanie %d (%s): %d ruchów, %s" % (seed, "trudny" if hard else "łatwy", moves, "wygrana" if won else "przerwana"), file=out)
+    elapsed = perf_counter() - start
+    print("%d partii, %d niezgodnych, %.1f s (%.0f partii/s)" % (count, bad, elapsed, count / elapsed if elapsed else 0), file=out)
+    return count, bad
+
+# WIERSZ POLECEŃ
+
+def add_parser(commands):
+    parser = commands.add_parser("verify", help="odtworzenie i sprawdzenie zapisanych partii")
+    parser.add_argument("directory", help="katalog z zapisami partii")
+    parser.add_argument("--verbose", action="store_true", help="wypisuj każdą partię")
+    parser.set_defaults(run=run)
+
+def run(args):
+    count, bad = verify_all(args.directory, args.verbose)
+    if bad:
+        sys.exit(1)
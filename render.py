@@ -0,0 +1,52 @@
+# RYSOWANIE PLANSZY
+#
+# Klatka to słownik komórek: pozycja (wiersz, kolumna) -> (tekst, atrybut).
+# Renderer pamięta ostatnio narysowaną klatkę i przy kolejnej wysyła do terminala
+# tylko komórki, które się zmieniły — przesunięcie wskaźnika to dwie komórki,
+# a nie cały ekran. Samo rysowanie niczego nie zmienia w stanie gry.
+
+class Renderer:
+    # curses - moduł z funkcjami curses (domyślnie unicurses); w pomiarach
+    # można podać atrapę, która tylko liczy wywołania
+    def __init__(self, window, curses=None):
+        if curses is None:
+            import unicurses as curses
+        self.curses = curses
+        self.window = window
+        self.frame = {} # ostatnio narysowana klatka
+
+    # Zapomnienie narysowanej klatki (np. po wyczyszczeniu ekranu przez inny ekran gry)
+    def invalidate(self):
+        self.frame = {}
+
+    # Narysowanie klatki; zwraca liczbę przerysowanych komórek
+    def draw(self, frame):
+        c = self.curses
+        w = self.window
+
+        if not self.frame:
+            c.werase(w)
+
+        drawn = 0
+        old = self.frame
+
+        # Komórki, które zniknęły, są zamazywane spacjami
+        for pos, (text, attr) in old.items():
+            if pos not in frame:
+                c.mvwaddstr(w, pos[0], pos[1], " " * len(text), c.A_NORMAL)
+                drawn += 1
+
+        for pos, cell in frame.items():
+            previous = old.get(pos)
+            if previous != cell:
+                text, attr = cell
+                # Krótszy tekst musi przykryć resztę poprzedniego
+                if previous is not None and len(previous[0]) > len(text):
+                    text = text.ljust(len(previous[0]))
+                c.mvwaddstr(w, pos[0], pos[1], text, attr)
+                drawn += 1
+
+        self.frame = frame
+        c.wnoutrefresh(w)
+        c.doupdate()
+        return drawn
@@ -0,0 +1,128 @@
+# ZAPISANE GRY
+#
+# Plik z kilkoma miejscami zapisu o stałym rozmiarze, mapowany do pamięci (mmap).
+# Miejsce zapisu to nagłówek, bufor stanu z engine.py (dowolnego wariantu gry,
+# patrz variants.py) i zapisy ruchów historii —
+# zapisanie gry to jedno skopiowanie gotowego bufora, a wczytanie nie wymaga
+# żadnego parsowania. Oba trwają ułamek milisekundy.
+#
+# Zapisywana jest cała historia ruchów, więc zapisy partii (records.py) wznowionej
+# gry dalej odtwarzają się od rozdania. Historia dłuższa niż mieści miejsce zapisu
+# powiększa wszystkie miejsca (rozmiar miejsca jest w nagłówku pliku) — to jedyny
+# zapis, który nie jest pojedynczym skopiowaniem bufora.
+
+import os
+import mmap
+import struct
+from array import array
+from time import time
+
+from variants import VARIANTS
+
+PATH = "./zapis.sav"
+SLOTS = 8
+
+# Nagłówek pliku: FILE_MAGIC i rozmiar miejsca zapisu
+FILE_MAGIC = b"PSJZ"
+FILE_HEADER = struct.Struct("<4sI8x")
+
+# Nagłówek miejsca zapisu: MAGIC (puste miejsce ma same zera), numer rozdania,
+# numer ruchu, liczba wykonanych i cofniętych ruchów w historii, czas gry, chwila zapisu,
+# nazwa wariantu gry. MAGIC zmienia się razem z układem bufora stanu w engine.py
+MAGIC = b"PSJ3"
+HEADER = struct.Struct("<4sIIII4xdd16s")
+HISTORY_SPACE = 8192 # Miejsce na ruchy historii w nowym pliku
+STATE = HEADER.size
+SIZE = max(variant.SIZE for variant in VARIANTS.values()) # miejsce na bufor stanu największego wariantu
+HISTORY = STATE + (SIZE + 3) // 4 * 4
+SLOT_SIZE = HISTORY + 4 * HISTORY_SPACE # najmniejszy rozmiar miejsca zapisu
+
+class SavedGame:
+    def __init__(self, state, done, undone, seed, move, elapsed, saved):
+        self.state = state # stan wariantu gry (np. Klondike)
+        self.done = done # array("I") zapisów wykonanych ruchów
+        self.undone = undone # array("I") zapisów cofniętych ruchów
+        self.seed = seed
+        self.move = move # numer ruchu (jak w Game.state)
+        self.elapsed = elapsed # czas gry w sekundach
+        self.saved = saved # chwila zapisu (sekundy od 1970 r.)
+
+class SaveSlots:
+    def __init__(self, path=PATH, slots=SLOTS):
+        self.slots = slots
+        self.file = open(path, "r+b" if os.path.exists(path) else "w+b")
+        header = self.file.read(FILE_HEADER.size)
+        magic, slot_size = FILE_HEADER.unpack(header) if len(header) == FILE_HEADER.size else (None, 0)
+        if magic != FILE_MAGIC or slot_size < SLOT_SIZE:
+            # Nowy plik albo plik w dawnym układzie — same puste miejsca
+            slot_size = SLOT_SIZE
+            self.file.truncate(0)
+            self.file.write(FILE_HEADER.pack(FILE_MAGIC, slot_size))
+        if os.fstat(self.file.fileno()).st_size != FILE_HEADER.size + slots * slot_size:
+            self.file.truncate(FILE_HEADER.size + slots * slot_size)
+        self._map(slot_size)
+
+    def _map(self, slot_size):
+        self.slot_size = slot_size
+        self.data = mmap.mmap(self.file.fileno(), FILE_HEADER.size + self.slots * slot_size)
+
+    def _offset(self, slot):
+        return FILE_HEADER.size + slot * self.slot_size
+
+    # Powiększenie miejsc zapisu, żeby zmieściła się historia n ruchów. Miejsca są
+    # przenoszone od ostatniego, bo każde trafia dalej, niż było
+    def _grow(self, n):
+        old = self.slot_size
+        size = old
+        while size < HISTORY + 4 * n:
+            size *= 2
+        self.data.close()
+        self.file.truncate(FILE_HEADER.size + self.slots * size)
+        self._map(size)
+        for slot in reversed(range(self.slots)):
+            self.data.move(self._offset(slot), FILE_HEADER.size + slot * old, old)
+        FILE_HEADER.pack_into(self.data, 0, FILE_MAGIC, size)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    # Czy w miejscu jest zapisana gra?
+    def used(self, slot):
+        o = self._offset(slot)
+        return self.data[o:o+4] == MAGIC
+
+    # Zapisanie gry: stan (Klondike), historia (History), numer rozdania, numer ruchu, czas gry
+    def save(self, slot, state, history, seed, move, elapsed):
+        done, undone = history.done, history.undone
+        if HISTORY + 4 * (len(done) + len(undone)) > self.slot_size:
+            self._grow(len(done) + len(undone))
+
+        buf = bytearray(HISTORY + 4 * (len(done) + len(undone)))
+        HEADER.pack_into(buf, 0, b"\0\0\0\0", seed, move, len(done), len(undone), elapsed, time(), state.rules.name.encode())
+        buf[STATE:STATE+len(state.buf)] = state.buf
+        buf[HISTORY:] = done.tobytes() + undone.tobytes()
+
+        # Znacznik jest wpisywany na końcu, więc przerwany zapis zostawia puste miejsce
+        o = self._offset(slot)
+        self.data[o:o+4] = bytes(4)
+        self.data[o+4:o+len(buf)] = buf[4:]
+        self.data[o:o+4] = MAGIC
+
+    # Wczytanie gry (None - puste miejsce albo nieznany wariant gry)
+    def load(self, slot):
+        o = self._offset(slot)
+        magic, seed, move, n_done, n_undone, elapsed, saved, name = HEADER.unpack_from(self.data, o)
+        variant = VARIANTS.get(name.rstrip(b"\0").decode("ascii", "replace"))
+        if magic != MAGIC or variant is None:
+            return None
+        state = variant.from_bytes(self.data[o+STATE:o+STATE+variant.SIZE])
+        history = array("I", self.data[o+HISTORY:o+HISTORY+4*(n_done+n_undone)])
+        return SavedGame(state, history[:n_done], history[n_done:], seed, move, elapsed, saved)
+
+    def clear(self, slot):
+        o = self._offset(slot)
+        self.data[o:o+4] = bytes(4)
+
+    def flush(self):
+        self.data.flush()
@@ -0,0 +1,83 @@
+# TABLICA WYNIKÓW
+#
+# Wyniki są zapisywane w bazie SQLite (moduł standardowy). Indeks na
+# (wariant, poziom trudności, liczba ruchów, czas) sprawia, że najlepsze wyniki są
+# odczytywane prosto z indeksu — bez czytania i sortowania wszystkich partii,
+# więc tablica otwiera się od razu także po milionach partii rozegranych przez boty.
+
+import os
+import sqlite3
+from time import time
+
+PATH = "./wyniki.db"
+OLD_PATH = "./wyniki.txt" # dawny plik wyników (same liczby ruchów, jedna w wierszu)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    variant TEXT NOT NULL DEFAULT 'klondike', -- wariant gry (patrz variants.py)
+    hard INTEGER,             -- poziom trudności (NULL - nieznany, wyniki z wyniki.txt)
+    moves INTEGER NOT NULL,   -- liczba ruchów
+    seed INTEGER,             -- numer rozdania
+    duration REAL,            -- czas gry w sekundach
+    played REAL NOT NULL      -- chwila zakończenia gry (sekundy od 1970 r.)
+);
+"""
+
+# Indeksy — tworzone po uzupełnieniu kolumn tabeli z dawnej wersji bazy
+INDEXES = """
+DROP INDEX IF EXISTS scores_best;
+CREATE INDEX IF NOT EXISTS scores_variant_best ON scores (variant, hard, moves, duration);
+"""
+
+class ScoreStore:
+    def __init__(self, path=PATH, old_path=OLD_PATH):
+        self.db = sqlite3.connect(path)
+        # Dziennik WAL — boty mogą dopisywać wyniki, gdy ktoś przegląda tablicę
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        # Baza sprzed wariantów gry: wszystkie jej wyniki są z klasycznego Klondike
+        if "variant" not in [c[1] for c in self.db.execute("PRAGMA table_info(scores)")]:
+            with self.db:
+                self.db.execute("ALTER TABLE scores ADD COLUMN variant TEXT NOT NULL DEFAULT 'klondike'")
+        self.db.executescript(INDEXES)
+        if old_path is not None and os.path.exists(old_path):
+            self.migrate(old_path)
+
+    def close(self):
+        self.db.close()
+
+    # Zapisanie wyniku jednej partii
+    def add(self, hard, moves, seed=None, duration=None, played=None, variant="klondike"):
+        with self.db:
+            self.db.execute(
+                "INSERT INTO scores (variant, hard, moves, seed, duration, played) VALUES (?, ?, ?, ?, ?, ?)",
+                (variant, int(hard), moves, seed, duration, time() if played is None else played))
+
+    # Zapisanie wielu wyników klasycznego wariantu w jednej transakcji: krotki
+    # (trudny, ruchy, rozdanie, czas, chwila zakończenia)
+    def add_many(self, rows):
+        with self.db:
+            self.db.executemany("INSERT INTO scores (hard, moves, seed, duration, played) VALUES (?, ?, ?, ?, ?)", rows)
+
+    # Najlepsze wyniki (najmniej ruchów, potem najkrótszy czas) dla wariantu i poziomu trudności;
+    # krotki (ruchy, rozdanie, czas, chwila zakończenia)
+    def best(self, hard, n=10, variant="klondike"):
+        if hard is None:
+            query = "SELECT moves, seed, duration, played FROM scores WHERE variant = ? AND hard IS NULL ORDER BY moves, duration LIMIT ?"
+            return self.db.execute(query, (variant, n)).fetchall()
+        query = "SELECT moves, seed, duration, played FROM scores WHERE variant = ? AND hard = ? ORDER BY moves, duration LIMIT ?"
+        return self.db.execute(query, (variant, int(hard), n)).fetchall()
+
+    # Liczby ruchów wszystkich wyników dla poziomu trudności, rosnąco (np. do porównania z botami)
+    def moves(self, hard, variant="klondike"):
+        query = "SELECT moves FROM scores WHERE variant = ? AND hard = ? ORDER BY moves"
+        return [m for m, in self.db.execute(query, (variant, int(hard)))]
+
+    # Przeniesienie wyników z dawnego pliku tekstowego; plik dostaje końcówkę .bak
+    def migrate(self, old_path):
+        with open(old_path) as f:
+            moves = [int(line) for line in f if line.strip()]
+        played = os.path.getmtime(old_path)
+        self.add_many((None, m, None, None, played) for m in moves)
+        os.replace(old_path, old_path + ".bak")
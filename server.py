@@ -0,0 +1,229 @@
+# SERWER GRY
+#
+# Wiele niezależnych partii w jednym procesie: serwer asyncio na gnieździe
+# uniksowym (albo na stdin/stdout) z prostym protokołem wierszowym. Z serwera
+# korzystają boty w turniejach i nakładki (np. przeglądarkowe) zamiast osobnego
+# terminala i procesu dla każdej gry.
+#
+# Żądanie to jeden wiersz tekstu: polecenie i argumenty oddzielone spacjami.
+# Odpowiedź to jeden wiersz JSON: {"ok": true, ...} albo {"ok": false, "error": opis}.
+#
+#   new [numer rozdania] [0|1 - trudny]   nowa partia; odpowiedź: id, seed
+#   move ID SKĄD DOKĄD [LICZBA KART]       ruch (stosy jak w engine.py); moves, won
+#   draw ID                                dobór karty ze stosu rezerwowego; moves, won
+#   undo ID / redo ID                      cofnięcie / ponowienie ruchu; moves, won
+#   state ID                               stan partii (karty to liczby 0–51, patrz engine.py)
+#   moves ID                               dozwolone ruchy: lista [skąd, dokąd, liczba kart]
+#   reach ID [K]                           karty stosu rezerwowego do zagrania w ciągu K doborów:
+#                                          lista [liczba doborów, stos, karta] (patrz Klondike.stock_reach)
+#   close ID                               zakończenie partii
+#
+# Partie należą do połączenia, które je utworzyło, i znikają razem z nim.
+# Pamięć partii jest ograniczona: bufor stanu i najwyżej MAX_HISTORY ruchów do cofnięcia.
+
+import sys
+import json
+import asyncio
+
+from engine import Klondike, History, random_seed, is_draw, DRAW, SEEDS, FOUNDATION, SHIFT, DECK_LEN
+from records import unpack_move
+
+PATH = "./pasjans.sock"
+MAX_SESSIONS = 100_000 # najwięcej partii na serwerze
+MAX_HISTORY = 1024 # najwięcej ruchów do cofnięcia w partii
+
+class Session:
+    __slots__ = ("state", "history", "seed", "moves")
+
+    def __init__(self, state, seed):
+        self.state = state # Klondike
+        self.history = History()
+        self.seed = seed
+        self.moves = 0 # liczba przeniesień kart (bez doborów), jak licznik ruchów w grze
+
+class ProtocolError(Exception):
+    pass
+
+class Server:
+    def __init__(self, max_sessions=MAX_SESSIONS, max_history=MAX_HISTORY):
+        self.max_sessions = max_sessions
+        self.max_history = max_history
+        self.sessions = {} # id -> Session
+        self.next_id = 1
+        self.commands = {
+            "new": self.new, "move": self.move, "draw": self.draw, "undo": self.undo, "redo": self.redo,
+            "state": self.state, "moves": self.legal_moves, "reach": self.reach,
+            "close": self.close,
+        }
+
+    # Odpowiedź (wiersz JSON bez znaku nowego wiersza) na wiersz żądania;
+    # owned - zbiór id partii połączenia
+    def handle(self, line, owned):
+        words = line.split()
+        if not words:
+            return '{"ok":false,"error":"puste żądanie"}'
+        command = self.commands.get(words[0])
+        try:
+            if command is None:
+                raise ProtocolError("nieznane polecenie: " + words[0])
+            result = command(words[1:], owned)
+        except ProtocolError as e:
+            return json.dumps({"ok": False, "error": str(e)}, ensure_ascii=False)
+        except ValueError:
+            return json.dumps({"ok": False, "error": "niepoprawne argumenty: " + line.strip()}, ensure_ascii=False)
+        result["ok"] = True
+        return json.dumps(result, separators=(",", ":"))
+
+    def _session(self, args, owned, count=1):
+        if len(args) < count:
+            raise ProtocolError("za mało argumentów")
+        id = int(args[0])
+        if id not in owned:
+            raise ProtocolError("nie ma partii %d" % id)
+        return self.sessions[id]
+
+    def _result(self, session):
+        return {"moves": session.moves, "won": session.state.is_won()}
+
+    # Wykonanie ruchu z zapisem w historii ograniczonej do max_history ruchów
+    def _apply(self, session, move):
+        history = session.history
+        history.apply(session.state, move)
+        if len(history.done) > self.max_history:
+            del history.done[:len(history.done) - self.max_history]
+        if move != DRAW:
+            session.moves += 1
+
+    # POLECENIA
+
+    def new(self, args, owned):
+        if len(self.sessions) >= self.max_sessions:
+            raise ProtocolError("za dużo partii na serwerze")
+        seed = int(args[0]) % SEEDS if args else random_seed()
+        hard = len(args) > 1 and args[1] == "1"
+        id = self.next_id
+        self.next_id += 1
+        self.sessions[id] = Session(Klondike.deal(hard, seed), seed)
+        owned.add(id)
+        return {"id": id, "seed": seed}
+
+    def move(self, args, owned):
+        session = self._session(args, owned, 3)
+        src, dst = int(args[1]), int(args[2])
+        if not (0 <= src < 16 and 0 <= dst < 16):
+            raise ProtocolError("nie ma takiego stosu")
+        move = (src, dst, int(args[3])) if len(args) > 3 else unpack_move(session.state, src << 4 | dst)
+        if move == DRAW or not session.state.is_legal(move):
+            raise ProtocolError("niedozwolony ruch")
+        self._apply(session, move)
+        return self._result(session)
+
+    def draw(self, args, owned):
+        session = self._session(args, owned)
+        if not session.state.is_legal(DRAW):
+            raise ProtocolError("stos rezerwowy jest pusty")
+        self._apply(session, DRAW)
+        return self._result(session)
+
+    def undo(self, args, owned):
+        session = self._session(args, owned)
+        record = session.history.undo(session.state)
+        if record is None:
+            raise ProtocolError("nie ma czego cofnąć")
+        if not is_draw(record):
+            session.moves -= 1
+        return self._result(session)
+
+    def redo(self, args, owned):
+        session = self._session(args, owned)
+        record = session.history.redo(session.state)
+        if record is None:
+            raise ProtocolError("nie ma czego ponowić")
+        if not is_draw(record):
+            session.moves += 1
+        return self._result(session)
+
+    def state(self, args, owned):
+        session = self._session(args, owned)
+        k = session.state
+        buf = k.buf
+        return {
+            "seed": session.seed,
+            "hard": k.hard,
+            "moves": session.moves,
+            "won": k.is_won(),
+            "stock": buf[DECK_LEN] - buf[SHIFT] - k.visible(), # liczba niedobranych kart
+            "waste": [k.waste_card(i) for i in range(k.visible())],
+            "foundations": [k.top(FOUNDATION+n) for n in range(4)],
+            "columns": [{"hidden": k.hidden(r), "cards": list(k.column(r)[k.hidden(r):])} for r in range(7)],
+        }
+
+    def legal_moves(self, args, owned):
+        session = self._session(args, owned)
+        return {"moves": session.state.legal_moves()}
+
+    def reach(self, args, owned):
+        session = self._session(args, owned)
+        return {"reach": session.state.stock_reach(int(args[1]) if len(args) > 1 else None)}
+
+    def close(self, args, owned):
+        self._session(args, owned)
+        id = int(args[0])
+        owned.discard(id)
+        del self.sessions[id]
+        return {}
+
+    # POŁĄCZENIA
+
+    async def serve_connection(self, reader, writer):
+        owned = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write(self.handle(line.decode("utf-8", "replace"), owned).encode() + b"\n")
+                # Czekamy tylko, gdy bufor zapisu jest pełny — żądania wysłane
+                # hurtem są obsługiwane bez przełączania zadań
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError): # ValueError - za długi wiersz
+            pass
+        finally:
+            for id in owned:
+                del self.sessions[id]
+            writer.close()
+
+    async def serve_unix(self, path):
+        server = await asyncio.start_unix_server(self.serve_connection, path, limit=1 << 16)
+        async with server:
+            await server.serve_forever()
+
+    # Jedno połączenie na stdin/stdout (np. dla procesu uruchomionego przez bota).
+    # Jedno połączenie nie potrzebuje pętli zdarzeń, a stdout może być zwykłym plikiem
+    def serve_stdio(self):
+        owned = set()
+        out = sys.stdout.buffer
+        for line in sys.stdin.buffer:
+            out.write(self.handle(line.decode("utf-8", "replace"), owned).encode() + b"\n")
+            out.flush()
+
+# WIERSZ POLECEŃ
+
+def add_parser(commands):
+    parser = commands.add_parser("serve", help="serwer wielu partii (gniazdo uniksowe albo stdin/stdout)")
+    parser.add_argument("--socket", default=PATH, help="ścieżka gniazda uniksowego (domyślnie %(default)s)")
+    parser.add_argument("--stdio", action="store_true", help="obsługuj jedno połączenie na stdin/stdout")
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS, help="najwięcej partii na serwerze")
+    parser.add_argument("--max-history", type=int, default=MAX_HISTORY, help="najwięcej ruchów do cofnięcia w partii")
+    parser.set_defaults(run=run)
+
+def run(args):
+    server = Server(args.max_sessions, args.max_history)
+    try:
+        if args.stdio:
+            server.serve_stdio()
+        else:
+            print("Serwer na " + args.socket, file=sys.stderr)
+            asyncio.run(server.serve_unix(args.socket))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,404 @@
+# ROZWIĄZYWANIE PARTII
+#
+# Przeszukiwanie w głąb z iteracyjnym pogłębianiem nad silnikiem z engine.py.
+# Ruchy są wykonywane i cofane na jednym stanie (apply/undo), stany rozpoznaje
+# przyrostowy hasz Zobrista, a odwiedzone pozycje trafiają do tablicy
+# transpozycji o ograniczonym rozmiarze.
+
+from random import Random
+from time import perf_counter
+
+from engine import (
+    draw_pointers, is_safe, PARENTS, DRAW, STOCK, TABLEAU, FOUNDATION, WASTE, EMPTY,
+    HARD, SHIFT, COD, DECK_LEN, DECK, LENS, HIDDEN, DISCARD, TOPS, BOARD, COLUMN,
+)
+
+# Wyniki rozwiązywania
+UNKNOWN = 0 # Przekroczono limit węzłów lub czasu
+WON = 1 # Partię da się wygrać
+LOST = 2 # Partii nie da się wygrać
+
+INFINITE = 0xFFFF # Głębokość wpisu oznaczająca dokładnie zbadaną przegraną
+
+# KLUCZE ZOBRISTA
+
+_rng = Random(0x5A5A)
+def _keys(n):
+    return [_rng.getrandbits(64) for _ in range(n)]
+
+Z_BOARD = _keys(7*COLUMN*52) # karta na danym miejscu kolumny gry
+Z_HIDDEN = _keys(7*(COLUMN+1)) # liczba zakrytych kart w kolumnie
+Z_DISCARD = _keys(52) + [0]*204 # wierzchnia karta stosu końcowego (bez względu na stos)
+Z_DECK = _keys(52) # karta w stosie rezerwowym (kolejność talii się nie zmienia)
+Z_POINTERS = _keys(32*4) # przesunięcie i liczba kart stosu rezerwowego
+
+_cycles = {}
+
+# Składnik hasza od wskaźników stosu rezerwowego. Położenia z obiegu talii, który
+# zaczyna się po jej odwróceniu, są sobie równoważne (z każdego da się dojść do
+# każdego samym dobieraniem), więc mają wspólny składnik 0.
+def pointers_key(buf):
+    length, shift, cod = buf[DECK_LEN], buf[SHIFT], buf[COD]
+    key = (length, buf[HARD])
+    cycle = _cycles.get(key)
+    if cycle is None:
+        cycle = _cycles[key] = set()
+        pointers = (0, 0)
+        while pointers not in cycle:
+            cycle.add(pointers)
+            pointers = draw_pointers(length, pointers[0], pointers[1], buf[HARD])
+    if (shift, cod) in cycle:
+        return 0
+    return Z_POINTERS[shift*4 + cod]
+
+# Pełny hasz stanu
+def zobrist(state):
+    buf = state.buf
+    h = pointers_key(buf)
+    for r in range(7):
+        o = BOARD + r*COLUMN
+        for p in range(buf[LENS+r]):
+            h ^= Z_BOARD[(r*COLUMN + p)*52 + buf[o+p]]
+        h ^= Z_HIDDEN[r*(COLUMN+1) + buf[HIDDEN+r]]
+    for f in range(4):
+        h ^= Z_DISCARD[buf[DISCARD+f]]
+    for card in state.deck:
+        h ^= Z_DECK[card]
+    return h
+
+# Zmiana hasza wywołana ruchem (bez wskaźników stosu rezerwowego), liczona przed jego wykonaniem
+def zobrist_delta(state, move):
+    src, dst, n = move
+    if src == STOCK:
+        return 0
+    buf = state.buf
+    h = 0
+
+    if src < FOUNDATION:
+        length = buf[LENS+src]
+        base = length - n
+        o = BOARD + src*COLUMN
+        cards = buf[o+base:o+length]
+        for i in range(n):
+            h ^= Z_BOARD[(src*COLUMN + base + i)*52 + cards[i]]
+        hidden = buf[HIDDEN+src]
+        if base and hidden == base:
+            h ^= Z_HIDDEN[src*(COLUMN+1) + hidden] ^ Z_HIDDEN[src*(COLUMN+1) + hidden - 1]
+    elif src < WASTE:
+        card = buf[DISCARD+src-FOUNDATION]
+        below = EMPTY if card % 13 == 0 else card - 1
+        h ^= Z_DISCARD[card] ^ Z_DISCARD[below]
+        cards = (card,)
+    else:
+        cards = (buf[DECK + buf[SHIFT] + src - WASTE],)
+        h ^= Z_DECK[cards[0]]
+
+    if dst < FOUNDATION:
+        length = buf[LENS+dst]
+        for i in range(n):
+            h ^= Z_BOARD[(dst*COLUMN + length + i)*52 + cards[i]]
+    else:
+        h ^= Z_DISCARD[buf[DISCARD+dst-FOUNDATION]] ^ Z_DISCARD[cards[0]]
+    return h
+
+# PORZĄDKOWANIE RUCHÓW
+
+# Ruchy rozwiązywacza to pary (liczba doborów, ruch): zamiast osobnego ruchu
+# doboru karty każda karta osiągalna w stosie rezerwowym w ciągu jednego obiegu
+# talii jest od razu zagrywana. Dobory i przenoszenie kart kolumn są przemienne,
+# więc nie traci się przy tym żadnego rozwiązania.
+
+# Dozwolone ruchy posortowane od najbardziej obiecujących. Pomijane są ruchy,
+# które niczego nie zmieniają (król z pustej kolumny do innej pustej), ruchy
+# symetryczne (król trafia tylko do pierwszej pustej kolumny) oraz ruchy, po
+# których odsłonięta karta nie może się do niczego przydać:
+# - przeniesienie części stosu — gdy odsłonięta karta nie może od razu trafić na
+#   stos końcowy. Leży ona pod przenoszoną kartą, tak jak karta, na którą ta trafia,
+#   więc obie są tej samej wartości i koloru i ruch tylko zamienia je miejscami.
+#   Każdą partię z pozycji po nim da się rozegrać bez niego, odkładając go do chwili,
+#   gdy odsłonięta karta może iść na stos końcowy (wtedy ruch nie jest pomijany),
+#   więc pominięcie nie zmienia wyniku rozdania;
+# - przeniesienie karty ze stosu końcowego — gdy nie ma dostępnej karty, która
+#   mogłaby potem na nią trafić;
+# - opróżnienie kolumny — gdy nie ma króla, który ją zajmie.
+def ordered_moves(state):
+    buf = state.buf
+    lens = buf[LENS:LENS+7]
+    hidden = buf[HIDDEN:HIDDEN+7]
+    tops = buf[TOPS:TOPS+7]
+    ftops = buf[DISCARD:DISCARD+4]
+    free_foundation = ftops.find(EMPTY)
+
+    # Karty dostępne do zagrania: odkryte karty kolumn i karty stosu rezerwowego
+    available = bytearray(52)
+    spare_king = False
+    for r in range(7):
+        o = BOARD + r*COLUMN
+        for p in range(hidden[r], lens[r]):
+            available[buf[o+p]] = 1
+            if p and buf[o+p] % 13 == 12:
+                spare_king = True
+    for card in buf[DECK:DECK+buf[DECK_LEN]]:
+        available[card] = 1
+        if card % 13 == 12:
+            spare_king = True
+
+    # Czy dostępna jest karta, która może leżeć na danej karcie?
+    def can_cover(card):
+        v = card % 13 - 1
+        red = card // 13 % 2
+        return v >= 0 and (available[(1-red)*13 + v] or available[(3-red)*13 + v])
+
+    # Stos końcowy, na który może trafić karta (-1 - brak)
+    def foundation_for(card):
+        if card % 13 == 0:
+            return free_foundation
+        return ftops.find(card - 1)
+
+    scored = []
+
+    # Z kolumn gry na stosy końcowe
+    for r in range(7):
+        card = tops[r]
+        if card == EMPTY:
+            continue
+        f = foundation_for(card)
+        if f >= 0:
+            move = (0, (TABLEAU + r, FOUNDATION + f, 1))
+            # Bezpieczny ruch na stos końcowy wykonujemy od razu, bez rozgałęziania
+            if is_safe(card, state):
+                return [move]
+            scored.append((100 + 10*(lens[r] - 1 == hidden[r] > 0), move))
+
+    # Między kolumnami gry
+    for r in range(7):
+        o = BOARD + r*COLUMN + lens[r]
+        for n in range(1, lens[r] - hidden[r] + 1):
+            card = buf[o-n]
+            base = lens[r] - n
+            # Kolumny, na które karta pasuje (król - tylko pierwsza pusta)
+            a, b = PARENTS[card]
+            a, b = tops.find(a), tops.find(b)
+            if a < 0 and b < 0:
+                continue
+            for d in ((a, b) if a < b else (b, a)):
+                if d < 0 or not base and card % 13 == 12:
+                    continue
+                if base and base == hidden[r]:
+                    score = 90 + hidden[r]
+                elif not base:
+                    if not spare_king:
+                        continue
+                    score = 50
+                else:
+                    below = buf[o-n-1]
+                    if foundation_for(below) < 0:
+                        continue
+                    score = 10
+                scored.append((score, (0, (TABLEAU + r, TABLEAU + d, n))))
+
+    # Ze stosu rezerwowego (po ewentualnym doborze kart)
+    hard = buf[HARD]
+    for draws, pile, card in state.stock_reach():
+        f = foundation_for(card)
+        if f >= 0:
+            move = (draws, (pile, FOUNDATION + f, 1))
+            # Na poziomie łatwym każda karta talii pozostaje osiągalna,
+            # więc bezpieczny ruch z talii też wykonujemy od razu
+            if not hard and is_safe(card, state):
+                return [move]
+            scored.append((80 - draws/64, move))
+        a, b = PARENTS[card]
+        a, b = tops.find(a), tops.find(b)
+        for d in ((a, b) if a < b else (b, a)):
+            if d >= 0:
+                scored.append((70 - draws/64, (draws, (pile, TABLEAU + d, 1))))
+
+    # Ze stosów końcowych z powrotem na kolumny gry
+    for f in range(4):
+        card = ftops[f]
+        if card == EMPTY or not can_cover(card):
+            continue
+        a, b = PARENTS[card]
+        a, b = tops.find(a), tops.find(b)
+        for d in ((a, b) if a < b else (b, a)):
+            if d >= 0:
+                scored.append((0, (0, (FOUNDATION + f, TABLEAU + d, 1))))
+
+    scored.sort(key=lambda s: -s[0])
+    return [m for _, m in scored]
+
+# Zamiana ruchów rozwiązywacza na zwykłe ruchy silnika
+def expand(moves):
+    result = []
+    for draws, move in moves:
+        result += [DRAW] * draws
+        result.append(move)
+    return result
+
+# WYNIK
+
+class Result:
+    def __init__(self, status, moves, nodes, elapsed):
+        self.status = status # UNKNOWN, WON albo LOST
+        self.moves = moves # Ruchy prowadzące do wygranej (dla WON)
+        self.nodes = nodes # Liczba odwiedzonych pozycji
+        self.elapsed = elapsed # Czas rozwiązywania w sekundach
+
+# ROZWIĄZYWACZ
+#
+# Tablica transpozycji to dwa słowniki: nowy i stary. Gdy nowy się zapełni,
+# stary jest porzucany, a nowy staje się starym — pamięć jest ograniczona do
+# dwóch pokoleń wpisów, a często odwiedzane pozycje są przenoszone do nowego.
+#
+# Wpis to numer przeszukiwania << 16 | głębokość, do której pozycja nie daje
+# wygranej. Przegrana, której zbadanie nie zależało od pozycji na ścieżce nad
+# nią (nie było cykli do przodków), jest prawdziwa zawsze — taki wpis ma
+# wartość INFINITE i jest wykorzystywany także w kolejnych rozwiązywaniach.
+
+class Solver:
+    def __init__(self, max_entries=1 << 20, first_depth=150):
+        self.max_entries = max_entries
+        self.first_depth = first_depth
+        self.young = {}
+        self.old = {}
+        self.iteration = 0
+
+    def clear(self):
+        self.young = {}
+        self.old = {}
+
+    def _lookup(self, h):
+        entry = self.young.get(h)
+        if entry is None:
+            entry = self.old.get(h)
+            if entry is not None:
+                self._store(h, entry)
+        return entry
+
+    def _store(self, h, entry):
+        if len(self.young) >= self.max_entries // 2:
+            self.old = self.young
+            self.young = {}
+        self.young[h] = entry
+
+    # Rozwiązanie partii od danego stanu (stan nie jest zmieniany).
+    # cancel - opcjonalny obiekt z metodą is_set() (np. threading.Event) przerywający obliczenia
+    def solve(self, state, max_nodes=1_000_000, max_time=None, cancel=None):
+        start = perf_counter()
+        state = state.copy()
+        self.nodes = 0
+        self.deadline = None if max_time is None else start + max_time
+        self.max_nodes = max_nodes
+        self.cancel = cancel
+
+        if state.can_finish():
+            return Result(WON, state.finishing_moves(), 0, perf_counter() - start)
+
+        depth = self.first_depth
+        while True:
+            status, moves = self._search(state, depth)
+            if status is not None:
+                return Result(status, moves, self.nodes, perf_counter() - start)
+            depth *= 2
+
+    # Czy skończył się limit węzłów, czasu, albo obliczenia przerwano?
+    def _out_of_budget(self):
+        if self.nodes >= self.max_nodes:
+            return True
+        if self.deadline is not None and perf_counter() >= self.deadline:
+            return True
+        return self.cancel is not None and self.cancel.is_set()
+
+    # Jedno przeszukiwanie z ograniczeniem głębokości. Zwraca (wynik, ruchy)
+    # albo (None, None), jeśli gdzieś zabrakło głębokości.
+    def _search(self, state, limit):
+        self.iteration += 1
+        tag = self.iteration << 16
+        buf = state.buf
+        apply = state.apply
+        undo = state.undo
+        can_finish = state.can_finish
+        lookup = self._lookup
+        store = self._store
+
+        root = zobrist(state)
+        path = {root: 0} # hasze pozycji na ścieżce i ich głębokości
+        # Ramka: [ruchy, indeks następnego ruchu, hasz, zapisy ruchów prowadzących tu, ruch,
+        #         czy ucięto, najpłytszy przodek osiągnięty przez cykl]
+        stack = [[ordered_moves(state), 0, root, None, None, False, 0]]
+
+        while stack:
+            frame = stack[-1]
+            moves = frame[0]
+
+            if frame[1] < len(moves):
+                move = moves[frame[1]]
+                frame[1] += 1
+
+                self.nodes += 1
+                if not self.nodes & 1023 and self._out_of_budget():
+                    return UNKNOWN, None
+
+                draws, play = move
+                h = frame[2] ^ pointers_key(buf)
+                records = [apply(DRAW) for _ in range(draws)]
+                h ^= zobrist_delta(state, play)
+                records.append(apply(play))
+                h ^= pointers_key(buf)
+
+                # Wszystkie karty odkryte i pusty stos rezerwowy — reszta partii jest przesądzona
+                if can_finish():
+                    return WON, expand([f[4] for f in stack[1:]] + [move]) + state.finishing_moves()
+
+                remaining = limit - len(stack)
+                skip = True
+                if remaining <= 0:
+                    frame[5] = True
+                elif h in path:
+                    # Cykl — zapamiętanie najpłytszego przodka, do którego prowadzi
+                    if path[h] < frame[6]:
+                        frame[6] = path[h]
+                else:
+                    entry = lookup(h)
+                    if entry is None or entry != INFINITE and (entry >> 16 != self.iteration or entry & 0xFFFF < remaining):
+                        skip = False
+                    elif entry & 0xFFFF != INFINITE:
+                        frame[5] = True
+                    elif entry != INFINITE:
+                        frame[6] = 0
+
+                if skip:
+                    for record in reversed(records):
+                        undo(record)
+                    continue
+
+                path[h] = len(stack)
+                stack.append([ordered_moves(state), 0, h, records, move, False, len(stack)])
+
+            else:
+                stack.pop()
+                depth = len(stack)
+                del path[frame[2]]
+                if frame[5]:
+                    store(frame[2], tag | limit - depth)
+                elif frame[6] < depth:
+                    store(frame[2], tag | INFINITE)
+                else:
+                    store(frame[2], INFINITE)
+                if stack:
+                    for record in reversed(frame[3]):
+                        undo(record)
+                    parent = stack[-1]
+                    if frame[5]:
+                        parent[5] = True
+                    if frame[6] < parent[6]:
+                        parent[6] = frame[6]
+                elif not frame[5]:
+                    return LOST, None
+
+        return None, None
+
+# Rozwiązanie partii jednorazowym rozwiązywaczem
+def solve(state, max_nodes=1_000_000, max_time=None, cancel=None):
+    return Solver().solve(state, max_nodes, max_time, cancel)
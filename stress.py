@@ -0,0 +1,492 @@
+# TEST OBCIĄŻENIOWY ZASAD
+#
+# Losowe ciągi wejść — dozwolone i niedozwolone ruchy, dobory, cofnięcia
+# i ponowienia — wykonywane na silniku (engine.py) wszystkich wariantów gry,
+# z kontrolą niezmienników: każda karta jest w grze tyle razy,
+# ile jest talii, stosy końcowe rosną w kolorze od asa, odkryte karty kolumn są
+# ułożone, wskaźniki stosu rezerwowego i liczniki stanu są zgodne z kartami,
+# is_legal() i legal_moves() się zgadzają, a cofnięcie odtwarza dokładnie
+# poprzedni stan. Cofnięcia i ponowienia są sprawdzane zawsze, a pełna kontrola
+# stanu (najdroższa część kroku) co CHECK_EVERY wykonanych ruchów i na końcu partii;
+# przy odtwarzaniu i skracaniu ciągu — po każdym ruchu, więc błąd jest wskazany
+# dokładnie tam, gdzie powstał. Z opcją --keys wejściem są klawisze obsługiwane przez Game
+# z pasjans.py (jak w Game.run(), ale bez terminala) i sprawdzany jest też stan gry:
+# wskaźnik, licznik ruchów i historia.
+#
+# Każda partia to rozdanie, poziom trudności i ciąg wejść wyznaczony numerem
+# rozdania, więc błąd da się powtórzyć. Ciąg, po którym niezmiennik nie jest
+# spełniony, jest skracany (usuwanie coraz mniejszych fragmentów, dopóki błąd
+# występuje) i wypisywany jako wiersz JSON — polecenie stress --replay go odtwarza.
+# Partie są rozgrywane na wszystkich rdzeniach, jak w batch.py i bots.py.
+
+import sys
+import json
+from array import array
+from random import Random
+from multiprocessing import Pool
+from time import perf_counter
+
+from engine import History, EMPTY
+from variants import VARIANTS
+
+STEPS = 500 # liczba wejść w partii (po nich wszystkie ruchy są cofane)
+CHECK_EVERY = 16 # pełna kontrola stanu co tyle wykonanych ruchów (przy losowych wejściach)
+
+# Wejścia silnika: ruch (skąd, dokąd, liczba kart), także niedozwolony, "u" - cofnięcie,
+# "r" - ponowienie, ("l", k) - ruch nr k (modulo ich liczba) z legal_moves(),
+# "a" - porównanie legal_moves() z is_legal() dla wszystkich ruchów w pozycji
+UNDO_OP, REDO_OP, ALL_OP, LEGAL_OP = "u", "r", "a", "l"
+
+# Prawdopodobieństwa rodzajów wejść; pozostałe to całkiem losowe (prawie zawsze niedozwolone) ruchy
+UNDO = 0.08
+REDO = 0.04
+ALL = 0.0005
+LEGAL = 0.06
+DRAW = 0.12
+PLAUSIBLE = 0.6 # ruch z niepustego stosu o liczbie kart, która może leżeć odkryta
+
+# Progi rodzajów wejść dla 20 losowych bitów (patrz EngineRun.random_op)
+_UNDO, _REDO, _ALL, _LEGAL, _RAW, _PLAUSIBLE = (int(sum((UNDO, REDO, ALL, LEGAL, DRAW, PLAUSIBLE)[:i+1]) * (1 << 20)) for i in range(6))
+
+# Prawdopodobieństwo zaplanowania dozwolonego ruchu przy wejściu klawiszami (patrz KeysRun)
+PLANNED = 0.2
+
+# NIEZMIENNIKI
+
+# Karty stosu końcowego o danej wierzchniej karcie (od asa)
+FOUNDATION_CARDS = [bytes(range(card - card % 13, card + 1)) for card in range(52)]
+
+_all_cards = {}
+
+# Wszystkie karty wariantu, posortowane
+def all_cards(K):
+    cards = _all_cards.get(K)
+    if cards is None:
+        cards = _all_cards[K] = bytes(sorted(list(range(52)) * K.rules.decks))
+    return cards
+
+# Sprawdzenie niezmienników stanu; opis pierwszego niespełnionego albo None
+def check(state):
+    K = type(state)
+    buf = state.buf
+
+    # Stos rezerwowy: wskaźniki w zakresie, za końcem talii same zera
+    length, shift, cod = buf[K.DECK_LEN], buf[K.SHIFT], buf[K.COD]
+    if length > K.MAX_DECK:
+        return "za dużo kart w stosie rezerwowym: %d" % length
+    if cod > K.W or cod == 0 and shift:
+        return "niepoprawne wskaźniki stosu rezerwowego: przesunięcie %d, karty %d" % (shift, cod)
+    if shift + min(cod, length) > length:
+        return "widoczne karty za końcem stosu rezerwowego: przesunięcie %d, karty %d, długość %d" % (shift, cod, length)
+    if any(buf[K.DECK+length:K.BOARD]):
+        return "karty za końcem stosu rezerwowego"
+    if K.LIMITED and buf[K.PASSES] > K.REDEALS[buf[K.HARD]]:
+        return "za dużo przejrzeń talii: %d" % buf[K.PASSES]
+
+    # Kolumny gry: długości, zakryte karty, wierzchnie karty i ułożenie odkrytych kart
+    cards = bytearray(buf[K.DECK:K.DECK+length])
+    facedown = 0
+    for r in range(K.T):
+        n, hidden = buf[K.LENS+r], buf[K.HIDDEN+r]
+        o = K.BOARD + r*K.COLUMN
+        if n > K.COLUMN or any(buf[o+n:o+K.COLUMN]):
+            return "karty za końcem kolumny %d" % r
+        if hidden >= n and (n or hidden):
+            return "zakryta karta na wierzchu kolumny %d" % r
+        column = buf[o:o+n]
+        if buf[K.TOPS+r] != (column[-1] if n else EMPTY):
+            return "niezgodna wierzchnia karta kolumny %d" % r
+        for i in range(hidden + 1, n):
+            if not K.FITS_TABLEAU[column[i] << 8 | column[i-1]]:
+                return "nieułożone odkryte karty w kolumnie %d" % r
+        facedown += hidden
+        cards += column
+    if facedown != buf[K.FACEDOWN]:
+        return "licznik zakrytych kart %d, a zakrytych jest %d" % (buf[K.FACEDOWN], facedown)
+
+    # Stosy końcowe: od asa w jednym kolorze, czyli wszystkie karty koloru do wierzchniej
+    founded = 0
+    for f in range(K.F):
+        top = buf[K.DISCARD+f]
+        if top == EMPTY:
+            continue
+        if top >= 52:
+            return "niepoprawna karta na stosie końcowym %d: %d" % (f, top)
+        cards += FOUNDATION_CARDS[top]
+        founded += top % 13 + 1
+    if founded != buf[K.FOUNDED]:
+        return "licznik kart na stosach końcowych %d, a kart jest %d" % (buf[K.FOUNDED], founded)
+
+    if bytes(sorted(cards)) != all_cards(K):
+        return "karty zgubione albo zdublowane"
+    return None
+
+# ROZGRYWKA NA SILNIKU
+
+class EngineRun:
+    # every - pełna kontrola stanu co tyle wykonanych ruchów
+    def __init__(self, K, hard, seed, every=1):
+        self.state = K.deal(hard, seed)
+        self.history = History()
+        self.every = every
+        self.applied = 0 # liczba ruchów wykonanych od ostatniej pełnej kontroli
+        self.snaps = [bytes(self.state.buf)] # stany po kolejnych wykonanych ruchach
+        self.redos = [] # stany sprzed cofnięć (do porównania przy ponowieniu)
+
+    # Losowe wejście. Jedna liczba losowa na całe wejście — losowanie jest tu
+    # najczęstszą operacją: młodsze bity wybierają rodzaj wejścia, starsze ruch
+    def random_op(self, rng):
+        K = type(self.state)
+        bits = rng.getrandbits(50)
+        r = bits & 0xFFFFF
+        bits >>= 20
+        if r >= _RAW:
+            if r < _PLAUSIBLE:
+                src = bits % K.STOCK
+                n = 1
+                if src < K.FOUNDATION:
+                    buf = self.state.buf
+                    n += (bits >> 20) % max(1, buf[K.LENS+src] - buf[K.HIDDEN+src])
+                return (src, (bits >> 10) % K.WASTE, n)
+            return (bits % (K.STOCK + 1), (bits >> 10) % (K.STOCK + 1), (bits >> 20) % (K.COLUMN + 1))
+        if r < _UNDO:
+            return UNDO_OP
+        if r < _REDO:
+            return REDO_OP
+        if r < _ALL:
+            return ALL_OP
+        if r < _LEGAL:
+            return (LEGAL_OP, bits & 0xFFFF)
+        return K.DRAW
+
+    # Wykonanie wejścia i sprawdzenie niezmienników; opis błędu albo None
+    def step(self, op):
+        state, history, snaps = self.state, self.history, self.snaps
+        if op == UNDO_OP:
+            if history.undo(state) is None:
+                return "brak ruchu do cofnięcia po %d ruchach" % (len(snaps) - 1) if len(snaps) > 1 else None
+            self.redos.append(snaps.pop())
+            if state.buf != snaps[-1]:
+                return "cofnięcie nie odtworzyło poprzedniego stanu"
+            return None
+
+        if op == REDO_OP:
+            if history.redo(state) is None:
+                return "brak ruchu do ponowienia po %d cofnięciach" % len(self.redos) if self.redos else None
+            snaps.append(bytes(state.buf))
+            if snaps[-1] != self.redos.pop():
+                return "ponowienie nie odtworzyło stanu sprzed cofnięcia"
+            return None
+
+        if op == ALL_OP:
+            self.applied = 0
+            return check(state) or self.check_moves()
+
+        if op[0] == LEGAL_OP:
+            moves = state.legal_moves()
+            if not moves:
+                return None
+            move = moves[op[1] % len(moves)]
+            if not state.is_legal(move):
+                return "ruch %r z legal_moves() jest niedozwolony" % (move,)
+        else:
+            move = op
+            legal = state.is_legal(move)
+            if state.buf != snaps[-1]:
+                return "is_legal zmienił stan"
+            if not legal:
+                return None
+
+        record = history.apply(state, move)
+        if state.record_move(record) != move:
+            return "zapis ruchu %r odczytany jako %r" % (move, state.record_move(record))
+        snaps.append(bytes(state.buf))
+        self.redos.clear()
+        self.applied += 1
+        if self.applied < self.every:
+            return None
+        self.applied = 0
+        return check(state)
+
+    # Czy legal_moves() to dokładnie dozwolone ruchy pozycji? As trafia tylko na pierwszy
+    # wolny stos końcowy, a przy dwóch taliach karta na pierwszy pasujący, więc ruch na inny
+    # stos końcowy o tej samej wierzchniej karcie może w legal_moves() nie występować
+    def check_moves(self):
+        state = self.state
+        K = type(state)
+        buf = state.buf
+        moves = state.legal_moves()
+        for move in moves:
+            if not state.is_legal(move):
+                return "ruch %r z legal_moves() jest niedozwolony" % (move,)
+        listed = set(moves)
+        for src in range(K.STOCK + 1):
+            counts = range(buf[K.LENS+src] - buf[K.HIDDEN+src] + 2) if src < K.FOUNDATION else range(3)
+            for dst in range(K.STOCK + 1):
+                for n in counts:
+                    move = (src, dst, n)
+                    if move in listed or not state.is_legal(move):
+                        continue
+                    if K.FOUNDATION <= dst < K.WASTE and any(
+                            m[0] == src and K.FOUNDATION <= m[1] < K.WASTE and state.top(m[1]) == state.top(dst) for m in moves):
+                        continue
+                    return "ruch %r dozwolony, ale nie ma go w legal_moves()" % (move,)
+        if state.buf != self.snaps[-1]:
+            return "legal_moves albo is_legal zmienił stan"
+        return None
+
+    # Wejścia kończące partię: porównanie ruchów w końcowej pozycji i cofnięcie
+    # wszystkich ruchów (aż do rozdania)
+    def closing_ops(self):
+        return [ALL_OP] + [UNDO_OP] * len(self.history)
+
+# ROZGRYWKA KLAWISZAMI
+
+# Gra bez terminala: ekrany inne niż plansza nie są rysowane, a wygrana nie trafia
+# do tablicy wyników
+def headless_game():
+    import pasjans
+    pasjans.load_curses()
+
+    class HeadlessGame(pasjans.Game):
+        def switch_screen(self, screen_in):
+            self.cur_screen = screen_in
+
+        def check_win(self):
+            if self.klondike.is_won():
+                self.switch_screen(pasjans.Screen.WIN)
+
+    return HeadlessGame()
+
+class KeysRun:
+    def __init__(self, K, hard, seed):
+        import pasjans
+        self.Screen = pasjans.Screen
+        self.game = game = headless_game()
+        game.variant = K
+        game.state["hard"] = bool(hard)
+        game.new_game(seed)
+        game.cur_screen = self.Screen.GAME
+        self.records = array("I") # zapisy ruchów znanych stanów
+        self.snaps = [bytes(game.klondike.buf)] # stany po kolejnych zapisach z records
+
+        uc = pasjans.uc
+        self.up, self.down, self.left, self.right = uc.KEY_UP, uc.KEY_DOWN, uc.KEY_LEFT, uc.KEY_RIGHT
+        self.enter, self.backspace = pasjans.ENTER[0], pasjans.BACKSPACE[0]
+        # Podpowiedzi (H) pomijamy — rozwiązywacz w tle nie daje powtarzalnych wyników
+        self.keys = [self.up, self.down, self.left, self.right, pasjans.ESC, self.enter, self.backspace, pasjans.U[0], pasjans.R[0], pasjans.A[0]]
+        self.targets = [] # pozycje wskaźnika, na których trzeba nacisnąć Enter (zaplanowany ruch)
+        self.budget = 0 # ile klawiszy zostało na zaplanowany ruch
+
+    # Losowy klawisz. Przypadkowe klawisze rzadko przenoszą karty, więc co jakiś czas
+    # planowany jest losowy dozwolony ruch: wskaźnik na kartę, Enter, na miejsce docelowe, Enter
+    def random_op(self, rng):
+        if not self.targets and rng.random() < PLANNED:
+            self.plan(rng)
+        if self.targets and self.budget > 0:
+            self.budget -= 1
+            return self.next_key()
+        self.targets = []
+        return rng.choice(self.keys)
+
+    def plan(self, rng):
+        game = self.game
+        moves = game.klondike.legal_moves()
+        if not moves:
+            return
+        move = rng.choice(moves)
+        if move == game.klondike.DRAW:
+            return
+        positions = game.move_positions(move)
+        # Zaznaczona wcześniej karta: najpierw Enter w miejscu wskaźnika kasuje zaznaczenie
+        self.targets = ([tuple(game.state["mp"])] if game.state["picking"] else []) + positions
+        self.budget = 4 * (game.klondike.COLUMN + game.row_width(0))
+
+    # Klawisz przybliżający wskaźnik do najbliższej pozycji z targets (Enter na miejscu)
+    def next_key(self):
+        x, y = self.game.state["mp"]
+        tx, ty = self.targets[0]
+        if (x, y) == (tx, ty):
+            self.targets.pop(0)
+            return self.enter
+        # Do pierwszego wiersza najpierw w bok — w nim wskaźnik może zostać przesunięty na wierzchnią kartę stosu rezerwowego
+        if ty == 0 and x != tx and tx < self.game.row_width(y):
+            return self.right if tx > x else self.left
+        if y != ty:
+            return self.down if ty > y else self.up
+        return self.right if tx > x else self.left
+
+    def step(self, key):
+        game = self.game
+        if game.cur_screen != self.Screen.GAME:
+            return None # partia wygrana
+        game.game_key(key)
+        if game.cur_screen == self.Screen.PAUSE:
+            game.cur_screen = self.Screen.GAME
+
+        k = game.klondike
+        K = type(k)
+        error = check(k)
+        if error is not None:
+            return error
+
+        # Wskaźnik na planszy
+        x, y = game.state["mp"]
+        if not (0 <= y <= K.COLUMN + 2 and 0 <= x < game.row_width(y)):
+            return "wskaźnik poza planszą: %d, %d" % (x, y)
+        if y == 0 and k.mode.top_only and k.visible() and x < K.W and x != k.visible() - 1:
+            return "wskaźnik na niewierzchniej karcie stosu rezerwowego"
+
+        # Licznik ruchów: przeniesienia kart w historii (bez doborów)
+        done = game.history.done
+        if game.cur_screen == self.Screen.GAME:
+            moves = sum(1 for r in done if not K.is_draw(r))
+            if game.state["move"] != moves + 1:
+                return "licznik ruchów %d, a w historii jest %d przeniesień" % (game.state["move"] - 1, moves)
+
+        # Historia: stan po n zapisach musi być taki, jak przy pierwszym wykonaniu tych
+        # ruchów (cofnięcia i ponowienia odtwarzają dokładnie te same stany)
+        p = min(len(done), len(self.records))
+        while done[:p] != self.records[:p]:
+            p -= 1
+        if p < len(self.records) and len(done) > p:
+            del self.records[p:], self.snaps[p+1:] # nowa gałąź historii
+        if len(done) > len(self.records):
+            state = K.from_bytes(self.snaps[-1])
+            for record in done[len(self.records):]:
+                state.apply(state.record_move(record))
+                self.records.append(record)
+                self.snaps.append(bytes(state.buf))
+        if k.buf != self.snaps[len(done)]:
+            return "stan po %d ruchach historii różni się od pierwotnego" % len(done)
+        return None
+
+    def closing_ops(self):
+        return []
+
+# Partia: (liczba wejść, opis błędu, numer wejścia z błędem); przy ops=None wejścia są losowe
+def play(name, hard, seed, steps=STEPS, keys=False, ops=None):
+    K = VARIANTS[name]
+    if keys:
+        run = KeysRun(K, hard, seed)
+    else:
+        run = EngineRun(K, hard, seed, CHECK_EVERY if ops is None else 1)
+    if ops is None:
+        rng = Random(seed << 1 | hard)
+        ops = []
+        for i in range(steps):
+            op = run.random_op(rng)
+            ops.append(op)
+            error = run.step(op)
+            if error is not None:
+                return ops, error, i
+        for op in run.closing_ops():
+            ops.append(op)
+            error = run.step(op)
+            if error is not None:
+                return ops, error, len(ops) - 1
+        return ops, None, None
+    for i, op in enumerate(ops):
+        error = run.step(op)
+        if error is not None:
+            return ops, error, i
+    return ops, None, None
+
+# SKRACANIE
+
+# Najkrótszy znaleziony ciąg wejść, po którym partia nadal kończy się błędem:
+# usuwanie fragmentów coraz mniejszych, aż do pojedynczych wejść
+def shrink(name, hard, seed, keys, ops):
+    def fails(candidate):
+        _, error, i = play(name, hard, seed, keys=keys, ops=candidate)
+        return None if error is None else candidate[:i+1]
+
+    ops = fails(ops) or ops
+    chunk = max(1, len(ops) // 2)
+    while True:
+        i = 0
+        while i < len(ops):
+            shorter = fails(ops[:i] + ops[i+chunk:])
+            if shorter is not None:
+                ops = shorter
+            else:
+                i += chunk
+        if chunk == 1:
+            break
+        chunk = max(1, chunk // 2)
+    _, error, _ = play(name, hard, seed, keys=keys, ops=ops)
+    return ops, error
+
+# Przypadek błędu jako słownik (do zapisu w JSON)
+def failure_case(name, hard, seed, keys, ops, error):
+    return {"variant": name, "hard": hard, "seed": seed, "keys": keys,
+            "ops": [op if isinstance(op, (str, int)) else list(op) for op in ops], "error": error}
+
+# Wejście odczytane z JSON (listy z powrotem jako krotki)
+def parse_op(op):
+    return op if isinstance(op, (str, int)) else tuple(op)
+
+def _play(task):
+    name, hard, seed, steps, keys = task
+    ops, error, i = play(name, hard, seed, steps, keys)
+    if error is None:
+        return len(ops), None
+    ops, error = shrink(name, hard, seed, keys, ops[:i+1])
+    return len(ops), failure_case(name, hard, seed, keys, ops, error)
+
+# Rozegranie partii first..last (włącznie) w wybranych wariantach i na wybranych poziomach
+# trudności; zwraca listę przypadków błędów
+def stress(first, last, names, modes, steps=STEPS, keys=False, jobs=None, out=sys.stderr):
+    tasks = [(name, hard, seed, steps, keys) for seed in range(first, last + 1) for name in names for hard in modes]
+    failures = []
+    games = total = 0
+    start = last_report = perf_counter()
+    with Pool(jobs) as pool:
+        for count, failure in pool.imap_unordered(_play, tasks, chunksize=16):
+            games += 1
+            total += count
+            if failure is not None:
+                failures.append(failure)
+                print(json.dumps(failure, ensure_ascii=False), flush=True)
+            now = perf_counter()
+            if now - last_report >= 10:
+                last_report = now
+                print("%d/%d partii, %.0f kroków/s, błędy: %d" % (games, len(tasks), total / (now - start), len(failures)), file=out)
+    elapsed = perf_counter() - start
+    print("%d partii, %d kroków w %.1f s (%.0f kroków/s), błędy: %d" % (
+        games, total, elapsed, total / elapsed if elapsed else 0, len(failures)), file=out)
+    return failures
+
+# WIERSZ POLECEŃ
+
+MODES = {"easy": (0,), "hard": (1,), "both": (0, 1)}
+
+def add_parser(commands):
+    parser = commands.add_parser("stress", help="losowe wejścia z kontrolą niezmienników zasad gry")
+    parser.add_argument("first", type=int, nargs="?", default=0, help="pierwszy numer rozdania")
+    parser.add_argument("last", type=int, nargs="?", default=999, help="ostatni numer rozdania (włącznie)")
+    parser.add_argument("--variant", default="all", help="warianty gry, po przecinku (domyślnie wszystkie: %s)" % ", ".join(VARIANTS))
+    parser.add_argument("--mode", choices=MODES, default="both", help="poziom trudności (domyślnie oba)")
+    parser.add_argument("--steps", type=int, default=STEPS, help="liczba wejść w partii (domyślnie %(default)s)")
+    parser.add_argument("--keys", action="store_true", help="wejściem są klawisze gry (Game z pasjans.py), a nie ruchy silnika")
+    parser.add_argument("--jobs", type=int, default=None, help="liczba procesów (domyślnie liczba rdzeni)")
+    parser.add_argument("--replay", metavar="JSON", help="odtwórz przypadek błędu (wiersz wypisany przez stress)")
+    parser.set_defaults(run=run)
+
+def run(args):
+    if args.replay is not None:
+        case = json.loads(args.replay)
+        ops = [parse_op(op) for op in case["ops"]]
+        _, error, i = play(case["variant"], case["hard"], case["seed"], keys=case["keys"], ops=ops)
+        if error is None:
+            print("Brak błędu (%d wejść)" % len(ops), file=sys.stderr)
+            return
+        sys.exit("Wejście %d (%r): %s" % (i, ops[i], error))
+
+    names = list(VARIANTS) if args.variant == "all" else [n for n in args.variant.split(",") if n]
+    for name in names:
+        if name not in VARIANTS:
+            sys.exit("Nieznany wariant: %s (dostępne: %s)" % (name, ", ".join(VARIANTS)))
+    failures = stress(args.first, args.last, names, MODES[args.mode], args.steps, args.keys, args.jobs)
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,29 @@
+# WARIANTY GRY
+#
+# Odmiany pasjansa opisane samymi danymi (Rules, patrz engine.py) i skompilowane
+# do klas stanu. Nowy wariant to nowy wpis w VARIANTS — silnik, plansza w grze,
+# tablica wyników i zapisane gry obsługują go bez dalszych zmian. Rozwiązywacz,
+# podpowiedzi, pamięć pozycji, zapisy partii, serwer i boty znają tylko klasyczny Klondike.
+
+from engine import Klondike, Rules, Mode, KLONDIKE, compile_rules
+
+# Vegas: dobiera się jak zwykle, ale talię można przejrzeć tylko ograniczoną liczbę razy
+VEGAS = Rules("vegas", "Vegas", (
+    Mode("Łatwy", "Dobiera się po 1 karcie, talię można przejrzeć tylko raz.", 1, top_only=True, passes=1),
+    Mode("Trudny", "Dobiera się 3 karty (użyć można tylko wierzchniej), talię można przejrzeć 3 razy.", 3, top_only=True, passes=3),
+))
+
+# Dobieranie po n kartach; widocznych jest n kart stosu rezerwowego
+def draw_n(n):
+    return Rules("draw-%d" % n, "Dobieranie po %d" % n, (
+        Mode("Łatwy", "Dobiera się po %d karty, użyć można każdej widocznej." % n, n),
+        Mode("Trudny", "Dobiera się po %d karty, ale użyć można tylko wierzchniej." % n, n, top_only=True),
+    ), waste=n)
+
+# Dwie talie (104 karty): 9 kolumn gry i 8 stosów końcowych
+DOUBLE = Rules("double", "Dwie talie", KLONDIKE.modes, decks=2, columns=9)
+
+# Nazwa wariantu -> klasa stanu, w kolejności wyboru w menu
+VARIANTS = {"klondike": Klondike}
+for rules in (VEGAS, draw_n(2), DOUBLE):
+    VARIANTS[rules.name] = compile_rules(rules)
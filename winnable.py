@@ -0,0 +1,81 @@
+# ROZDANIA DO WYGRANIA
+#
+# Indeks numerów rozdań, które rozwiązywacz wygrał (patrz polecenie solve
+# w batch.py), osobno dla każdego poziomu trudności. Przy każdym numerze jest
+# długość znalezionego rozwiązania — przybliżona trudność rozdania. Wpisy mają
+# stały rozmiar, więc losowe rozdanie z indeksu to jedno sięgnięcie do pliku
+# (mmap), niezależnie od liczby rozdań w indeksie.
+
+import os
+import sys
+import mmap
+import struct
+from random import randrange
+
+from solver import WON
+
+# Plik indeksu: nagłówek (MAGIC, liczba rozdań łatwych, liczba rozdań trudnych),
+# a po nim wpisy ENTRY (numer rozdania, długość rozwiązania): najpierw łatwe, potem
+# trudne, w obu częściach od najkrótszego rozwiązania
+PATH = "./wygrywalne.bin"
+MAGIC = b"PSJW"
+HEADER = struct.Struct("<4sII")
+ENTRY = struct.Struct("<IH")
+
+class WinnableIndex:
+    def __init__(self, path=PATH):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, easy, hard = HEADER.unpack_from(self.data, 0) if len(self.data) >= HEADER.size else (None, 0, 0)
+        if magic != MAGIC or len(self.data) != HEADER.size + (easy + hard) * ENTRY.size:
+            self.data.close()
+            raise ValueError(path + ": to nie jest indeks rozdań do wygrania")
+        self.counts = (easy, hard)
+
+    def close(self):
+        self.data.close()
+
+    # Liczba rozdań do wygrania na poziomie trudności
+    def count(self, hard):
+        return self.counts[bool(hard)]
+
+    # Rozdanie nr i (od najkrótszego rozwiązania): krotka (numer rozdania, długość rozwiązania)
+    def entry(self, hard, i):
+        return ENTRY.unpack_from(self.data, HEADER.size + ENTRY.size * (self.counts[0] * bool(hard) + i))
+
+    # Losowe rozdanie do wygrania (None - brak rozdań dla poziomu trudności)
+    def pick(self, hard):
+        n = self.count(hard)
+        return self.entry(hard, randrange(n)) if n else None
+
+# Zbudowanie indeksu z plików wyników polecenia solve; zwraca liczby rozdań (łatwe, trudne)
+def build(results_paths, path=PATH):
+    from batch import read_results
+
+    won = ({}, {}) # numer rozdania -> długość rozwiązania, dla każdego poziomu trudności
+    for results_path in results_paths:
+        for seed, hard, status, nodes, length, ms in read_results(results_path):
+            if status == WON:
+                won[hard][seed] = min(length, won[hard].get(seed, length))
+
+    # Zapis do pliku tymczasowego i podmiana — gra może mieć otwarty stary indeks
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(won[0]), len(won[1])))
+        for entries in won:
+            for seed, length in sorted(entries.items(), key=lambda e: (e[1], e[0])):
+                f.write(ENTRY.pack(seed, min(length, 0xFFFF)))
+    os.replace(tmp, path)
+    return len(won[0]), len(won[1])
+
+# WIERSZ POLECEŃ
+
+def add_parser(commands):
+    parser = commands.add_parser("index", help="indeks rozdań do wygrania z wyników polecenia solve")
+    parser.add_argument("results", nargs="+", help="pliki wyników polecenia solve")
+    parser.add_argument("--out", default=PATH, help="plik indeksu (domyślnie %(default)s)")
+    parser.set_defaults(run=run)
+
+def run(args):
+    easy, hard = build(args.results, args.out)
+    print("Rozdania do wygrania: łatwe %d, trudne %d" % (easy, hard), file=sys.stderr)